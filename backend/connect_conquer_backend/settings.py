@@ -77,23 +77,146 @@ ROOT_URLCONF = 'connect_conquer_backend.urls'
 ASGI_APPLICATION = 'connect_conquer_backend.asgi.application'
 
 # Channels Layer Configuration
-# For development, use in-memory channel layer (no Redis required)
-# For production, uncomment the Redis configuration below
-CHANNEL_LAYERS = {
-    'default': {
-        'BACKEND': 'channels.layers.InMemoryChannelLayer',
-    },
+# Set CHANNEL_REDIS_URL (e.g. redis://127.0.0.1:6379/0, comma-separated for
+# several Redis shards) so group messages reach consumers on every ASGI worker
+# process. Without it, the in-memory layer is used (single process only).
+CHANNEL_REDIS_URL = os.environ.get('CHANNEL_REDIS_URL', '')
+
+if CHANNEL_REDIS_URL:
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels_redis.pubsub.RedisPubSubChannelLayer',
+            'CONFIG': {
+                'hosts': [url.strip() for url in CHANNEL_REDIS_URL.split(',') if url.strip()],
+            },
+        },
+    }
+else:
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels.layers.InMemoryChannelLayer',
+        },
+    }
+
+# Group sends from the process's own threads (view count flushes, embedded job
+# workers) run on the ASGI server's event loop, since the in-memory layer is not
+# thread-safe; a send not done within this many seconds is dropped
+CHANNEL_SEND_TIMEOUT = 5.0
+
+# Each discussion room is split into this many channel-layer groups, so hot
+# rooms spread their fan-out across Redis shards (see core/channel_groups.py)
+DISCUSSION_GROUP_SHARDS = int(os.environ.get('DISCUSSION_GROUP_SHARDS', '1'))
+
+# Broadcast frames to each discussion socket are coalesced for this many
+# seconds and sent as one JSON array frame (0 sends each frame immediately)
+DISCUSSION_FANOUT_WINDOW = 0.05
+DISCUSSION_FANOUT_MAX_BATCH = 100
+
+# Typing indicators: a start is broadcast once and a stop follows after this
+# many seconds without a typing frame from the client
+DISCUSSION_TYPING_TIMEOUT = 5.0
+
+# Per-user token bucket for inbound discussion frames (chat, typing, ping):
+# refilled at DISCUSSION_FRAME_RATE frames/second, up to DISCUSSION_FRAME_BURST
+DISCUSSION_FRAME_RATE = 5.0
+DISCUSSION_FRAME_BURST = 20
+
+# Discussion presence is tracked in memory: sockets silent for longer than
+# DISCUSSION_PRESENCE_TTL seconds are expired, and last_seen is written to
+# UserOnlineStatus in bulk every DISCUSSION_PRESENCE_FLUSH_INTERVAL seconds
+DISCUSSION_PRESENCE_TTL = 60.0
+DISCUSSION_PRESENCE_FLUSH_INTERVAL = 15.0
+
+# Chat messages sent over the discussion WebSocket are broadcast first and
+# written behind in batches: a batch is flushed this many seconds after its
+# first message, or once DISCUSSION_CHAT_MAX_BATCH messages are queued
+DISCUSSION_CHAT_FLUSH_INTERVAL = 0.1
+DISCUSSION_CHAT_MAX_BATCH = 200
+
+# Chat broadcasts carry per-topic sequence numbers so reconnecting sockets can
+# ask for ?resume_from=<seq>. Missed messages are replayed from a per-room ring
+# buffer of this many messages, falling back to the database; clients further
+# behind than DISCUSSION_REPLAY_MAX_MESSAGES reload the topic instead.
+# With several workers, sequences are allocated in Redis.
+DISCUSSION_REPLAY_BUFFER_SIZE = 500
+DISCUSSION_REPLAY_MAX_MESSAGES = 500
+DISCUSSION_SEQUENCE_REDIS_URL = CHANNEL_REDIS_URL.split(',')[0].strip()
+
+# Discussion topic view counts are buffered in-process and flushed as batched
+# increments at most this many seconds after a view (or when too many topics are pending)
+DISCUSSION_VIEW_COUNT_FLUSH_INTERVAL = 5.0
+DISCUSSION_VIEW_COUNT_MAX_PENDING = 1000
+
+# Full-text search (core/search.py): SQLite FTS5 or PostgreSQL tsvector,
+# falling back to LIKE-based SearchFilter on other databases
+FULL_TEXT_SEARCH_ENABLED = True
+FULL_TEXT_SEARCH_MAX_RESULTS = 500
+
+# Gemini calls of the AI views go through the shared gateway in core/llm.py.
+# LLM_TIMEOUT is the deadline of one call including its retries; at most
+# LLM_MAX_CONCURRENCY calls run at once per process (sync and async each)
+GEMINI_API_KEY = os.environ.get('GEMINI_API_KEY', '')
+LLM_MODEL = os.environ.get('LLM_MODEL', 'gemini-2.0-flash')
+LLM_TIMEOUT = 30.0
+LLM_MAX_CONCURRENCY = 8
+LLM_MAX_RETRIES = 2
+LLM_RETRY_BACKOFF = 0.5
+
+# EvaluateInterviewAnswersView scores up to INTERVIEW_EVALUATION_CONCURRENCY
+# answers at once, each within INTERVIEW_EVALUATION_TIMEOUT seconds (answers
+# that miss it get the fallback evaluation). With INTERVIEW_EVALUATION_BATCHED
+# all answers are scored by one prompt instead
+INTERVIEW_EVALUATION_CONCURRENCY = 4
+INTERVIEW_EVALUATION_TIMEOUT = 20.0
+INTERVIEW_EVALUATION_BATCHED = False
+
+# Mock interview questions are synthesized with ElevenLabs (core/tts.py), up
+# to TTS_MAX_CONCURRENCY at a time. The audio is cached in TTS_CACHE_DIR under
+# a hash of the text and the voice options, and served by /api/tts_audio/<key>/.
+# Beyond TTS_CACHE_MAX_BYTES, the least recently used audio is evicted
+ELEVENLABS_API_KEY = os.environ.get('ELEVENLABS_API_KEY', '')
+TTS_CACHE_DIR = os.environ.get('TTS_CACHE_DIR', str(BASE_DIR / 'tts_cache'))
+TTS_CACHE_MAX_BYTES = 500 * 1024 * 1024
+TTS_MAX_CONCURRENCY = 4
+TTS_TIMEOUT = 30.0
+TTS_VOICE_ID = 'JBFqnCBsd6RMkjVDRZzb'  # George - Professional male voice
+TTS_MODEL_ID = 'eleven_multilingual_v2'
+TTS_OUTPUT_FORMAT = 'mp3_44100_128'
+TTS_VOICE_SETTINGS = {
+    'stability': 0.5,
+    'similarity_boost': 0.75,
+    'style': 0.2,
+    'use_speaker_boost': True,
 }
 
-# Uncomment this for production with Redis:
-# CHANNEL_LAYERS = {
-#     'default': {
-#         'BACKEND': 'channels_redis.core.RedisChannelLayer',
-#         'CONFIG': {
-#             "hosts": [('127.0.0.1', 6379)],
-#         },
-#     },
-# }
+# AITopicExplainerView answers are cached in the database by their normalized
+# inputs (core/explanation_cache.py). Bump TOPIC_EXPLANATION_PROMPT_VERSION
+# when the prompt changes; entries of older versions (or models) are evicted
+TOPIC_EXPLANATION_PROMPT_VERSION = 1
+TOPIC_EXPLANATION_CACHE_TTL = 30 * 24 * 3600
+TOPIC_EXPLANATION_CACHE_MAX_ENTRIES = 5000
+TOPIC_EXPLANATION_CACHE_MAX_BYTES = 50 * 1024 * 1024
+TOPIC_EXPLANATION_CACHE_MAX_ENTRY_BYTES = 64 * 1024
+
+# PersonalizedPrepPlanView reuses the Gemini plan generated for the same
+# normalized role, job description and academic details (core/plan_templates.py).
+# Templates are namespaced by a fingerprint of the prompt, so editing the prompt
+# invalidates them; bump PREP_PLAN_TEMPLATE_VERSION to invalidate them otherwise
+# (or run manage.py clear_plan_templates)
+PREP_PLAN_TEMPLATE_VERSION = 1
+PREP_PLAN_TEMPLATE_TTL = 7 * 24 * 3600
+PREP_PLAN_TEMPLATE_MAX_ENTRIES = 1000
+
+# Background jobs of the AI views (core/jobs.py), queued in the database.
+# Workers run as `manage.py run_jobs` processes, or as JOBS_EMBEDDED_WORKERS
+# threads of the web process. Status pushes from a separate worker process only
+# reach sockets through the Redis channel layer, so without it the web process
+# runs the workers itself. A running job whose worker has not finished it within
+# JOBS_LEASE seconds is requeued, up to JOBS_MAX_ATTEMPTS attempts in total.
+JOBS_EMBEDDED_WORKERS = 0 if CHANNEL_REDIS_URL else 2
+JOBS_POLL_INTERVAL = 1.0
+JOBS_LEASE = 300
+JOBS_MAX_ATTEMPTS = 2
 
 TEMPLATES = [
     {
@@ -120,7 +243,7 @@ WSGI_APPLICATION = 'connect_conquer_backend.wsgi.application'
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'NAME': os.environ.get('DJANGO_SQLITE_PATH', BASE_DIR / 'db.sqlite3'),
     }
 }
 
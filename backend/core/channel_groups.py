@@ -0,0 +1,72 @@
+"""
+Channel-layer group names for discussion rooms.
+
+A room can be split into DISCUSSION_GROUP_SHARDS groups. Each socket joins
+one shard group (picked from its channel name) and broadcasts go to every
+shard. With the Redis layer, groups are spread across Redis hosts by name,
+so a hot room's fan-out no longer lands on a single group or host. With
+one shard the group is plain `discussion_<id>`.
+
+send_from_sync() runs a channel-layer send from sync code on the ASGI
+server's event loop (see its docstring).
+"""
+import asyncio
+import logging
+import threading
+import zlib
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# (event loop, its thread id) the consumers of this process run on, recorded when a socket connects
+_server_loop = (None, None)
+
+
+def discussion_group_names(topic_id):
+    """All channel-layer groups that make up a discussion room"""
+    shards = max(1, getattr(settings, 'DISCUSSION_GROUP_SHARDS', 1))
+    if shards == 1:
+        return [f'discussion_{topic_id}']
+    return [f'discussion_{topic_id}_shard{shard}' for shard in range(shards)]
+
+
+def discussion_group_for(topic_id, channel_name):
+    """The shard group a given channel joins for a discussion room"""
+    names = discussion_group_names(topic_id)
+    return names[zlib.crc32(channel_name.encode()) % len(names)]
+
+
+async def group_send_discussion(channel_layer, topic_id, message):
+    """Send a message to every shard group of a discussion room"""
+    await asyncio.gather(*(
+        channel_layer.group_send(name, message) for name in discussion_group_names(topic_id)
+    ))
+
+
+def remember_server_loop():
+    """Record the running loop as the one this process's consumers listen on"""
+    global _server_loop
+    _server_loop = (asyncio.get_running_loop(), threading.get_ident())
+
+
+def send_from_sync(send, *args):
+    """
+    Run the channel-layer coroutine `send(*args)` from sync code, blocking
+    until it is done. Threads the application starts itself (view count
+    flush timers, embedded job workers) have no event loop, and async_to_sync
+    would run the send on a fresh loop in that thread. The in-memory layer's
+    queues may only be used from the loop its consumers wait on, so those
+    sends are handed to the server's loop instead. Request threads, and
+    processes without sockets (manage.py commands), use async_to_sync.
+    """
+    loop, loop_thread = _server_loop
+    if loop is None or not loop.is_running() or loop_thread == threading.get_ident():
+        return async_to_sync(send)(*args)
+    future = asyncio.run_coroutine_threadsafe(send(*args), loop)
+    try:
+        return future.result(timeout=getattr(settings, 'CHANNEL_SEND_TIMEOUT', 5.0))
+    except TimeoutError:
+        future.cancel()
+        logger.warning('Channel layer send did not complete on the server loop')
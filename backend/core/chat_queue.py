@@ -0,0 +1,190 @@
+"""
+Write-behind persistence for discussion chat messages.
+
+DiscussionConsumer gives each chat message a ULID and broadcasts it right
+away; the message is then queued here. Queued messages are written in
+batches: one bulk INSERT for the batch, one statistics/activity update per
+topic (DiscussionPost.record_new_posts), one search-index write and one
+topic-list publish (core/topic_list.py) after the commit. Each
+submitted message gets a future that resolves to its post id once the
+batch is committed, which the consumer turns into a durability ack.
+"""
+import asyncio
+import logging
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime
+
+from channels.db import database_sync_to_async
+from django.conf import settings
+from django.db import IntegrityError, transaction
+
+from .models import DiscussionPost, DiscussionTopic
+from .search import SEARCH_DOCUMENTS, get_search_backend
+from .topic_list import POST_ACTIVITY_FIELDS, publish_topic_changes
+
+logger = logging.getLogger(__name__)
+
+
+class TopicUnavailable(Exception):
+    """The message's topic does not exist (any more)"""
+
+
+@dataclass
+class ChatMessage:
+    message_id: str
+    topic_id: int
+    content: str
+    author_id: int
+    author_name: str
+    created_at: datetime
+    sequence: int = None
+
+    @classmethod
+    def from_post(cls, post):
+        return cls(
+            message_id=post.message_id, topic_id=post.topic_id, content=post.content, author_id=post.author_id,
+            author_name=post.author_name, created_at=post.created_at, sequence=post.sequence,
+        )
+
+    def to_frame(self, timestamp=None):
+        """The chat_message frame sent to clients, live or on replay"""
+        return {
+            'type': 'chat_message',
+            'seq': self.sequence,
+            'message_id': self.message_id,
+            'content': self.content,
+            'author_name': self.author_name,
+            'author_id': self.author_id,
+            'created_at': self.created_at.isoformat(),
+            'timestamp': (timestamp or self.created_at).isoformat(),
+        }
+
+
+def write_chat_messages(messages):
+    """
+    Persist a batch of chat messages. Returns one result per message: the
+    new post id, or a TopicUnavailable error for messages whose topic is gone.
+
+    Consumers only queue messages for topics their cached state says exist,
+    so the batch is inserted without checking; only if a topic was deleted
+    in the meantime (a foreign key error) is the batch filtered and retried.
+    """
+    try:
+        posts = _insert_chat_messages(messages)
+    except IntegrityError:
+        topic_ids = {message.topic_id for message in messages}
+        existing_topics = set(DiscussionTopic.objects.filter(pk__in=topic_ids).values_list('pk', flat=True))
+        posts = _insert_chat_messages([message for message in messages if message.topic_id in existing_topics])
+
+    post_ids = {post.message_id: post.pk for post in posts}
+    return [
+        post_ids[message.message_id] if message.message_id in post_ids
+        else TopicUnavailable(f'Topic {message.topic_id} does not exist')
+        for message in messages
+    ]
+
+
+def _insert_chat_messages(writable):
+    with transaction.atomic():
+        posts = DiscussionPost.objects.bulk_create([
+            DiscussionPost(
+                message_id=message.message_id, topic_id=message.topic_id, content=message.content,
+                author_id=message.author_id, author_name=message.author_name, created_at=message.created_at,
+                sequence=message.sequence,
+            )
+            for message in writable
+        ])
+
+        newest_by_topic = {}
+        count_by_topic = defaultdict(int)
+        for post in posts:
+            count_by_topic[post.topic_id] += 1
+            newest = newest_by_topic.get(post.topic_id)
+            if newest is None or post.created_at >= newest.created_at:
+                newest_by_topic[post.topic_id] = post
+        for topic_id, newest in newest_by_topic.items():
+            DiscussionPost.record_new_posts(topic_id, count_by_topic[topic_id], newest.author_name, newest.created_at)
+
+        # bulk_create skips the post_save signal that indexes single posts
+        backend = get_search_backend()
+        if backend is not None:
+            backend.index_objects(SEARCH_DOCUMENTS['post'], posts)
+        publish_topic_changes(newest_by_topic, POST_ACTIVITY_FIELDS)
+    return posts
+
+
+class ChatWriteQueue:
+    """
+    Batches chat messages submitted from consumers on one event loop. A batch
+    is written `flush_interval` seconds after its first message, or as soon
+    as `max_batch` messages are waiting; batches are written one at a time.
+    """
+
+    def __init__(self, flush_interval=None, max_batch=None):
+        self._flush_interval = flush_interval
+        self._max_batch = max_batch
+        self._loop = None
+
+    @property
+    def flush_interval(self):
+        if self._flush_interval is not None:
+            return self._flush_interval
+        return getattr(settings, 'DISCUSSION_CHAT_FLUSH_INTERVAL', 0.1)
+
+    @property
+    def max_batch(self):
+        if self._max_batch is not None:
+            return self._max_batch
+        return getattr(settings, 'DISCUSSION_CHAT_MAX_BATCH', 200)
+
+    def _bind_loop(self):
+        # Futures and locks belong to one event loop (a fresh one per test)
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop = loop
+            self._pending = []
+            self._flush_task = None
+            self._write_lock = asyncio.Lock()
+        return loop
+
+    async def submit(self, message):
+        """Queue a ChatMessage; returns a future resolving to its post id once written"""
+        loop = self._bind_loop()
+        future = loop.create_future()
+        self._pending.append((message, future))
+        if len(self._pending) >= self.max_batch:
+            asyncio.ensure_future(self.flush())
+        elif self._flush_task is None:
+            self._flush_task = asyncio.ensure_future(self._flush_later())
+        return future
+
+    async def flush(self):
+        """Write everything queued so far (waiting for a batch already being written)"""
+        self._bind_loop()
+        async with self._write_lock:
+            if self._flush_task is not None and self._flush_task is not asyncio.current_task():
+                self._flush_task.cancel()
+            self._flush_task = None
+            batch, self._pending = self._pending, []
+            if not batch:
+                return
+            try:
+                results = await database_sync_to_async(write_chat_messages)([message for message, _ in batch])
+            except Exception as error:
+                logger.exception("Failed to write %d chat messages", len(batch))
+                results = [error] * len(batch)
+        for (_, future), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.flush_interval)
+        await self.flush()
+
+
+chat_write_queue = ChatWriteQueue()
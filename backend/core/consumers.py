@@ -1,16 +1,65 @@
-import json
+import asyncio
 import logging
+from urllib.parse import parse_qs
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
 from django.contrib.auth.models import User
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
 from .models import DiscussionTopic, DiscussionPost
-from .serializers import DiscussionPostSerializer, DiscussionTopicListSerializer
+from .serializers import DiscussionPostSerializer
+from .chat_queue import ChatMessage, chat_write_queue
+from .channel_groups import discussion_group_for, group_send_discussion, remember_server_loop
+from .fanout import OutboundBatcher
+from .jobs import job_group_name
+from .presence import presence_event, presence_registry
+from .replay import missed_frames, replay_buffers, sequence_allocator
+from .rate_limit import frame_rate_limiter, record_dropped_frame
+from .topic_list import list_group_name
+from .topic_state import TopicState, topic_state_cache
+from .ulid import new_ulid
+from .wire import FrameTooLarge, InvalidFrame, encode_frames, negotiate
+from django.conf import settings
 from django.utils import timezone
 
 # Set up logging
 logger = logging.getLogger(__name__)
 
-class DiscussionConsumer(AsyncWebsocketConsumer):
+
+class WireProtocolMixin:
+    """
+    Negotiates the connection's wire protocol (JSON, or MessagePack offered
+    through the WebSocket subprotocol header, see core/wire.py) and sends
+    frames encoded in it.
+    """
+
+    async def accept_negotiated(self):
+        # Sends from the process's own threads are run on this loop (see send_from_sync)
+        remember_server_loop()
+        self.codec = negotiate(self.scope.get('subprotocols'))
+        # Frames of a compressed stream must go out in the order they were compressed
+        self.send_lock = asyncio.Lock()
+        await self.accept(subprotocol=self.codec.subprotocol)
+
+    async def send_frame(self, payload):
+        await self.send_encoded(self.codec.encode(payload))
+
+    async def send_encoded(self, data):
+        async with self.send_lock:
+            await self.send(**self.codec.send_kwargs(data))
+
+    async def reject_frame(self, error):
+        """Answer an undecodable frame with an error; oversized frames also close the socket"""
+        await self.send_frame({
+            'type': 'error',
+            'message': str(error)
+        })
+        if isinstance(error, FrameTooLarge):
+            await self.close(code=1009)
+
+
+class DiscussionConsumer(WireProtocolMixin, AsyncWebsocketConsumer):
     """
     WebSocket consumer for real-time discussion in a specific topic.
     Handles real-time messaging within a discussion topic.
@@ -20,15 +69,23 @@ class DiscussionConsumer(AsyncWebsocketConsumer):
         try:
             logger.info("WebSocket connection attempt started")
             
-            self.topic_id = self.scope['url_route']['kwargs']['topic_id']
-            self.room_group_name = f'discussion_{self.topic_id}'
+            self.topic_id = int(self.scope['url_route']['kwargs']['topic_id'])
+            # Shard group of the room this socket listens on; broadcasts go to all shards
+            self.room_group_name = discussion_group_for(self.topic_id, self.channel_name)
             self.user = self.scope.get('user')
+            # Typing state of this socket; only start/stop transitions are broadcast
+            self.is_typing = False
+            self.typing_expiry = None
+            # Durability acks still waiting on the write-behind queue
+            self.pending_writes = set()
             
             logger.info(f"Topic ID: {self.topic_id}, User: {self.user}")
         
             # Accept connection regardless of authentication status
-            await self.accept()
+            await self.accept_negotiated()
             logger.info("WebSocket connection accepted")
+            # Broadcast frames to this socket are coalesced into short batches
+            self.outbound = OutboundBatcher(self.send_encoded, join=self.codec.join)
         
             # Join room group
             await self.channel_layer.group_add(
@@ -36,25 +93,44 @@ class DiscussionConsumer(AsyncWebsocketConsumer):
                 self.channel_name
             )
             logger.info(f"Added to group: {self.room_group_name}")
+            # While this process has sockets in the room it buffers its messages for replay
+            replay_buffers.attach(self.topic_id)
+            self.replay_attached = True
+            # ...and caches the topic's lock/active state, kept current by topic_state_changed
+            await topic_state_cache.attach(self.topic_id)
+            self.topic_state_attached = True
         
             # Send connection status
-            await self.send(text_data=json.dumps({
+            await self.send_frame({
                 'type': 'connection_established',
                 'authenticated': self.user and self.user.is_authenticated,
                 'message': 'Connected to discussion'
-            }))
+            })
             logger.info("Connection status sent")
+            
+            # Register presence in memory; the join is only broadcast for the
+            # user's first socket in the room
+            first_join = False
+            if self.user and self.user.is_authenticated:
+                first_join = presence_registry.join(
+                    self.topic_id, self.user.id, self.display_name(), self.channel_name
+                )
+            
+            # Snapshot of who is already here, so joiners don't wait for join events
+            await self.send_frame({
+                'type': 'presence_snapshot',
+                'users': presence_registry.online(self.topic_id)
+            })
+            
+            # A reconnecting client passes the last sequence it saw and gets only what it missed
+            resume_from = self.resume_from()
+            if resume_from is not None:
+                await self.replay(resume_from)
         
             # Send user join notification if authenticated
-            if self.user and self.user.is_authenticated:
-                await self.channel_layer.group_send(
-                    self.room_group_name,
-                    {
-                        'type': 'user_join',
-                        'user': self.user.first_name or self.user.username,
-                        'user_id': self.user.id,
-                        'timestamp': timezone.now().isoformat()
-                    }
+            if first_join:
+                await group_send_discussion(
+                    self.channel_layer, self.topic_id, presence_event('user_join', self.user.id, self.display_name())
                 )
                 logger.info("User join notification sent")
                 
@@ -62,20 +138,51 @@ class DiscussionConsumer(AsyncWebsocketConsumer):
             logger.error(f"Error in WebSocket connect: {e}")
             await self.close()
 
+    def resume_from(self):
+        query = parse_qs(self.scope.get('query_string', b'').decode('latin-1'))
+        try:
+            return max(0, int(query['resume_from'][0]))
+        except (KeyError, ValueError):
+            return None
+
+    async def replay(self, resume_from):
+        """Send the chat messages broadcast after `resume_from` as one array frame"""
+        frames = await missed_frames(self.topic_id, resume_from, replay_buffers)
+        if frames is None:
+            # Too far behind to replay; the client reloads the topic instead
+            await self.send_frame({'type': 'replay_truncated', 'resume_from': resume_from})
+            return
+        if frames:
+            await self.send_encoded(self.codec.join([self.codec.pick(encoded) for encoded in frames]))
+        await self.send_frame({
+            'type': 'replay_complete',
+            'resume_from': resume_from,
+            'replayed': len(frames)
+        })
+
     async def disconnect(self, close_code):
         try:
             logger.info(f"WebSocket disconnecting with code: {close_code}")
+            if hasattr(self, 'outbound'):
+                self.outbound.close()
+            if getattr(self, 'pending_writes', None):
+                # Make sure this socket's messages are written before it goes away
+                await chat_write_queue.flush()
+                for task in list(self.pending_writes):
+                    task.cancel()
+            if getattr(self, 'is_typing', False):
+                await self.set_typing(False)
+            if getattr(self, 'replay_attached', False):
+                replay_buffers.detach(self.topic_id)
+            if getattr(self, 'topic_state_attached', False):
+                topic_state_cache.detach(self.topic_id)
             
-            # Send user leave notification
-            if hasattr(self, 'user') and self.user and self.user.is_authenticated:
-                await self.channel_layer.group_send(
-                    self.room_group_name,
-                    {
-                        'type': 'user_leave',
-                        'user': self.user.first_name or self.user.username,
-                        'user_id': self.user.id,
-                        'timestamp': timezone.now().isoformat()
-                    }
+            # Send user leave notification once the user's last socket in the room closes
+            if hasattr(self, 'user') and self.user and self.user.is_authenticated and presence_registry.leave(
+                self.topic_id, self.user.id, self.channel_name
+            ):
+                await group_send_discussion(
+                    self.channel_layer, self.topic_id, presence_event('user_leave', self.user.id, self.display_name())
                 )
         
             # Leave room group
@@ -90,29 +197,61 @@ class DiscussionConsumer(AsyncWebsocketConsumer):
         except Exception as e:
             logger.error(f"Error in WebSocket disconnect: {e}", exc_info=True)
 
-    async def receive(self, text_data):
+    async def receive(self, text_data=None, bytes_data=None):
         """Handle incoming WebSocket messages"""
         try:
-            data = json.loads(text_data)
+            data = self.codec.decode_frame(text_data, bytes_data)
             message_type = data.get('type')
             
+            if not await self.allow_frame(message_type):
+                return
+            
+            if self.user and self.user.is_authenticated:
+                # Any frame counts as a presence heartbeat. A socket that had
+                # expired is back online: resend the snapshot and announce it
+                if presence_registry.heartbeat(self.topic_id, self.user.id, self.display_name(), self.channel_name):
+                    await self.send_frame({
+                        'type': 'presence_snapshot',
+                        'users': presence_registry.online(self.topic_id)
+                    })
+                    await group_send_discussion(
+                        self.channel_layer, self.topic_id, presence_event('user_join', self.user.id, self.display_name())
+                    )
+            
             if message_type == 'chat_message':
                 await self.handle_chat_message(data)
             elif message_type == 'typing':
                 await self.handle_typing_notification(data)
             elif message_type == 'ping':
-                await self.send(text_data=json.dumps({'type': 'pong'}))
+                await self.send_frame({'type': 'pong'})
                 
-        except json.JSONDecodeError:
-            await self.send(text_data=json.dumps({
-                'type': 'error',
-                'message': 'Invalid JSON format'
-            }))
+        except InvalidFrame as e:
+            await self.reject_frame(e)
         except Exception as e:
-            await self.send(text_data=json.dumps({
+            await self.send_frame({
                 'type': 'error', 
                 'message': f'Error processing message: {str(e)}'
-            }))
+            })
+
+    def display_name(self):
+        return self.user.first_name or self.user.username
+
+    async def allow_frame(self, message_type):
+        """Spend a token from the user's frame bucket; over-limit frames are dropped"""
+        if self.user and self.user.is_authenticated:
+            key = f'user:{self.user.id}'
+        else:
+            key = f'channel:{self.channel_name}'
+        if frame_rate_limiter.allow(key):
+            return True
+        record_dropped_frame('rate_limited', message_type)
+        if message_type == 'chat_message':
+            await self.send_frame({
+                'type': 'error',
+                'message': 'You are sending messages too quickly. Please slow down.',
+                'code': 'rate_limited'
+            })
+        return False
 
     async def handle_chat_message(self, data):
         """Handle new chat messages"""
@@ -132,94 +271,160 @@ class DiscussionConsumer(AsyncWebsocketConsumer):
         #     }))
         #     return
         
-        # Save message to database
-        post = await self.save_message(content)
-        if post:
-            logger.info(f"Broadcasting message to group: {self.room_group_name}")
-            # Broadcast message to room group
-            await self.channel_layer.group_send(
-                self.room_group_name,
+        # Locked or removed topics are rejected from the cached state, without a query
+        rejection = topic_state_cache.get(self.topic_id).rejection()
+        if rejection:
+            code, reason = rejection
+            await self.send_frame({
+                'type': 'error',
+                'message': reason,
+                'code': code,
+                'client_ref': data.get('client_ref')
+            })
+            return
+        
+        # Assign the message its id up front, broadcast it right away and let
+        # the write-behind queue persist it; the sender is acked once it is durable
+        message = self.build_message(content)
+        message.sequence = await sequence_allocator.next(self.topic_id)
+        written = await chat_write_queue.submit(message)
+        if self.is_typing:
+            await self.set_typing(False)
+        
+        logger.info(f"Broadcasting message to group: {self.room_group_name}")
+        # Broadcast message to room group; the client frame is serialized once here
+        await group_send_discussion(
+            self.channel_layer, self.topic_id,
+            {
+                'type': 'chat_message_broadcast',
+                'seq': message.sequence,
+                'message_id': message.message_id,
+                **encode_frames(message.to_frame(timezone.now())),
+                'sender_channel': self.channel_name # Add sender_channel to event
+            }
+        )
+        
+        client_ref = data.get('client_ref')
+        await self.send_frame({
+            'type': 'message_ack',
+            'status': 'accepted',
+            'message_id': message.message_id,
+            'client_ref': client_ref
+        })
+        task = asyncio.ensure_future(self.confirm_write(message, written, client_ref))
+        self.pending_writes.add(task)
+        task.add_done_callback(self.pending_writes.discard)
+
+    def build_message(self, content):
+        """Build a ChatMessage for the write-behind queue"""
+        if self.user and self.user.is_authenticated:
+            author_id, author_name = self.user.id, self.display_name()
+            logger.info(f"Authenticated user sending message: {author_name}")
+        else:
+            author_id, author_name = None, 'Anonymous'
+            logger.warning("Unauthenticated user trying to send message")
+        return ChatMessage(
+            message_id=new_ulid(),
+            topic_id=self.topic_id,
+            content=content,
+            author_id=author_id,
+            author_name=author_name,
+            created_at=timezone.now()
+        )
+
+    async def confirm_write(self, message, written, client_ref):
+        """Ack the sender once the message is persisted, or retract it if the write failed"""
+        try:
+            post_id = await written
+        except Exception as e:
+            logger.error(f"Failed to save message {message.message_id}: {e}")
+            await group_send_discussion(
+                self.channel_layer, self.topic_id,
                 {
-                    'type': 'chat_message_broadcast',
-                    'post_id': post['id'],
-                    'content': post['content'],
-                    'author_name': post['author_name'],
-                    'author_id': self.user.id if self.user and self.user.is_authenticated else None,
-                    'created_at': post['created_at'],
-                    'timestamp': timezone.now().isoformat(),
-                    'sender_channel': self.channel_name # Add sender_channel to event
+                    'type': 'chat_message_retracted',
+                    'message_id': message.message_id,
+                    **encode_frames({
+                        'type': 'chat_message_retracted',
+                        'message_id': message.message_id
+                    }),
+                    'sender_channel': self.channel_name
                 }
             )
-        else:
-            logger.error("Failed to save message to database")
-            await self.send(text_data=json.dumps({
+            await self.send_frame({
                 'type': 'error',
                 'message': 'Failed to save message. Please try again.',
-                'code': 'save_failed'
-            }))
+                'code': 'save_failed',
+                'message_id': message.message_id,
+                'client_ref': client_ref
+            })
+            return
+        logger.info(f"Message saved successfully: {post_id}")
+        await self.send_frame({
+            'type': 'message_ack',
+            'status': 'persisted',
+            'message_id': message.message_id,
+            'post_id': post_id,
+            'client_ref': client_ref
+        })
 
     async def handle_typing_notification(self, data):
         """Handle typing notifications"""
         if not self.user or not self.user.is_authenticated:
             return
             
-        is_typing = data.get('is_typing', False)
+        is_typing = bool(data.get('is_typing', False))
+        
+        if is_typing:
+            # Every keystroke pushes back the expiry, but only the start is broadcast
+            self.restart_typing_expiry()
+        if is_typing == self.is_typing:
+            record_dropped_frame('typing_debounced', 'typing')
+            return
+        await self.set_typing(is_typing)
+
+    def restart_typing_expiry(self):
+        if self.typing_expiry is not None:
+            self.typing_expiry.cancel()
+        self.typing_expiry = asyncio.ensure_future(self.expire_typing())
+
+    async def expire_typing(self):
+        """Broadcast a stop if the client goes quiet without sending one"""
+        await asyncio.sleep(getattr(settings, 'DISCUSSION_TYPING_TIMEOUT', 5.0))
+        self.typing_expiry = None
+        await self.set_typing(False)
+
+    async def set_typing(self, is_typing):
+        """Record and broadcast a typing start/stop transition"""
+        if not is_typing and self.typing_expiry is not None:
+            self.typing_expiry.cancel()
+            self.typing_expiry = None
+        self.is_typing = is_typing
         
         # Broadcast typing status to room group (excluding sender)
-        await self.channel_layer.group_send(
-            self.room_group_name,
+        await group_send_discussion(
+            self.channel_layer, self.topic_id,
             {
                 'type': 'typing_notification',
-                'user': self.user.first_name or self.user.username,
                 'user_id': self.user.id,
-                'is_typing': is_typing,
+                **encode_frames({
+                    'type': 'typing',
+                    'user': self.display_name(),
+                    'user_id': self.user.id,
+                    'is_typing': is_typing
+                }),
                 'sender_channel': self.channel_name
             }
         )
 
-    @database_sync_to_async
-    def save_message(self, content):
-        """Save message to database"""
-        try:
-            topic = DiscussionTopic.objects.get(id=self.topic_id)
-            
-            # Set author information
-            author_name = 'Anonymous'
-            author = None
-            
-            if self.user and self.user.is_authenticated:
-                author = self.user
-                author_name = self.user.first_name or self.user.username
-                logger.info(f"Authenticated user sending message: {author_name}")
-            else:
-                logger.warning("Unauthenticated user trying to send message")
-            
-            post = DiscussionPost.objects.create(
-                topic=topic,
-                content=content,
-                author=author,
-                author_name=author_name
-            )
-            
-            logger.info(f"Message saved successfully: {post.id}")
-            
-            # Return serialized post data
-            return {
-                'id': post.id,
-                'content': post.content,
-                'author_name': post.author_name,
-                'created_at': post.created_at.isoformat()
-            }
-        except DiscussionTopic.DoesNotExist:
-            logger.error(f"Topic {self.topic_id} does not exist")
-            return None
-        except Exception as e:
-            logger.error(f"Error saving message: {e}", exc_info=True)
-            return None
-
     # WebSocket message handlers
+    # Group events carry their client frame encoded once per wire format; this
+    # socket's encoding is queued on its OutboundBatcher and sent in an array frame
     async def chat_message_broadcast(self, event):
         """Send chat message to WebSocket (excluding sender)"""
+        replay_buffers.record(self.topic_id, event.get('seq'), event.get('message_id'), {
+            key: event[key] for key in ('frame', 'packed') if key in event
+        })
+        
         # Don't send the message back to the sender to avoid duplicates
         sender_channel = event.get('sender_channel')
         logger.debug(f"Broadcasting message. Sender channel: {sender_channel}, Current channel: {self.channel_name}")
@@ -229,53 +434,43 @@ class DiscussionConsumer(AsyncWebsocketConsumer):
             return
             
         logger.debug("Broadcasting message to non-sender")
-        await self.send(text_data=json.dumps({
-            'type': 'chat_message',
-            'post_id': event['post_id'],
-            'content': event['content'],
-            'author_name': event['author_name'],
-            'author_id': event['author_id'],
-            'created_at': event['created_at'],
-            'timestamp': event['timestamp']
-        }))
+        await self.outbound.add(self.codec.pick(event))
+
+    async def chat_message_retracted(self, event):
+        """Tell other sockets to drop a broadcast message that could not be saved"""
+        replay_buffers.discard(self.topic_id, event['message_id'])
+        if event['sender_channel'] != self.channel_name:
+            await self.outbound.add(self.codec.pick(event))
+
+    async def topic_state_changed(self, event):
+        """Update the cached topic state (locked, deactivated, deleted) and tell the client"""
+        topic_state_cache.update(self.topic_id, TopicState(**event['state']))
+        await self.outbound.add(self.codec.pick(event), key='topic_state')
 
     async def typing_notification(self, event):
         """Send typing notification to WebSocket (excluding sender)"""
         if event['sender_channel'] != self.channel_name:
-            await self.send(text_data=json.dumps({
-                'type': 'typing',
-                'user': event['user'],
-                'user_id': event['user_id'],
-                'is_typing': event['is_typing']
-            }))
+            # Only the latest typing state per user within a batch is sent
+            await self.outbound.add(self.codec.pick(event), key=('typing', event['user_id']))
 
     async def user_join(self, event):
         """Send user join notification to WebSocket"""
-        await self.send(text_data=json.dumps({
-            'type': 'user_join',
-            'user': event['user'],
-            'user_id': event['user_id'],
-            'timestamp': event['timestamp']
-        }))
+        await self.outbound.add(self.codec.pick(event), key=('presence', event['user_id']))
 
     async def user_leave(self, event):
         """Send user leave notification to WebSocket"""
-        await self.send(text_data=json.dumps({
-            'type': 'user_leave',
-            'user': event['user'],
-            'user_id': event['user_id'],
-            'timestamp': event['timestamp']
-        }))
+        await self.outbound.add(self.codec.pick(event), key=('presence', event['user_id']))
 
 
-class DiscussionListConsumer(AsyncWebsocketConsumer):
+class DiscussionListConsumer(WireProtocolMixin, AsyncWebsocketConsumer):
     """
     WebSocket consumer for real-time updates to the discussion topics list.
-    Handles notifications when new topics are created or updated.
+    Lists of one category connect with ?category=<id>; new topics and
+    topic deltas are pushed by core/topic_list.py.
     """
     
     async def connect(self):
-        self.room_group_name = 'discussion_list'
+        self.room_group_name = list_group_name(self.category_id())
         self.user = self.scope.get('user')
         
         # Join room group
@@ -284,87 +479,124 @@ class DiscussionListConsumer(AsyncWebsocketConsumer):
             self.channel_name
         )
         
-        await self.accept()
+        await self.accept_negotiated()
+        # A view-count flush updates many topics at once; send them in batches
+        self.outbound = OutboundBatcher(self.send_encoded, join=self.codec.join)
 
     async def disconnect(self, close_code):
+        if hasattr(self, 'outbound'):
+            self.outbound.close()
         # Leave room group
         await self.channel_layer.group_discard(
             self.room_group_name,
             self.channel_name
         )
 
-    async def receive(self, text_data):
+    def category_id(self):
+        query = parse_qs(self.scope.get('query_string', b'').decode('latin-1'))
+        try:
+            return int(query['category'][0])
+        except (KeyError, ValueError):
+            return None
+
+    async def receive(self, text_data=None, bytes_data=None):
         """Handle incoming WebSocket messages"""
         try:
-            data = json.loads(text_data)
+            data = self.codec.decode_frame(text_data, bytes_data)
             message_type = data.get('type')
             
             if message_type == 'new_topic':
                 await self.handle_new_topic(data)
             elif message_type == 'ping':
-                await self.send(text_data=json.dumps({'type': 'pong'}))
+                await self.send_frame({'type': 'pong'})
                 
-        except json.JSONDecodeError:
-            await self.send(text_data=json.dumps({
-                'type': 'error',
-                'message': 'Invalid JSON format'
-            }))
+        except InvalidFrame as e:
+            await self.reject_frame(e)
 
     async def handle_new_topic(self, data):
-        """Handle new topic creation"""
+        """Handle new topic creation; the topic is pushed to the lists once saved"""
         title = data.get('title', '').strip()
         author_name = data.get('author_name', 'Anonymous').strip()
         
         if not title:
             return
             
-        # Save new topic to database
-        topic = await self.save_topic(title, author_name)
-        if topic:
-            # Broadcast new topic to all connected clients
-            await self.channel_layer.group_send(
-                self.room_group_name,
-                {
-                    'type': 'new_topic_broadcast',
-                    'topic_data': topic
-                }
-            )
+        await self.save_topic(title, author_name)
 
     @database_sync_to_async
     def save_topic(self, title, author_name):
         """Save new topic to database"""
         try:
-            topic = DiscussionTopic.objects.create(
+            return DiscussionTopic.objects.create(
                 title=title,
                 author_name=author_name or 'Anonymous'
             )
-            
-            # Return serialized topic data
-            return {
-                'id': topic.id,
-                'title': topic.title,
-                'author_name': topic.author_name,
-                'created_at': topic.created_at.isoformat(),
-                'post_count': 0,
-                'related_skill_name': None,
-                'related_company_name': None
-            }
         except Exception as e:
             print(f"Error saving topic: {e}")
             return None
 
     # WebSocket message handlers
-    async def new_topic_broadcast(self, event):
-        """Send new topic notification to WebSocket"""
-        await self.send(text_data=json.dumps({
-            'type': 'new_topic',
-            'topic': event['topic_data']
-        }))
-
-    async def topic_updated(self, event):
-        """Send topic update notification to WebSocket"""
-        await self.send(text_data=json.dumps({
-            'type': 'topic_updated',
-            'topic_id': event['topic_id'],
-            'post_count': event['post_count']
-        })) 
\ No newline at end of file
+    async def topic_list_frames(self, event):
+        """Queue new_topic frames and topic_updated deltas for this list"""
+        for frames in event['frames']:
+            await self.outbound.add(self.codec.pick(frames))
+
+
+class JobsConsumer(WireProtocolMixin, AsyncWebsocketConsumer):
+    """
+    WebSocket consumer pushing the status changes of the user's background
+    jobs (core/jobs.py). The frontend authenticates with JWTs, which browsers
+    cannot send as WebSocket headers, so clients connect with ?token=<access
+    token>; a session-authenticated scope user works as well.
+    """
+
+    async def connect(self):
+        self.user = await self.authenticate()
+        if self.user is None:
+            await self.close(code=4401)
+            return
+
+        self.room_group_name = job_group_name(self.user.id)
+        await self.channel_layer.group_add(
+            self.room_group_name,
+            self.channel_name
+        )
+        await self.accept_negotiated()
+
+    async def disconnect(self, close_code):
+        if hasattr(self, 'room_group_name'):
+            await self.channel_layer.group_discard(
+                self.room_group_name,
+                self.channel_name
+            )
+
+    async def authenticate(self):
+        user = self.scope.get('user')
+        if user and user.is_authenticated:
+            return user
+        query = parse_qs(self.scope.get('query_string', b'').decode('latin-1'))
+        token = query.get('token', [None])[0]
+        if not token:
+            return None
+        return await self.user_for_token(token)
+
+    @database_sync_to_async
+    def user_for_token(self, token):
+        authentication = JWTAuthentication()
+        try:
+            return authentication.get_user(authentication.get_validated_token(token))
+        except (InvalidToken, AuthenticationFailed):
+            return None
+
+    async def receive(self, text_data=None, bytes_data=None):
+        try:
+            data = self.codec.decode_frame(text_data, bytes_data)
+            if data.get('type') == 'ping':
+                await self.send_frame({'type': 'pong'})
+        except InvalidFrame as e:
+            await self.reject_frame(e)
+
+    # WebSocket message handlers
+    async def job_update(self, event):
+        """Send a job status change to WebSocket"""
+        await self.send_encoded(self.codec.pick(event))
@@ -0,0 +1,185 @@
+"""
+Persistent cache of AITopicExplainerView answers.
+
+An explanation depends only on the topic name, description, skill context
+and user level, and many users ask about the same plan topics. Answers are
+therefore stored in TopicExplanation rows:
+
+* Keys hash the inputs after normalization (Unicode NFKC, case folding,
+  collapsed whitespace, surrounding punctuation), so "Binary Search?" and
+  "binary  search" share an entry.
+* Keys are namespaced by the model and TOPIC_EXPLANATION_PROMPT_VERSION.
+  Changing either starts a fresh cache, and the old rows are evicted.
+* Entries expire TOPIC_EXPLANATION_CACHE_TTL seconds after they were
+  generated. Beyond TOPIC_EXPLANATION_CACHE_MAX_ENTRIES entries or
+  TOPIC_EXPLANATION_CACHE_MAX_BYTES in total, the least recently used
+  entries are evicted.
+* Explanations larger than TOPIC_EXPLANATION_CACHE_MAX_ENTRY_BYTES are
+  not stored.
+* Concurrent misses for the same key in this process share one upstream
+  call (single flight), streamed (stream()) or not.
+
+Hit, miss, coalesced and eviction counts are kept per process (stats()).
+"""
+import asyncio
+import hashlib
+import json
+import threading
+import unicodedata
+from collections import Counter
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import Count, F, Q, Sum
+from django.utils import timezone
+
+from .llm import LLMError, llm_gateway
+from .models import TopicExplanation
+from .single_flight import SingleFlight
+
+INPUT_FIELDS = ('topic_name', 'topic_description', 'skill_context', 'user_level')
+
+
+def normalize_text(value):
+    value = unicodedata.normalize('NFKC', value or '')
+    return ' '.join(value.casefold().split()).strip(' .,;:!?')
+
+
+def normalize_inputs(**inputs):
+    return {field: normalize_text(inputs.get(field, '')) for field in INPUT_FIELDS}
+
+
+class ExplanationCache:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._single_flight = SingleFlight()
+        self._counts = Counter()
+
+    @property
+    def namespace(self):
+        return f"{llm_gateway.model}:v{getattr(settings, 'TOPIC_EXPLANATION_PROMPT_VERSION', 1)}"
+
+    @property
+    def ttl(self):
+        return timedelta(seconds=getattr(settings, 'TOPIC_EXPLANATION_CACHE_TTL', 30 * 24 * 3600))
+
+    def key(self, inputs):
+        material = json.dumps({'namespace': self.namespace, **normalize_inputs(**inputs)}, sort_keys=True)
+        return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+    def get(self, inputs):
+        """The cached explanation for the inputs, or None"""
+        key = self.key(inputs)
+        entry = TopicExplanation.objects.filter(
+            key=key, created_at__gte=timezone.now() - self.ttl
+        ).values_list('explanation', flat=True).first()
+        if entry is None:
+            return None
+        TopicExplanation.objects.filter(key=key).update(last_used_at=timezone.now(), hits=F('hits') + 1)
+        self._count('hits')
+        return entry
+
+    def get_or_generate(self, inputs, generate):
+        """(explanation, cached): the cached explanation, or the one `generate()` returns, which is then stored"""
+        explanation = self.get(inputs)
+        if explanation is not None:
+            return explanation, True
+
+        explanation, shared = self._single_flight.do(self.key(inputs), lambda: self._generate(inputs, generate))
+        if shared:
+            self._count('coalesced')
+        return explanation, False
+
+    def _generate(self, inputs, generate):
+        self._count('misses')
+        explanation = generate()
+        self.store(inputs, explanation)
+        return explanation
+
+    async def stream(self, inputs, chunks):
+        """
+        Relay the text chunks of a miss (e.g. LLMGateway.astream()) and store
+        the whole explanation once the stream completes. The first miss for a
+        key leads; misses that arrive while it streams do not call the model
+        and get the whole explanation (or the error) once the leader is done.
+        """
+        key = self.key(inputs)
+        future, leader = self._single_flight.begin(key)
+        if not leader:
+            self._count('coalesced')
+            await chunks.aclose()
+            # A follower that disconnects must not cancel the shared call
+            yield await asyncio.shield(asyncio.wrap_future(future))
+            return
+
+        self._count('misses')
+        parts = []
+        try:
+            async for text in chunks:
+                parts.append(text)
+                yield text
+            explanation = ''.join(parts)
+            await sync_to_async(self.store)(inputs, explanation)
+        except Exception as e:
+            self._single_flight.finish(key, error=e)
+            raise
+        except BaseException:
+            # The leader's client disconnected; its followers get an error and can retry
+            self._single_flight.finish(key, error=LLMError('The request generating this explanation was cancelled'))
+            raise
+        self._single_flight.finish(key, explanation)
+
+    def store(self, inputs, explanation):
+        size = len(explanation.encode('utf-8'))
+        if not explanation or size > getattr(settings, 'TOPIC_EXPLANATION_CACHE_MAX_ENTRY_BYTES', 64 * 1024):
+            self._count('not_stored')
+            return
+        normalized = normalize_inputs(**inputs)
+        now = timezone.now()
+        TopicExplanation.objects.update_or_create(key=self.key(inputs), defaults={
+            'namespace': self.namespace,
+            'topic_name': normalized['topic_name'][:200],
+            'skill_context': normalized['skill_context'][:200],
+            'user_level': normalized['user_level'][:50],
+            'explanation': explanation,
+            'size': size,
+            'hits': 0,
+            'created_at': now,
+            'last_used_at': now,
+        })
+        self.evict()
+
+    def evict(self):
+        """Delete expired entries and entries of other namespaces, then the least recently used over the limits"""
+        evicted, _ = TopicExplanation.objects.filter(
+            Q(created_at__lt=timezone.now() - self.ttl) | ~Q(namespace=self.namespace)
+        ).delete()
+
+        totals = TopicExplanation.objects.aggregate(entries=Count('pk'), size=Sum('size'))
+        excess_entries = totals['entries'] - getattr(settings, 'TOPIC_EXPLANATION_CACHE_MAX_ENTRIES', 5000)
+        excess_bytes = (totals['size'] or 0) - getattr(settings, 'TOPIC_EXPLANATION_CACHE_MAX_BYTES', 50 * 1024 * 1024)
+        victims = []
+        if excess_entries > 0 or excess_bytes > 0:
+            for pk, size in TopicExplanation.objects.order_by('last_used_at').values_list('pk', 'size').iterator():
+                if excess_entries <= 0 and excess_bytes <= 0:
+                    break
+                victims.append(pk)
+                excess_entries -= 1
+                excess_bytes -= size
+            evicted += TopicExplanation.objects.filter(pk__in=victims).delete()[0]
+        self._count('evictions', evicted)
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self._counts)
+        lookups = counts.get('hits', 0) + counts.get('misses', 0) + counts.get('coalesced', 0)
+        counts['hit_ratio'] = round(counts.get('hits', 0) / lookups, 3) if lookups else None
+        return counts
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self._counts[name] += amount
+
+
+topic_explanation_cache = ExplanationCache()
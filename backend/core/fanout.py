@@ -0,0 +1,71 @@
+"""
+Outbound batching for discussion WebSockets.
+
+Broadcast events carry their client frame already encoded (once, by the
+sender; see core/wire.py) so receivers only queue it. Each socket collects
+frames for a short window and sends them as a single array frame; frames
+with a coalescing key (e.g. one user's typing state) replace the earlier
+pending frame with the same key, so only the latest state goes out.
+"""
+import asyncio
+
+from django.conf import settings
+
+
+def join_json(frames):
+    return '[' + ','.join(frames) + ']'
+
+
+class OutboundBatcher:
+    """
+    Per-socket queue of encoded frames, flushed as one array frame (built by
+    `join`, a JSON array by default) `window` seconds after the first frame is queued, or immediately once
+    `max_batch` frames are waiting. A window of 0 sends every frame at once.
+    """
+
+    def __init__(self, send, window=None, max_batch=None, join=join_json):
+        self._send = send
+        self._join = join
+        self.window = getattr(settings, 'DISCUSSION_FANOUT_WINDOW', 0.05) if window is None else window
+        self.max_batch = getattr(settings, 'DISCUSSION_FANOUT_MAX_BATCH', 100) if max_batch is None else max_batch
+        # Insertion-ordered; coalesced frames are keyed by their coalescing key,
+        # everything else by a sequence number
+        self._pending = {}
+        self._sequence = 0
+        self._flush_task = None
+        self.frames_coalesced = 0
+
+    async def add(self, frame, key=None):
+        """Queue an encoded frame; a frame with `key` replaces the pending frame with the same key"""
+        if key is None:
+            self._sequence += 1
+            key = self._sequence
+        elif self._pending.pop(key, None) is not None:
+            self.frames_coalesced += 1
+        self._pending[key] = frame
+
+        if self.window <= 0 or len(self._pending) >= self.max_batch:
+            await self.flush()
+        elif self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_later())
+
+    async def flush(self):
+        """Send all pending frames now as one array frame"""
+        if self._flush_task is not None and self._flush_task is not asyncio.current_task():
+            self._flush_task.cancel()
+        self._flush_task = None
+        if not self._pending:
+            return
+        frames, self._pending = list(self._pending.values()), {}
+        await self._send(self._join(frames))
+
+    def close(self):
+        """Drop pending frames and stop the flush timer (the socket is gone)"""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        self._pending = {}
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.window)
+        await self.flush()
@@ -0,0 +1,214 @@
+"""
+Background jobs for the long-running AI views.
+
+PersonalizedPrepPlanView, GenerateMockInterviewView,
+EvaluateInterviewAnswersView and ResumeCheckerAPIView validate a request
+inline. With background=true (in the body or the query string) they then
+store the validated input as a Job row and answer 202 with the job id,
+instead of generating for tens of seconds in the request thread.
+
+Workers claim queued jobs from the database and run the view's run_job()
+with the stored input. The response data the view would have returned is
+saved as the job's result, served by /api/jobs/<id>/result/. Every status
+change is pushed to the user's sockets on /ws/jobs/ (JobsConsumer).
+
+There is no broker. Workers run either as ``manage.py run_jobs`` processes
+or, with JOBS_EMBEDDED_WORKERS > 0, as threads of the web process. Pushes
+from a separate worker process need the Redis channel layer
+(CHANNEL_REDIS_URL). With the in-memory layer, use the embedded workers,
+which push to the web process's own sockets; their pushes run on the
+server's event loop (send_from_sync). Claims are compare-and-set
+updates, so any number of workers can share the queue. A running job holds
+a lease of JOBS_LEASE seconds, and a job whose worker died is requeued
+(up to JOBS_MAX_ATTEMPTS attempts).
+"""
+import logging
+import threading
+from datetime import timedelta
+
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from rest_framework import status
+from rest_framework.response import Response
+
+from .channel_groups import send_from_sync
+from .models import Job
+from .serializers import JobSerializer
+from .sse import TRUE_VALUES
+from .wire import encode_frames
+
+logger = logging.getLogger(__name__)
+
+# Job kind -> view whose run_job(user, payload) runs it
+JOB_VIEWS = {
+    'prep_plan': 'core.views.PersonalizedPrepPlanView',
+    'mock_interview': 'core.views.GenerateMockInterviewView',
+    'answer_evaluation': 'core.views.EvaluateInterviewAnswersView',
+    'resume_analysis': 'core.views.ResumeCheckerAPIView',
+}
+
+
+def job_group_name(user_id):
+    return f'jobs_user_{user_id}'
+
+
+def wants_background(request):
+    return request.query_params.get('background', request.data.get('background', False)) in TRUE_VALUES
+
+
+class BackgroundJobMixin:
+    """
+    For views that can run as a job: post() validates the request, builds a
+    JSON payload and returns enqueue_or_run(request, payload). run_job(user,
+    payload) does the work and returns the Response, inline or in a worker.
+    """
+    job_kind = None
+
+    def enqueue_or_run(self, request, payload):
+        if not wants_background(request):
+            return self.run_job(request.user, payload)
+        job = enqueue(self.job_kind, request.user, payload)
+        return Response(JobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+    def run_job(self, user, payload):
+        raise NotImplementedError
+
+
+def enqueue(kind, user, payload):
+    if kind not in JOB_VIEWS:
+        raise ValueError(f'Unknown job kind: {kind}')
+    job = Job.objects.create(kind=kind, user=user, payload=payload)
+    embedded_workers.start()
+    transaction.on_commit(embedded_workers.wake, robust=True)
+    return job
+
+
+def publish_job_update(job):
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    frame = {
+        'type': 'job_update',
+        'job_id': job.id,
+        'kind': job.kind,
+        'status': job.status,
+        'error': job.error or None,
+        'result_url': reverse('job-result', args=[job.id]),
+    }
+    send_from_sync(channel_layer.group_send, job_group_name(job.user_id), {'type': 'job_update', **encode_frames(frame)})
+
+
+class JobWorker:
+    def __init__(self, lease=None, max_attempts=None):
+        self._lease = lease
+        self._max_attempts = max_attempts
+
+    @property
+    def lease(self):
+        return timedelta(seconds=self._lease if self._lease is not None else getattr(settings, 'JOBS_LEASE', 300))
+
+    @property
+    def max_attempts(self):
+        if self._max_attempts is not None:
+            return self._max_attempts
+        return getattr(settings, 'JOBS_MAX_ATTEMPTS', 2)
+
+    def run(self, stop, wake=None, poll_interval=None):
+        """Run jobs until `stop` (a threading.Event) is set; idle workers wait on `wake` (or `stop`)"""
+        poll_interval = poll_interval if poll_interval is not None else getattr(settings, 'JOBS_POLL_INTERVAL', 1.0)
+        while not stop.is_set():
+            try:
+                ran = self.run_once()
+            except Exception:
+                logger.exception('Job worker iteration failed')
+                ran = False
+            finally:
+                close_old_connections()
+            if not ran:
+                (wake or stop).wait(poll_interval)
+                if wake is not None:
+                    wake.clear()
+
+    def run_once(self):
+        """Run the oldest queued job; False if there was none"""
+        self.requeue_expired()
+        job = self.claim()
+        if job is None:
+            return False
+        self.execute(job)
+        return True
+
+    def claim(self):
+        for job_id in Job.objects.filter(status=Job.QUEUED).order_by('created_at').values_list('pk', flat=True)[:10]:
+            now = timezone.now()
+            # Compare-and-set: only one worker moves a job out of the queue
+            claimed = Job.objects.filter(pk=job_id, status=Job.QUEUED).update(
+                status=Job.RUNNING, started_at=now, locked_until=now + self.lease, attempts=F('attempts') + 1
+            )
+            if claimed:
+                job = Job.objects.select_related('user').get(pk=job_id)
+                publish_job_update(job)
+                return job
+        return None
+
+    def execute(self, job):
+        try:
+            view = import_string(JOB_VIEWS[job.kind])()
+            response = view.run_job(job.user, job.payload)
+        except Exception as e:
+            logger.exception('Job %s (%s) failed', job.id, job.kind)
+            job.status, job.error = Job.FAILED, str(e) or type(e).__name__
+        else:
+            job.status, job.result, job.result_status = Job.SUCCEEDED, response.data, response.status_code
+        job.finished_at = timezone.now()
+        job.locked_until = None
+        job.save(update_fields=['status', 'result', 'result_status', 'error', 'finished_at', 'locked_until'])
+        publish_job_update(job)
+
+    def requeue_expired(self):
+        """Requeue running jobs whose lease has passed, or fail them after JOBS_MAX_ATTEMPTS attempts"""
+        expired = Job.objects.filter(status=Job.RUNNING, locked_until__lt=timezone.now())
+        for job in expired.select_related('user'):
+            if job.attempts < self.max_attempts:
+                updated = expired.filter(pk=job.pk).update(status=Job.QUEUED, locked_until=None)
+                job.status = Job.QUEUED
+            else:
+                job.status, job.error = Job.FAILED, 'The worker running this job stopped'
+                updated = expired.filter(pk=job.pk).update(
+                    status=Job.FAILED, error=job.error, locked_until=None, finished_at=timezone.now()
+                )
+            if updated:
+                publish_job_update(job)
+
+
+class EmbeddedWorkers:
+    """JOBS_EMBEDDED_WORKERS worker threads in the web process, started with the first enqueued job"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._threads = []
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+
+    def start(self):
+        count = getattr(settings, 'JOBS_EMBEDDED_WORKERS', 0)
+        with self._lock:
+            if self._threads or count <= 0:
+                return
+            for index in range(count):
+                thread = threading.Thread(
+                    target=JobWorker().run, args=(self._stop, self._wake), name=f'job-worker-{index}', daemon=True
+                )
+                thread.start()
+                self._threads.append(thread)
+
+    def wake(self):
+        self._wake.set()
+
+
+embedded_workers = EmbeddedWorkers()
@@ -0,0 +1,288 @@
+"""
+Shared gateway for the Gemini calls made by the AI views.
+
+All views go through one gateway instead of configuring the SDK and building
+a model per request. The gateway keeps pooled HTTP clients for the Gemini
+REST API, so connections are reused across requests. A sync client serves
+the DRF views and a per-event-loop async client serves async callers. Every
+call has a deadline that covers its retries and the reading of the response
+(LLM_TIMEOUT). Concurrent calls are bounded (LLM_MAX_CONCURRENCY), so a slow
+upstream makes callers fail fast instead of tying up more worker threads.
+Timeouts, 429s and 5xx responses are retried with jittered exponential
+backoff (LLM_MAX_RETRIES, LLM_RETRY_BACKOFF) while the deadline allows.
+astream() relays the model's output as it is generated; closing the stream
+aborts the upstream request.
+
+DRF views are synchronous, so the JSON paths call generate() from a request
+thread. The requests that hold a thread longest do not: streamed answers
+(stream=true) use astream() on the event loop, and the plan, interview,
+evaluation and resume views can run as background jobs (core/jobs.py).
+"""
+import asyncio
+import json
+import logging
+import random
+import threading
+import time
+import weakref
+
+import httpx
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+class LLMError(Exception):
+    """The model call failed"""
+
+
+class LLMUnavailable(LLMError):
+    """No API key is configured, or every slot stayed busy until the deadline"""
+
+
+class LLMTimeout(LLMError):
+    """The call did not complete before its deadline"""
+
+
+class LLMGateway:
+    def __init__(self, api_key=None, model=None, timeout=None, max_concurrency=None, max_retries=None,
+                 retry_backoff=None, transport=None):
+        self._api_key = api_key
+        self._model = model
+        self._timeout = timeout
+        self._max_concurrency = max_concurrency
+        self._max_retries = max_retries
+        self._retry_backoff = retry_backoff
+        # Tests pass an httpx.MockTransport
+        self._transport = transport
+        self._lock = threading.Lock()
+        self._client = None
+        self._slots = None
+        # Event loop -> (httpx.AsyncClient, semaphore); entries go away with their loop
+        self._async_clients = weakref.WeakKeyDictionary()
+
+    @property
+    def api_key(self):
+        if self._api_key is not None:
+            return self._api_key
+        return getattr(settings, 'GEMINI_API_KEY', '')
+
+    @property
+    def model(self):
+        if self._model is not None:
+            return self._model
+        return getattr(settings, 'LLM_MODEL', 'gemini-2.0-flash')
+
+    @property
+    def timeout(self):
+        if self._timeout is not None:
+            return self._timeout
+        return getattr(settings, 'LLM_TIMEOUT', 30.0)
+
+    @property
+    def max_concurrency(self):
+        if self._max_concurrency is not None:
+            return self._max_concurrency
+        return getattr(settings, 'LLM_MAX_CONCURRENCY', 8)
+
+    @property
+    def max_retries(self):
+        if self._max_retries is not None:
+            return self._max_retries
+        return getattr(settings, 'LLM_MAX_RETRIES', 2)
+
+    @property
+    def retry_backoff(self):
+        if self._retry_backoff is not None:
+            return self._retry_backoff
+        return getattr(settings, 'LLM_RETRY_BACKOFF', 0.5)
+
+    @property
+    def available(self):
+        return bool(self.api_key)
+
+    def generate(self, prompt, timeout=None):
+        """Generate text for a prompt, blocking the calling thread until it is done or the deadline passes"""
+        deadline = self._deadline(timeout)
+        client, slots = self._sync_client()
+        if not slots.acquire(timeout=max(deadline - time.monotonic(), 0)):
+            raise LLMUnavailable('Too many model calls in progress')
+        try:
+            for attempt in range(self.max_retries + 1):
+                try:
+                    with client.stream(
+                        'POST', self._url(), json=self._body(prompt), headers=self._headers(),
+                        timeout=self._remaining(deadline),
+                    ) as response:
+                        if response.status_code not in RETRYABLE_STATUS:
+                            return self._text(response, self._read(response, deadline))
+                        failure = LLMError(f'Model call failed with HTTP {response.status_code}')
+                except httpx.TransportError as error:
+                    failure = error
+                time.sleep(self._retry_delay(attempt, deadline, failure))
+        finally:
+            slots.release()
+
+    async def agenerate(self, prompt, timeout=None):
+        """Generate text for a prompt without blocking the event loop"""
+        deadline = self._deadline(timeout)
+        client, slots = self._async_client()
+        try:
+            await asyncio.wait_for(slots.acquire(), max(deadline - time.monotonic(), 0))
+        except asyncio.TimeoutError:
+            raise LLMUnavailable('Too many model calls in progress')
+        try:
+            for attempt in range(self.max_retries + 1):
+                try:
+                    remaining = self._remaining(deadline)
+                    response = await asyncio.wait_for(client.post(
+                        self._url(), json=self._body(prompt), headers=self._headers(), timeout=remaining,
+                    ), remaining)
+                except asyncio.TimeoutError as error:
+                    raise LLMTimeout('Model call deadline passed') from error
+                except httpx.TransportError as error:
+                    failure = error
+                else:
+                    if response.status_code not in RETRYABLE_STATUS:
+                        return self._text(response, response.content)
+                    failure = LLMError(f'Model call failed with HTTP {response.status_code}')
+                await asyncio.sleep(self._retry_delay(attempt, deadline, failure))
+        finally:
+            slots.release()
+
+    async def astream(self, prompt, timeout=None):
+        """
+        Yield the text of the response as the model generates it. Failures
+        before the first chunk are retried; once output has been yielded a
+        failure is raised, since a retry would repeat it.
+        """
+        deadline = self._deadline(timeout)
+        client, slots = self._async_client()
+        try:
+            await asyncio.wait_for(slots.acquire(), max(deadline - time.monotonic(), 0))
+        except asyncio.TimeoutError:
+            raise LLMUnavailable('Too many model calls in progress')
+        try:
+            for attempt in range(self.max_retries + 1):
+                started = False
+                try:
+                    async with client.stream(
+                        'POST', self._url('streamGenerateContent'), params={'alt': 'sse'},
+                        json=self._body(prompt), headers=self._headers(), timeout=self._remaining(deadline),
+                    ) as response:
+                        if response.status_code in RETRYABLE_STATUS:
+                            failure = LLMError(f'Model call failed with HTTP {response.status_code}')
+                        else:
+                            if response.status_code != 200:
+                                await response.aread()
+                                raise LLMError(f'Model call failed with HTTP {response.status_code}: {response.text[:200]}')
+                            lines = response.aiter_lines()
+                            while True:
+                                try:
+                                    line = await asyncio.wait_for(anext(lines), self._remaining(deadline))
+                                except StopAsyncIteration:
+                                    return
+                                if not line.startswith('data:'):
+                                    continue
+                                text = self._candidate_text(self._decode(line[5:]), required=False)
+                                if text:
+                                    started = True
+                                    yield text
+                except asyncio.TimeoutError as error:
+                    raise LLMTimeout('Model call deadline passed') from error
+                except httpx.TransportError as error:
+                    if started:
+                        raise LLMError(f'Model stream failed: {error}') from error
+                    failure = error
+                await asyncio.sleep(self._retry_delay(attempt, deadline, failure))
+        finally:
+            slots.release()
+
+    def _sync_client(self):
+        with self._lock:
+            if self._client is None:
+                self._client = httpx.Client(transport=self._transport)
+                self._slots = threading.BoundedSemaphore(self.max_concurrency)
+            return self._client, self._slots
+
+    def _async_client(self):
+        # httpx.AsyncClient connections belong to the event loop they were opened on,
+        # so each loop keeps its own client instead of replacing another loop's
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if loop not in self._async_clients:
+                self._async_clients[loop] = (
+                    httpx.AsyncClient(transport=self._transport), asyncio.Semaphore(self.max_concurrency)
+                )
+            return self._async_clients[loop]
+
+    def _headers(self):
+        return {'x-goog-api-key': self.api_key}
+
+    def _url(self, method='generateContent'):
+        base = getattr(settings, 'LLM_API_BASE', 'https://generativelanguage.googleapis.com/v1beta')
+        return f'{base}/models/{self.model}:{method}'
+
+    def _body(self, prompt):
+        return {'contents': [{'role': 'user', 'parts': [{'text': prompt}]}]}
+
+    def _deadline(self, timeout):
+        if not self.available:
+            raise LLMUnavailable('GEMINI_API_KEY is not configured')
+        return time.monotonic() + (self.timeout if timeout is None else timeout)
+
+    def _remaining(self, deadline):
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise LLMTimeout('Model call deadline passed')
+        return remaining
+
+    def _retry_delay(self, attempt, deadline, failure):
+        """Backoff before the next attempt, or raise `failure` if there is no attempt or time left"""
+        delay = self.retry_backoff * 2 ** attempt * random.uniform(0.5, 1.5)
+        if attempt >= self.max_retries or time.monotonic() + delay >= deadline:
+            if isinstance(failure, httpx.TimeoutException):
+                raise LLMTimeout('Model call timed out') from failure
+            if isinstance(failure, LLMError):
+                raise failure
+            raise LLMError(f'Model call failed: {failure}') from failure
+        logger.warning('Model call failed (%s), retrying in %.2fs', failure, delay)
+        return delay
+
+    def _read(self, response, deadline):
+        """The response body, read before the deadline"""
+        body = bytearray()
+        # httpx times each read separately, so a body trickling in could
+        # otherwise run far past the deadline
+        for chunk in response.iter_bytes():
+            body += chunk
+            self._remaining(deadline)
+        return bytes(body)
+
+    def _text(self, response, body):
+        if response.status_code != 200:
+            raise LLMError(f"Model call failed with HTTP {response.status_code}: {body[:200].decode('utf-8', 'replace')}")
+        return self._candidate_text(self._decode(body))
+
+    def _decode(self, data):
+        try:
+            decoded = json.loads(data)
+        except ValueError as error:
+            raise LLMError(f'Model returned malformed JSON: {error}') from error
+        if not isinstance(decoded, dict):
+            raise LLMError('Model returned an unexpected response')
+        return decoded
+
+    def _candidate_text(self, data, required=True):
+        candidates = data.get('candidates') or []
+        if not candidates:
+            if not required:
+                return ''
+            raise LLMError(f"Model returned no candidates: {data.get('promptFeedback')}")
+        parts = candidates[0].get('content', {}).get('parts', [])
+        return ''.join(part.get('text', '') for part in parts)
+
+
+llm_gateway = LLMGateway()
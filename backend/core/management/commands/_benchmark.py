@@ -0,0 +1,63 @@
+"""
+Shared helpers for the benchmark_* management commands.
+
+Modules prefixed with an underscore are not picked up as commands.
+"""
+import json
+import statistics
+import time
+from contextlib import contextmanager
+
+from django.db import connection
+
+
+@contextmanager
+def scratch_database(name=None):
+    """
+    Create a throwaway test database for the duration of a benchmark so that
+    seeding synthetic data never touches the configured database. `name`
+    overrides the test database name; on SQLite a file path gives a database
+    that several threads can write to (the default in-memory one locks whole
+    tables).
+    """
+    test_settings = connection.settings_dict.setdefault('TEST', {})
+    old_test_name = test_settings.get('NAME')
+    if name is not None:
+        test_settings['NAME'] = name
+    try:
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            yield
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+    finally:
+        test_settings['NAME'] = old_test_name
+
+
+def time_call(func, repeat=20, warmup=2):
+    """Run func repeatedly and return latency percentiles in milliseconds"""
+    for _ in range(warmup):
+        func()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return summarize_latencies(samples)
+
+
+def summarize_latencies(samples):
+    samples = sorted(samples)
+    if not samples:
+        return {'count': 0}
+    return {
+        'count': len(samples),
+        'p50_ms': round(statistics.median(samples), 3),
+        'p99_ms': round(samples[min(len(samples) - 1, int(len(samples) * 0.99))], 3),
+        'max_ms': round(samples[-1], 3),
+    }
+
+
+def write_report(path, report):
+    with open(path, 'w') as report_file:
+        json.dump(report, report_file, indent=2, default=str)
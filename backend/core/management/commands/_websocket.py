@@ -0,0 +1,59 @@
+"""
+Minimal in-process WebSocket client for management commands.
+
+Drives an ASGI application directly through asgiref's ApplicationCommunicator,
+so commands can exercise consumers (and the configured channel layer) without
+a running server or the test-only dependencies of channels.testing.
+"""
+import json
+from urllib.parse import unquote
+
+from asgiref.testing import ApplicationCommunicator
+
+
+class InProcessWebSocket(ApplicationCommunicator):
+    """WebSocket connection to an ASGI application, made without a network socket"""
+
+    def __init__(self, application, path, headers=None, subprotocols=None, scope=None):
+        path, _, query_string = path.partition('?')
+        super().__init__(application, {
+            **(scope or {}),
+            'type': 'websocket',
+            'path': unquote(path),
+            'raw_path': path.encode('ascii'),
+            'query_string': query_string.encode('ascii'),
+            'headers': headers or [],
+            'subprotocols': subprotocols or [],
+            'client': ('127.0.0.1', 0),
+            'server': ('127.0.0.1', 0),
+        })
+
+    async def connect(self, timeout=1):
+        """Returns (accepted, subprotocol or close code)"""
+        await self.send_input({'type': 'websocket.connect'})
+        response = await self.receive_output(timeout)
+        if response['type'] == 'websocket.close':
+            return False, response.get('code', 1000)
+        return True, response.get('subprotocol')
+
+    async def send_json_to(self, data):
+        await self.send_input({'type': 'websocket.receive', 'text': json.dumps(data)})
+
+    async def receive_json_from(self, timeout=1):
+        response = await self.receive_output(timeout)
+        if response['type'] != 'websocket.send':
+            raise ConnectionError(f"Expected a websocket.send event, got {response['type']}")
+        return json.loads(response['text'])
+
+    async def send_bytes_to(self, data):
+        await self.send_input({'type': 'websocket.receive', 'bytes': data})
+
+    async def receive_bytes_from(self, timeout=1):
+        response = await self.receive_output(timeout)
+        if response['type'] != 'websocket.send':
+            raise ConnectionError(f"Expected a websocket.send event, got {response['type']}")
+        return response['bytes']
+
+    async def disconnect(self, code=1000, timeout=1):
+        await self.send_input({'type': 'websocket.disconnect', 'code': code})
+        await self.wait(timeout)
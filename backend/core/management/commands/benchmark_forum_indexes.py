@@ -0,0 +1,145 @@
+import random
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Count
+from django.utils import timezone
+
+from core.models import CompanyDrive, DiscussionPost, DiscussionTopic, ForumCategory, UserPreparationPlan
+from ._benchmark import scratch_database, time_call, write_report
+
+# Models whose Meta.indexes are dropped for the "before" measurements
+INDEXED_MODELS = [CompanyDrive, DiscussionTopic, DiscussionPost, UserPreparationPlan]
+
+
+class Command(BaseCommand):
+    help = 'Seed a scratch database and compare forum query plans and latency with and without the composite indexes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=1_000_000, help='Number of discussion posts to seed')
+        parser.add_argument('--topics', type=int, default=10_000, help='Number of discussion topics to seed')
+        parser.add_argument('--categories', type=int, default=10)
+        parser.add_argument('--drives', type=int, default=5_000)
+        parser.add_argument('--users', type=int, default=1_000)
+        parser.add_argument('--repeat', type=int, default=20, help='Timed runs per query')
+        parser.add_argument('--report', help='Write the results as JSON to this path')
+
+    def handle(self, *args, **options):
+        with scratch_database():
+            self.stdout.write('Seeding scratch database...')
+            self._seed(options)
+            queries = self._queries()
+
+            with connection.schema_editor() as editor:
+                for model in INDEXED_MODELS:
+                    for index in model._meta.indexes:
+                        editor.remove_index(model, index)
+            before = self._measure(queries, options['repeat'])
+
+            with connection.schema_editor() as editor:
+                for model in INDEXED_MODELS:
+                    for index in model._meta.indexes:
+                        editor.add_index(model, index)
+            after = self._measure(queries, options['repeat'])
+
+        report = {
+            'seed': {key: options[key] for key in ('posts', 'topics', 'categories', 'drives', 'users')},
+            'queries': {
+                name: {'before': before[name], 'after': after[name]} for name in queries
+            },
+        }
+        for name, result in report['queries'].items():
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            for phase in ('before', 'after'):
+                self.stdout.write(f"  {phase}: p50={result[phase]['latency']['p50_ms']}ms "
+                                  f"p99={result[phase]['latency']['p99_ms']}ms")
+                for line in result[phase]['plan'].splitlines():
+                    self.stdout.write(f'    {line}')
+        if options['report']:
+            write_report(options['report'], report)
+            self.stdout.write(self.style.SUCCESS(f"Report written to {options['report']}"))
+
+    def _seed(self, options):
+        rng = random.Random(42)
+        now = timezone.now()
+
+        users = User.objects.bulk_create([
+            User(username=f'bench_user_{i}') for i in range(options['users'])
+        ])
+        categories = ForumCategory.objects.bulk_create([
+            ForumCategory(name=f'Bench category {i}', order=i) for i in range(options['categories'])
+        ])
+        CompanyDrive.objects.bulk_create([
+            CompanyDrive(
+                company_name=f'Company {i}', role='SDE', domain='Software',
+                hiring_timeline='Batch 2026', location='Remote', interview_process_description='',
+                drive_date=(now + timedelta(days=rng.randint(-365, 365))).date(),
+            )
+            for i in range(options['drives'])
+        ], batch_size=5_000)
+        UserPreparationPlan.objects.bulk_create([
+            UserPreparationPlan(
+                user=rng.choice(users), plan_name=f'Plan {i}', academic_details='', input_type='role',
+                plan_data={}, is_active=rng.random() > 0.2,
+                last_accessed=now - timedelta(minutes=rng.randint(0, 100_000)),
+            )
+            for i in range(options['users'] * 5)
+        ], batch_size=5_000)
+
+        topics = DiscussionTopic.objects.bulk_create([
+            DiscussionTopic(
+                title=f'Topic {i}', category=rng.choice(categories),
+                is_pinned=rng.random() < 0.01, is_active=rng.random() > 0.05,
+                last_activity=now - timedelta(minutes=rng.randint(0, 500_000)),
+            )
+            for i in range(options['topics'])
+        ], batch_size=5_000)
+
+        batch = []
+        for i in range(options['posts']):
+            batch.append(DiscussionPost(
+                topic=rng.choice(topics), content=f'Post body {i}', author_name='bench',
+                created_at=now - timedelta(seconds=rng.randint(0, 30_000_000)),
+            ))
+            if len(batch) == 10_000:
+                DiscussionPost.objects.bulk_create(batch)
+                batch = []
+        DiscussionPost.objects.bulk_create(batch)
+
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def _queries(self):
+        category = ForumCategory.objects.order_by('pk').first()
+        busiest_topic_id = DiscussionPost.objects.order_by().values('topic').annotate(
+            n=Count('id')
+        ).order_by('-n').values_list('topic', flat=True).first()
+        user = User.objects.order_by('pk').first()
+        topic_ordering = ['-is_pinned', '-last_activity']
+        return {
+            'topic_list': lambda: DiscussionTopic.objects.filter(is_active=True).order_by(*topic_ordering)[:50],
+            'topic_list_by_category': lambda: DiscussionTopic.objects.filter(
+                is_active=True, category_id=category.pk
+            ).order_by(*topic_ordering)[:50],
+            'topic_posts_oldest_first': lambda: DiscussionPost.objects.filter(
+                topic_id=busiest_topic_id
+            ).order_by('created_at')[:50],
+            'topic_posts_newest_page': lambda: DiscussionPost.objects.filter(
+                topic_id=busiest_topic_id
+            ).order_by('-created_at', '-id')[:50],
+            'company_drives_by_date': lambda: CompanyDrive.objects.order_by('drive_date')[:50],
+            'user_active_plans': lambda: UserPreparationPlan.objects.filter(
+                user=user, is_active=True
+            ).order_by('-last_accessed'),
+        }
+
+    def _measure(self, queries, repeat):
+        results = {}
+        for name, build_queryset in queries.items():
+            results[name] = {
+                'plan': build_queryset().explain(),
+                'latency': time_call(lambda: list(build_queryset()), repeat=repeat),
+            }
+        return results
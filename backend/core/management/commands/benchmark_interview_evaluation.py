@@ -0,0 +1,111 @@
+import io
+import json
+import logging
+import random
+import re
+import threading
+import time
+from contextlib import redirect_stdout
+from unittest.mock import patch
+
+import httpx
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from core.llm import LLMGateway
+from core.views import EvaluateInterviewAnswersView
+from ._benchmark import time_call, write_report
+
+STUB_EVALUATION = {
+    'score': 7,
+    'strengths': ['Clear structure'],
+    'improvements': ['Quantify the impact'],
+    'suggestions': ['Use the STAR method'],
+    'overall_comment': 'A solid answer.',
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Time EvaluateInterviewAnswersView against a stubbed Gemini endpoint with injected latency: '
+        'answers scored one at a time, concurrently, and with one batched prompt'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--questions', type=int, default=10, help='Answered questions per request')
+        parser.add_argument('--latency', type=float, default=0.2, help='Seconds per stubbed model call')
+        parser.add_argument('--jitter', type=float, default=0.05, help='Random extra seconds per call (0 to this)')
+        parser.add_argument('--batch-latency-per-answer', type=float, default=0.05,
+                            help='Extra seconds per answer for the batched call (its reply is longer)')
+        parser.add_argument('--concurrency', type=int, default=4, help='INTERVIEW_EVALUATION_CONCURRENCY for the concurrent run')
+        parser.add_argument('--repeat', type=int, default=5, help='Timed requests per mode')
+        parser.add_argument('--report', help='Write the results as JSON to this path')
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.rng = random.Random(42)
+        self.calls = 0
+        self.lock = threading.Lock()
+        gateway = LLMGateway(
+            api_key='benchmark', max_concurrency=max(options['concurrency'], 1), transport=httpx.MockTransport(self._reply)
+        )
+        modes = {
+            'sequential': {'INTERVIEW_EVALUATION_CONCURRENCY': 1, 'INTERVIEW_EVALUATION_BATCHED': False},
+            'concurrent': {'INTERVIEW_EVALUATION_CONCURRENCY': options['concurrency'], 'INTERVIEW_EVALUATION_BATCHED': False},
+            'batched': {'INTERVIEW_EVALUATION_BATCHED': True},
+        }
+        report = {
+            'seed': {key: options[key] for key in ('questions', 'latency', 'jitter', 'batch_latency_per_answer', 'concurrency')},
+            'modes': {},
+        }
+        # httpx logs every request and the view prints debug output for each one
+        logging.getLogger('httpx').setLevel(logging.WARNING)
+        with patch('core.views.llm_gateway', gateway):
+            for name, overrides in modes.items():
+                with override_settings(**overrides):
+                    self.calls = 0
+                    latency = time_call(self._request, options['repeat'], warmup=1)
+                    latency['model_calls_per_request'] = self.calls // (options['repeat'] + 1)
+                report['modes'][name] = latency
+                self.stdout.write(f"  {name}: p50={latency['p50_ms']}ms p99={latency['p99_ms']}ms, "
+                                  f"{latency['model_calls_per_request']} model calls/request")
+        if options['report']:
+            write_report(options['report'], report)
+            self.stdout.write(self.style.SUCCESS(f"Report written to {options['report']}"))
+
+    def _request(self):
+        payload = {
+            'company_name': 'Acme',
+            'job_description': 'Backend engineer working on Python services.',
+            'question_answers': [
+                {
+                    'question_text': f'Question {index}',
+                    'user_answer': f'My answer to question {index} covers the situation, task, action and result.',
+                    'difficulty_level': 'medium',
+                }
+                for index in range(1, self.options['questions'] + 1)
+            ],
+        }
+        request = APIRequestFactory().post('/api/evaluate_interview_answers/', payload, format='json')
+        # An unsaved user: the view does not touch the database
+        force_authenticate(request, user=User(username='benchmark'))
+        with redirect_stdout(io.StringIO()):
+            response = EvaluateInterviewAnswersView.as_view()(request)
+        assert response.status_code == 200, response.data
+
+    def _reply(self, request):
+        """Stubbed generateContent: sleeps for the injected latency and returns canned evaluations"""
+        with self.lock:
+            self.calls += 1
+        prompt = json.loads(request.content)['contents'][0]['parts'][0]['text']
+        answers = len(re.findall(r'^\s*Answer \d+:', prompt, re.MULTILINE))
+        delay = self.options['latency'] + self.rng.uniform(0, self.options['jitter'])
+        if answers:
+            delay += answers * self.options['batch_latency_per_answer']
+            text = json.dumps([{'answer': number, **STUB_EVALUATION} for number in range(1, answers + 1)])
+        else:
+            text = json.dumps(STUB_EVALUATION)
+        time.sleep(delay)
+        return httpx.Response(200, json={'candidates': [{'content': {'parts': [{'text': text}]}}]})
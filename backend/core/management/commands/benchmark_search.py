@@ -0,0 +1,109 @@
+import random
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from rest_framework import filters
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from core.models import CompanyDrive, DiscussionPost, DiscussionTopic, ForumCategory, Skill
+from core.search import SEARCH_DOCUMENTS, FullTextSearchFilter, get_search_backend, rebuild_index
+from core.views import CompanyDriveViewSet, DiscussionTopicViewSet
+from ._benchmark import scratch_database, time_call, write_report
+
+# Common terms plus a long tail of synthetic words, sampled with a Zipf-like
+# distribution so that searched terms have realistic selectivity
+COMMON_TERMS = (
+    'array binary search tree graph dynamic programming heap queue stack hash map string sorting '
+    'recursion greedy backtracking system design database index cache latency throughput interview '
+    'resume offer referral python java javascript react django sql aws docker kubernetes behavioural '
+    'leadership teamwork negotiation internship placement aptitude puzzle networking operating process'
+).split()
+VOCABULARY = COMMON_TERMS + [f'term{i}' for i in range(20_000)]
+WEIGHTS = [1 / (rank + 1) for rank in range(len(VOCABULARY))]
+
+SEARCHES = ['binary search', 'system design interview', 'django', 'term150', 'term4000', 'term75 term90']
+
+
+class Command(BaseCommand):
+    help = 'Compare ?search= latency of LIKE-based SearchFilter and the full-text index on a synthetic corpus'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--topics', type=int, default=50_000)
+        parser.add_argument('--posts', type=int, default=500_000)
+        parser.add_argument('--drives', type=int, default=20_000)
+        parser.add_argument('--repeat', type=int, default=10, help='Timed runs per search')
+        parser.add_argument('--report', help='Write the results as JSON to this path')
+
+    def handle(self, *args, **options):
+        with scratch_database():
+            if get_search_backend() is None:
+                raise CommandError('No full-text search backend is available for this database.')
+            self.stdout.write('Seeding scratch database...')
+            self._seed(options)
+
+            factory = APIRequestFactory()
+            report = {'seed': {key: options[key] for key in ('topics', 'posts', 'drives')}, 'searches': {}}
+            for view_class in (DiscussionTopicViewSet, CompanyDriveViewSet):
+                view = view_class()
+                view.action = 'list'
+                for term in SEARCHES:
+                    request = Request(factory.get('/', {'search': term}))
+                    view.request = request
+                    view.format_kwarg = None
+                    queryset = view.get_queryset()
+                    like = time_call(
+                        lambda: list(filters.SearchFilter().filter_queryset(request, queryset, view)),
+                        repeat=options['repeat']
+                    )
+                    full_text = time_call(
+                        lambda: list(FullTextSearchFilter().filter_queryset(request, queryset, view)),
+                        repeat=options['repeat']
+                    )
+                    name = f'{view_class.__name__}: {term}'
+                    report['searches'][name] = {'like': like, 'full_text': full_text}
+                    self.stdout.write(
+                        f"{name:<60} LIKE p50={like['p50_ms']}ms  full-text p50={full_text['p50_ms']}ms"
+                    )
+
+        if options['report']:
+            write_report(options['report'], report)
+            self.stdout.write(self.style.SUCCESS(f"Report written to {options['report']}"))
+
+    def _seed(self, options):
+        rng = random.Random(7)
+
+        def text(words):
+            return ' '.join(rng.choices(VOCABULARY, weights=WEIGHTS, k=words))
+
+        categories = ForumCategory.objects.bulk_create([ForumCategory(name=f'Category {i}') for i in range(10)])
+        skills = Skill.objects.bulk_create([Skill(name=f'Skill {word}') for word in COMMON_TERMS[:20]])
+        drives = CompanyDrive.objects.bulk_create([
+            CompanyDrive(
+                company_name=f'Company {i} {rng.choice(COMMON_TERMS)}', role=text(2), domain=text(1),
+                hiring_timeline='Batch 2026', drive_date='2026-01-01', location='Remote',
+                interview_process_description=text(30),
+            )
+            for i in range(options['drives'])
+        ], batch_size=5_000)
+        topics = DiscussionTopic.objects.bulk_create([
+            DiscussionTopic(
+                title=text(6), content=text(40), author_name=f'user{i % 500}',
+                category=rng.choice(categories), related_skill=rng.choice(skills),
+                related_company=rng.choice(drives),
+            )
+            for i in range(options['topics'])
+        ], batch_size=5_000)
+        batch = []
+        for i in range(options['posts']):
+            batch.append(DiscussionPost(topic=rng.choice(topics), content=text(25), author_name=f'user{i % 500}'))
+            if len(batch) == 10_000:
+                DiscussionPost.objects.bulk_create(batch)
+                batch = []
+        DiscussionPost.objects.bulk_create(batch)
+
+        # bulk_create skips signals, so build the index in one pass
+        for document in SEARCH_DOCUMENTS.values():
+            rebuild_index(document)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
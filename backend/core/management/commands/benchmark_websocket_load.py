@@ -0,0 +1,202 @@
+import asyncio
+import logging
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+from collections import Counter, defaultdict
+
+from channels.layers import get_channel_layer
+from channels.routing import URLRouter
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from core.chat_queue import chat_write_queue
+from core.models import DiscussionTopic
+from core.presence import presence_registry
+from core.rate_limit import dropped_frame_counts
+from core.routing import websocket_urlpatterns
+from core.wire import negotiate
+from ._benchmark import scratch_database, summarize_latencies, write_report
+from ._websocket import InProcessWebSocket
+
+# Sockets opened (or closed) concurrently
+CONNECT_CHUNK = 250
+# Loggers that log every frame at DEBUG/INFO, which would dominate the measurement
+QUIETED_LOGGERS = ('core.consumers', 'channels')
+
+
+class Command(BaseCommand):
+    help = (
+        'Open thousands of in-process DiscussionConsumer connections across many rooms, drive chat and '
+        'typing traffic, and report fan-out latency, throughput and memory per connection. Uses the '
+        'configured channel layer (set CHANNEL_REDIS_URL to measure the Redis layer).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--connections', type=int, default=2_000, help='WebSocket connections (one user each)')
+        parser.add_argument('--rooms', type=int, default=100, help='Discussion rooms the connections are spread over')
+        parser.add_argument('--messages', type=int, default=5_000, help='Chat messages sent in total')
+        parser.add_argument('--rate', type=float, default=500.0, help='Chat messages per second across all rooms')
+        parser.add_argument('--typing', type=float, default=0.5,
+                            help='Probability that a chat message is preceded by a typing start')
+        parser.add_argument('--window', type=float, help='Override DISCUSSION_FANOUT_WINDOW (seconds)')
+        parser.add_argument('--subprotocol', help='WebSocket subprotocol the clients offer, e.g. connectconquer.msgpack')
+        parser.add_argument('--timeout', type=float, default=30.0, help='Seconds to wait for the last deliveries')
+        parser.add_argument('--log-level', default='WARNING', help='Level of the consumer loggers during the run')
+        parser.add_argument('--report', help='Write the results as JSON to this path')
+
+    def handle(self, *args, **options):
+        overrides = {}
+        if options['window'] is not None:
+            overrides['DISCUSSION_FANOUT_WINDOW'] = options['window']
+        # Chat messages and presence are written from several threads, so use a file database
+        scratch_dir = tempfile.TemporaryDirectory()
+        with scratch_dir, scratch_database(os.path.join(scratch_dir.name, 'load.sqlite3')), \
+                override_settings(**overrides):
+            self.stdout.write('Seeding scratch database...')
+            users = User.objects.bulk_create([
+                User(username=f'load_user_{i}') for i in range(options['connections'])
+            ])
+            topics = DiscussionTopic.objects.bulk_create([
+                DiscussionTopic(title=f'Load room {i}') for i in range(options['rooms'])
+            ])
+            levels = {name: logging.getLogger(name).level for name in QUIETED_LOGGERS}
+            for name in QUIETED_LOGGERS:
+                logging.getLogger(name).setLevel(options['log_level'])
+            try:
+                results = asyncio.run(LoadRun(users, topics, options).run(self.stdout))
+            finally:
+                for name, level in levels.items():
+                    logging.getLogger(name).setLevel(level)
+                # Write the buffered presence before the scratch database goes away
+                presence_registry.flush()
+
+        report = {
+            'seed': {key: options[key] for key in ('connections', 'rooms', 'messages', 'rate', 'typing')},
+            'subprotocol': options['subprotocol'],
+            'fanout_window': options['window'],
+            'channel_layer': type(get_channel_layer()).__name__,
+            **results,
+        }
+        latency = report['fanout_latency']
+        self.stdout.write(
+            f"{report['delivered']}/{report['expected_deliveries']} deliveries in {report['elapsed_s']}s: "
+            f"p50={latency.get('p50_ms')}ms p99={latency.get('p99_ms')}ms, "
+            f"{report['messages_per_s']} msgs/s sent, {report['deliveries_per_s']} deliveries/s, "
+            f"{report['memory_per_connection_bytes']} bytes/connection"
+        )
+        if options['report']:
+            write_report(options['report'], report)
+            self.stdout.write(self.style.SUCCESS(f"Report written to {options['report']}"))
+
+
+class LoadRun:
+    """One load run: connects the sockets, drives traffic and collects what the clients received"""
+
+    def __init__(self, users, topics, options):
+        self.options = options
+        self.rng = random.Random(42)
+        self.application = URLRouter(websocket_urlpatterns)
+        # Connection i belongs to room i % rooms
+        self.members = defaultdict(list)
+        for index, user in enumerate(users):
+            self.members[topics[index % len(topics)].pk].append(user)
+        self.sockets = {}
+        self.sent_at = {}
+        self.latencies = []
+        self.frames = Counter()
+        self.sends = 0
+
+    async def run(self, stdout):
+        options = self.options
+        tracemalloc.start()
+        baseline = tracemalloc.get_traced_memory()[0]
+        members = [(topic_id, user) for topic_id, users in self.members.items() for user in users]
+        for start in range(0, len(members), CONNECT_CHUNK):
+            await asyncio.gather(*(self.connect(topic_id, user) for topic_id, user in members[start:start + CONNECT_CHUNK]))
+        memory = tracemalloc.get_traced_memory()[0] - baseline
+        tracemalloc.stop()
+        stdout.write(f'{len(self.sockets)} connections open')
+
+        # Client-side decoders are created after the memory measurement, which covers the server side
+        readers = [
+            asyncio.ensure_future(self.read(socket, negotiate([subprotocol] if subprotocol else None)))
+            for socket, subprotocol in self.sockets.values()
+        ]
+        expected = await self.drive()
+        started = self.started
+        deadline = time.perf_counter() + options['timeout']
+        while len(self.latencies) < expected and time.perf_counter() < deadline:
+            await asyncio.sleep(0.05)
+        elapsed = time.perf_counter() - started
+
+        for start in range(0, len(members), CONNECT_CHUNK):
+            chunk = list(self.sockets.values())[start:start + CONNECT_CHUNK]
+            await asyncio.gather(*(socket.disconnect(timeout=options['timeout']) for socket, _ in chunk))
+        for reader in readers:
+            reader.cancel()
+        await chat_write_queue.flush()
+
+        return {
+            'connections': len(self.sockets),
+            'expected_deliveries': expected,
+            'delivered': len(self.latencies),
+            'elapsed_s': round(elapsed, 3),
+            'messages_per_s': round(options['messages'] / elapsed, 1),
+            'deliveries_per_s': round(len(self.latencies) / elapsed, 1),
+            'fanout_latency': summarize_latencies(self.latencies),
+            'websocket_sends': self.sends,
+            'frames_received': dict(self.frames),
+            'memory_per_connection_bytes': round(memory / max(len(self.sockets), 1)),
+            'dropped_frames': dropped_frame_counts(),
+        }
+
+    async def connect(self, topic_id, user):
+        subprotocols = [self.options['subprotocol']] if self.options['subprotocol'] else None
+        socket = InProcessWebSocket(
+            self.application, f'/ws/discussion/{topic_id}/', subprotocols=subprotocols, scope={'user': user}
+        )
+        accepted, subprotocol = await socket.connect(timeout=self.options['timeout'])
+        if accepted:
+            self.sockets[user.pk] = (socket, subprotocol)
+
+    async def read(self, socket, codec):
+        """Record every frame the socket receives; `codec` is the client side of the negotiated protocol"""
+        # Read the output queue directly: receive_output() cancels the application on timeout
+        while True:
+            response = await socket.output_queue.get()
+            if response['type'] != 'websocket.send':
+                return
+            received_at = time.perf_counter()
+            self.sends += 1
+            decoded = codec.decode(response.get('text'), response.get('bytes'))
+            for frame in decoded if isinstance(decoded, list) else [decoded]:
+                self.frames[frame.get('type')] += 1
+                if frame.get('type') == 'chat_message' and frame.get('content') in self.sent_at:
+                    self.latencies.append((received_at - self.sent_at[frame['content']]) * 1000)
+
+    async def drive(self):
+        """Send chat (and typing) frames at the target rate; returns the number of expected chat deliveries"""
+        options = self.options
+        rooms = list(self.members)
+        expected = 0
+        self.started = time.perf_counter()
+        for index in range(options['messages']):
+            topic_id = rooms[index % len(rooms)]
+            sender = self.rng.choice(self.members[topic_id])
+            if sender.pk not in self.sockets:
+                continue
+            socket, _ = self.sockets[sender.pk]
+            if self.rng.random() < options['typing']:
+                await socket.send_json_to({'type': 'typing', 'is_typing': True})
+            content = f'load message {index}'
+            self.sent_at[content] = time.perf_counter()
+            await socket.send_json_to({'type': 'chat_message', 'content': content})
+            expected += sum(1 for user in self.members[topic_id] if user.pk in self.sockets) - 1
+
+            delay = self.started + (index + 1) / options['rate'] - time.perf_counter()
+            await asyncio.sleep(max(delay, 0))
+        return expected
@@ -0,0 +1,108 @@
+import random
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from core.ulid import new_ulid
+from core.wire import DeflateMsgpackCodec, JSONCodec, MsgpackCodec, encode_frames, msgpack
+from ._benchmark import time_call, write_report
+
+WORDS = (
+    'interview round offer aptitude coding graph tree dynamic programming system design '
+    'resume referral onsite hr manager salary campus drive deadline mock practice leetcode'
+).split()
+
+
+class Command(BaseCommand):
+    help = 'Compare bytes on the wire and encode CPU time of the discussion socket protocols (JSON, MessagePack, MessagePack+deflate)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batches', type=int, default=2_000, help='Outbound batches sent to one socket')
+        parser.add_argument('--users', type=int, default=30, help='Users active in the simulated room')
+        parser.add_argument('--repeat', type=int, default=10, help='Timed runs per protocol')
+        parser.add_argument('--report', help='Write the results as JSON to this path')
+
+    def handle(self, *args, **options):
+        if msgpack is None:
+            raise CommandError('msgpack is not installed')
+        batches = self._traffic(options['batches'], options['users'])
+        frame_count = sum(len(batch) for batch in batches)
+        payloads = [payload for batch in batches for payload in batch]
+
+        # Each broadcast frame is encoded once by the sender, in every format
+        broadcast = [[encode_frames(payload) for payload in batch] for batch in batches]
+        report = {
+            'seed': {key: options[key] for key in ('batches', 'users')},
+            'frames': frame_count,
+            'sender_encode': time_call(lambda: [encode_frames(payload) for payload in payloads], options['repeat']),
+            'protocols': {},
+        }
+        for codec_class in (JSONCodec, MsgpackCodec, DeflateMsgpackCodec):
+            name = codec_class.subprotocol or 'json'
+            report['protocols'][name] = self._measure(codec_class, broadcast, options['repeat'])
+
+        json_bytes = report['protocols']['json']['bytes']
+        self.stdout.write(f"{frame_count} frames in {len(batches)} batches; "
+                          f"sender encode p50={report['sender_encode']['p50_ms']}ms")
+        for name, result in report['protocols'].items():
+            result['ratio_to_json'] = round(result['bytes'] / json_bytes, 3)
+            self.stdout.write(f"  {name}: {result['bytes']} bytes ({result['ratio_to_json']}x json), "
+                              f"{result['bytes_per_frame']} bytes/frame, "
+                              f"per-socket encode p50={result['encode']['p50_ms']}ms")
+        if options['report']:
+            write_report(options['report'], report)
+            self.stdout.write(self.style.SUCCESS(f"Report written to {options['report']}"))
+
+    def _measure(self, codec_class, broadcast, repeat):
+        """Bytes and CPU time to send the whole batch stream to one socket"""
+        def send_stream():
+            codec = codec_class()  # a fresh connection, so deflate starts with an empty window
+            return [
+                codec.send_kwargs(codec.join([codec.pick(frames) for frames in batch]))
+                for batch in broadcast
+            ]
+
+        sent = send_stream()
+        total = sum(len(next(iter(message.values()))) for message in sent)
+        frame_count = sum(len(batch) for batch in broadcast)
+        return {
+            'bytes': total,
+            'bytes_per_frame': round(total / frame_count, 1),
+            'encode': time_call(send_stream, repeat),
+        }
+
+    def _traffic(self, batch_count, user_count):
+        """Batches as a socket in a busy room sees them: chat messages, typing transitions, joins and leaves"""
+        rng = random.Random(42)
+        users = [(user_id, f'student_{user_id}') for user_id in range(1, user_count + 1)]
+        now = timezone.now()
+        sequence = 0
+        batches = []
+        for index in range(batch_count):
+            batch = []
+            for _ in range(rng.randint(1, 6)):
+                user_id, name = rng.choice(users)
+                kind = rng.random()
+                if kind < 0.5:
+                    sequence += 1
+                    created_at = (now + timedelta(milliseconds=index * 50)).isoformat()
+                    batch.append({
+                        'type': 'chat_message',
+                        'seq': sequence,
+                        'message_id': new_ulid(),
+                        'content': ' '.join(rng.choice(WORDS) for _ in range(rng.randint(3, 25))),
+                        'author_name': name,
+                        'author_id': user_id,
+                        'created_at': created_at,
+                        'timestamp': created_at,
+                    })
+                elif kind < 0.9:
+                    batch.append({'type': 'typing', 'user': name, 'user_id': user_id, 'is_typing': rng.random() < 0.6})
+                else:
+                    batch.append({
+                        'type': rng.choice(('user_join', 'user_leave')), 'user': name, 'user_id': user_id,
+                        'timestamp': now.isoformat(),
+                    })
+            batches.append(batch)
+        return batches
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from core.plan_templates import plan_template_cache
+
+
+class Command(BaseCommand):
+    help = 'Delete every cached preparation plan template, so the next requests generate fresh plans'
+
+    def handle(self, *args, **options):
+        deleted = plan_template_cache.invalidate()
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} preparation plan templates'))
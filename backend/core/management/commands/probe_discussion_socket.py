@@ -0,0 +1,57 @@
+import asyncio
+import json
+
+from django.core.management.base import BaseCommand
+
+from connect_conquer_backend.asgi import application
+from ._websocket import InProcessWebSocket
+
+
+class Command(BaseCommand):
+    help = (
+        'Open an in-process WebSocket to a discussion room through the configured '
+        'channel layer, optionally send a chat message, and print received frames as JSON lines'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--topic', type=int, required=True, help='Discussion topic id')
+        parser.add_argument('--send', help='Chat message content to send after connecting')
+        parser.add_argument('--expect', help='Frame type to wait for before exiting')
+        parser.add_argument('--timeout', type=float, default=10.0)
+
+    def handle(self, *args, **options):
+        asyncio.run(self._probe(options))
+
+    async def _probe(self, options):
+        communicator = InProcessWebSocket(
+            application, f"/ws/discussion/{options['topic']}/",
+            headers=[(b'origin', b'http://localhost')]
+        )
+        connected, _ = await communicator.connect(timeout=options['timeout'])
+        if not connected:
+            self.stderr.write('WebSocket connection was rejected')
+            return
+        try:
+            await communicator.receive_json_from(timeout=options['timeout'])  # connection_established
+            self._emit({'type': 'probe_ready'})
+
+            if options['send']:
+                await communicator.send_json_to({'type': 'chat_message', 'content': options['send']})
+                # Sending to the group is asynchronous; wait for the room to answer a ping
+                await communicator.send_json_to({'type': 'ping'})
+
+            done = False
+            while not done and (options['expect'] or options['send']):
+                received = await communicator.receive_json_from(timeout=options['timeout'])
+                # Room broadcasts arrive batched as JSON arrays
+                for frame in received if isinstance(received, list) else [received]:
+                    self._emit(frame)
+                    done = done or frame.get('type') == (options['expect'] or 'pong')
+        except asyncio.TimeoutError:
+            self._emit({'type': 'probe_timeout'})
+        finally:
+            await communicator.disconnect()
+
+    def _emit(self, frame):
+        self.stdout.write(json.dumps(frame))
+        self.stdout.flush()
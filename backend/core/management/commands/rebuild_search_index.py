@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand, CommandError
+from core.search import SEARCH_DOCUMENTS, get_search_backend, rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index for discussion topics, posts and company drives'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--document', choices=sorted(SEARCH_DOCUMENTS), action='append',
+            help='Only rebuild the given document type (can be repeated)'
+        )
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        if get_search_backend() is None:
+            raise CommandError('No full-text search backend is available for this database.')
+
+        for name in options['document'] or SEARCH_DOCUMENTS:
+            indexed = rebuild_index(SEARCH_DOCUMENTS[name], batch_size=options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(f'Indexed {indexed} {name} documents'))
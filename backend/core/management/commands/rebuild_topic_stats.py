@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from core.models import DiscussionTopic
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the denormalized post statistics (post_count, last post) on discussion topics'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Number of topics updated per UPDATE statement'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        topic_ids = list(DiscussionTopic.objects.order_by('pk').values_list('pk', flat=True))
+        
+        updated = 0
+        for start in range(0, len(topic_ids), batch_size):
+            batch = topic_ids[start:start + batch_size]
+            with transaction.atomic():
+                updated += DiscussionTopic.objects.filter(
+                    pk__gte=batch[0], pk__lte=batch[-1]
+                ).update(**DiscussionTopic.post_stats_expressions())
+        
+        self.stdout.write(
+            self.style.SUCCESS(f'Rebuilt post statistics for {updated} discussion topics')
+        )
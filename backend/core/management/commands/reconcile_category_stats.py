@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from core.models import ForumCategory
+
+
+class Command(BaseCommand):
+    help = 'Recompute forum category statistics (topic_count, latest_topic) from scratch, e.g. after bulk imports'
+
+    def handle(self, *args, **options):
+        updated = ForumCategory.objects.update(**ForumCategory.topic_stats_expressions())
+        self.stdout.write(
+            self.style.SUCCESS(f'Reconciled statistics for {updated} forum categories')
+        )
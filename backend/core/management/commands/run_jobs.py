@@ -0,0 +1,36 @@
+import signal
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from core.jobs import JobWorker
+
+
+class Command(BaseCommand):
+    help = 'Run queued background jobs of the AI views until interrupted (see core/jobs.py)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Run the queued jobs, then exit')
+        parser.add_argument('--poll-interval', type=float, default=None,
+                            help='Seconds to wait between polls of an empty queue (default: JOBS_POLL_INTERVAL)')
+
+    def handle(self, *args, **options):
+        worker = JobWorker()
+        if options['once']:
+            ran = 0
+            while worker.run_once():
+                ran += 1
+            self.stdout.write(self.style.SUCCESS(f'Ran {ran} jobs'))
+            return
+
+        if not settings.CHANNEL_LAYERS['default']['BACKEND'].startswith('channels_redis'):
+            self.stdout.write(self.style.WARNING(
+                'No Redis channel layer (CHANNEL_REDIS_URL): job updates will not be pushed to WebSocket clients'
+            ))
+        stop = threading.Event()
+        # Finish the running job on Ctrl+C / SIGTERM, then exit
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *_: stop.set())
+        self.stdout.write('Running background jobs...')
+        worker.run(stop, poll_interval=options['poll_interval'])
+        self.stdout.write(self.style.SUCCESS('Stopped'))
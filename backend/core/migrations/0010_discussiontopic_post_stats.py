@@ -0,0 +1,45 @@
+# Generated by Django 5.2.4 on 2026-10-18 10:00
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_post_stats(apps, schema_editor):
+    # Same expressions as DiscussionTopic.post_stats_expressions(), on the historical models
+    DiscussionTopic = apps.get_model('core', 'DiscussionTopic')
+    DiscussionPost = apps.get_model('core', 'DiscussionPost')
+    posts = DiscussionPost.objects.filter(topic=OuterRef('pk'))
+    post_count = posts.order_by().values('topic').annotate(count=models.Count('id')).values('count')
+    last_post = posts.order_by('-created_at', '-id')
+    DiscussionTopic.objects.update(
+        post_count=Coalesce(Subquery(post_count, output_field=models.IntegerField()), 0),
+        last_post_author_name=Subquery(last_post.values('author_name')[:1]),
+        last_post_at=Subquery(last_post.values('created_at')[:1]),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_interviewsession_interviewquestionanswer'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='discussiontopic',
+            name='post_count',
+            field=models.IntegerField(default=0, help_text='Number of posts in this topic'),
+        ),
+        migrations.AddField(
+            model_name='discussiontopic',
+            name='last_post_author_name',
+            field=models.CharField(blank=True, max_length=100, null=True),
+        ),
+        migrations.AddField(
+            model_name='discussiontopic',
+            name='last_post_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(backfill_post_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.4 on 2026-10-18 10:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_topic_stats(apps, schema_editor):
+    # Same expressions as ForumCategory.topic_stats_expressions(), on the historical models
+    ForumCategory = apps.get_model('core', 'ForumCategory')
+    DiscussionTopic = apps.get_model('core', 'DiscussionTopic')
+    topics = DiscussionTopic.objects.filter(category=OuterRef('pk'), is_active=True)
+    topic_count = topics.order_by().values('category').annotate(count=models.Count('id')).values('count')
+    latest_topic = topics.order_by('-last_activity', '-id').values('pk')[:1]
+    ForumCategory.objects.update(
+        topic_count=Coalesce(Subquery(topic_count, output_field=models.IntegerField()), 0),
+        latest_topic=Subquery(latest_topic),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_discussiontopic_post_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='forumcategory',
+            name='topic_count',
+            field=models.IntegerField(default=0, help_text='Number of active topics in this category'),
+        ),
+        migrations.AddField(
+            model_name='forumcategory',
+            name='latest_topic',
+            field=models.ForeignKey(blank=True, help_text='Active topic with the most recent activity', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='core.discussiontopic'),
+        ),
+        migrations.RunPython(backfill_topic_stats, migrations.RunPython.noop),
+    ]
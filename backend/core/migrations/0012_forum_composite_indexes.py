@@ -0,0 +1,33 @@
+# Generated by Django 5.2.4 on 2026-10-18 11:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_forumcategory_topic_stats'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='companydrive',
+            index=models.Index(fields=['drive_date'], name='drive_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='discussiontopic',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['-is_pinned', '-last_activity'], name='topic_active_pinned_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='discussiontopic',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['category', '-is_pinned', '-last_activity'], name='topic_category_pinned_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='discussionpost',
+            index=models.Index(fields=['topic', 'created_at', 'id'], name='post_topic_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userpreparationplan',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['user', '-last_accessed'], name='plan_user_active_idx'),
+        ),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 5.2.4 on 2026-10-18 11:30
+
+from django.db import migrations
+
+SEARCH_TABLES = ['core_search_topic', 'core_search_post', 'core_search_drive']
+
+
+def create_search_tables(apps, schema_editor):
+    """
+    Create the full-text document tables used by core.search. Databases
+    without a supported backend keep using LIKE-based SearchFilter.
+    """
+    vendor = schema_editor.connection.vendor
+    for table in SEARCH_TABLES:
+        if vendor == 'sqlite':
+            with schema_editor.connection.cursor() as cursor:
+                cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+                if not cursor.fetchone()[0]:
+                    return
+            schema_editor.execute(
+                f'CREATE VIRTUAL TABLE {table} USING fts5(parent_id UNINDEXED, title, body)'
+            )
+        elif vendor == 'postgresql':
+            schema_editor.execute(
+                f'CREATE TABLE {table} (object_id bigint PRIMARY KEY, parent_id bigint NULL, document tsvector NOT NULL)'
+            )
+            schema_editor.execute(f'CREATE INDEX {table}_document ON {table} USING GIN (document)')
+
+
+def fill_search_tables(apps, schema_editor):
+    """
+    Index the existing topics, posts and drives: once the tables exist,
+    FullTextSearchFilter stops falling back to LIKE lookups.
+    """
+    from core.search import SEARCH_BACKENDS, SEARCH_DOCUMENTS, index_queryset
+
+    connection = schema_editor.connection
+    backend_class = SEARCH_BACKENDS.get(connection.vendor)
+    if backend_class is None or not set(SEARCH_TABLES) <= set(connection.introspection.table_names()):
+        return
+    backend = backend_class()
+    for document in SEARCH_DOCUMENTS.values():
+        model = apps.get_model('core', document.model.__name__)
+        index_queryset(backend, document, model.objects.all())
+
+
+def drop_search_tables(apps, schema_editor):
+    if schema_editor.connection.vendor in ('sqlite', 'postgresql'):
+        for table in SEARCH_TABLES:
+            schema_editor.execute(f'DROP TABLE IF EXISTS {table}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_forum_composite_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_tables, drop_search_tables),
+        migrations.RunPython(fill_search_tables, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='discussionpost',
+            name='message_id',
+            field=models.CharField(blank=True, editable=False, max_length=26, null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.4 on 2026-10-18 13:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_discussionpost_message_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='discussionpost',
+            name='sequence',
+            field=models.PositiveBigIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='discussionpost',
+            index=models.Index(fields=['topic', 'sequence'], name='post_topic_sequence_idx'),
+        ),
+    ]
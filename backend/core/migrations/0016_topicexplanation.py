@@ -0,0 +1,30 @@
+# Generated by Django 5.2.4 on 2026-10-18 09:28
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_discussionpost_sequence'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TopicExplanation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=64, unique=True)),
+                ('namespace', models.CharField(max_length=100)),
+                ('topic_name', models.CharField(max_length=200)),
+                ('skill_context', models.CharField(blank=True, max_length=200)),
+                ('user_level', models.CharField(blank=True, max_length=50)),
+                ('explanation', models.TextField()),
+                ('size', models.PositiveIntegerField(help_text='Size of the explanation in bytes (UTF-8)')),
+                ('hits', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('last_used_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+            ],
+        ),
+    ]
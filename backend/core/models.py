@@ -1,7 +1,12 @@
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
+from django.db.models import Case, F, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Coalesce, Greatest
 from django.utils import timezone # Import for default timestamp
 from django.contrib.auth.models import User
 
+from .ulid import new_ulid
+
 #
 # CompanyDrive model to store information about company drives
 #
@@ -21,6 +26,9 @@ class CompanyDrive(models.Model):
 
     class Meta:
         ordering = ['drive_date'] # Default ordering by drive date
+        indexes = [
+            models.Index(fields=['drive_date'], name='drive_date_idx'),
+        ]
 
 #
 # Skills and Learning Resources models
@@ -79,8 +87,37 @@ class ForumCategory(models.Model):
     order = models.IntegerField(default=0, help_text="Display order")
     created_at = models.DateTimeField(default=timezone.now)
     
+    # Precomputed statistics, maintained by DiscussionTopic and DiscussionPost writes
+    topic_count = models.IntegerField(default=0, help_text="Number of active topics in this category")
+    latest_topic = models.ForeignKey(
+        'DiscussionTopic', on_delete=models.SET_NULL,
+        null=True, blank=True, related_name='+',
+        help_text="Active topic with the most recent activity"
+    )
+    
     def __str__(self):
         return self.name
+
+    @staticmethod
+    def topic_stats_expressions():
+        """
+        Expressions that recompute the category statistics from the topics
+        table, for use in ForumCategory.objects.update().
+        """
+        topics = DiscussionTopic.objects.filter(category=OuterRef('pk'), is_active=True)
+        topic_count = topics.order_by().values('category').annotate(count=models.Count('id')).values('count')
+        latest_topic = topics.order_by('-last_activity', '-id').values('pk')[:1]
+        return {
+            'topic_count': Coalesce(Subquery(topic_count, output_field=models.IntegerField()), 0),
+            'latest_topic': Subquery(latest_topic),
+        }
+
+    @classmethod
+    def refresh_stats(cls, category_ids):
+        """Recompute statistics for the given categories in a single UPDATE"""
+        category_ids = [pk for pk in set(category_ids) if pk is not None]
+        if category_ids:
+            cls.objects.filter(pk__in=category_ids).update(**cls.topic_stats_expressions())
     
     class Meta:
         verbose_name = "Forum Category"
@@ -124,26 +161,109 @@ class DiscussionTopic(models.Model):
     is_locked = models.BooleanField(default=False, help_text="Prevent new posts")
     view_count = models.IntegerField(default=0, help_text="Number of times topic was viewed")
     
+    # Denormalized post statistics, maintained by DiscussionPost.save/delete
+    post_count = models.IntegerField(default=0, help_text="Number of posts in this topic")
+    last_post_author_name = models.CharField(max_length=100, null=True, blank=True)
+    last_post_at = models.DateTimeField(null=True, blank=True)
+    
     # Real-time features
     is_active = models.BooleanField(default=True)
     last_activity = models.DateTimeField(default=timezone.now)
 
+    # Moderation flags whose changes are pushed to open topic lists
+    LIST_FLAG_FIELDS = ('is_pinned', 'is_locked')
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the loaded category state so save() can keep ForumCategory stats current
+        instance._loaded_category_state = (
+            instance.__dict__.get('category_id'), instance.__dict__.get('is_active')
+        )
+        # ...and the state WebSocket rooms cache, so changes can be published (core/signals.py)
+        instance._loaded_room_state = (instance.__dict__.get('is_active'), instance.__dict__.get('is_locked'))
+        # ...and the flags shown in topic lists, for list deltas (core/topic_list.py)
+        instance._loaded_list_flags = {field: instance.__dict__.get(field) for field in cls.LIST_FLAG_FIELDS}
+        return instance
+
+    def room_state_changed(self):
+        """Whether is_active or is_locked differ from the values loaded from the database"""
+        return getattr(self, '_loaded_room_state', None) != (self.is_active, self.is_locked)
+
+    def changed_list_flags(self):
+        """The LIST_FLAG_FIELDS whose values differ from the ones loaded from the database"""
+        loaded = getattr(self, '_loaded_list_flags', {})
+        return [field for field in self.LIST_FLAG_FIELDS if loaded.get(field) != getattr(self, field)]
+
     def save(self, *args, **kwargs):
         # Auto-set author_name if user is provided
         if self.author:
             self.author_name = self.author.first_name or self.author.username
+        is_new = self.pk is None
         super().save(*args, **kwargs)
+        
+        if is_new:
+            if self.category_id and self.is_active:
+                ForumCategory.objects.filter(pk=self.category_id).update(
+                    topic_count=F('topic_count') + 1,
+                    latest_topic=self.pk
+                )
+        else:
+            loaded_state = getattr(self, '_loaded_category_state', None)
+            current_state = (self.category_id, self.is_active)
+            if loaded_state != current_state:
+                # Category changed or topic was (de)activated
+                ForumCategory.refresh_stats([loaded_state[0] if loaded_state else None, self.category_id])
+        self._loaded_category_state = (self.category_id, self.is_active)
+        self._loaded_room_state = (self.is_active, self.is_locked)
+        self._loaded_list_flags = {field: getattr(self, field) for field in self.LIST_FLAG_FIELDS}
+
+    def delete(self, *args, **kwargs):
+        category_id = self.category_id
+        result = super().delete(*args, **kwargs)
+        ForumCategory.refresh_stats([category_id])
+        return result
 
     def update_activity(self):
         """Update last activity timestamp"""
         self.last_activity = timezone.now()
         self.save(update_fields=['last_activity'])
+        if self.category_id and self.is_active:
+            ForumCategory.objects.filter(pk=self.category_id).update(latest_topic=self.pk)
+
+    @staticmethod
+    def post_stats_expressions():
+        """
+        Expressions that recompute the denormalized post statistics from the
+        posts table, for use in DiscussionTopic.objects.update().
+        """
+        posts = DiscussionPost.objects.filter(topic=OuterRef('pk'))
+        post_count = posts.order_by().values('topic').annotate(count=models.Count('id')).values('count')
+        last_post = posts.order_by('-created_at', '-id')
+        return {
+            'post_count': Coalesce(Subquery(post_count, output_field=models.IntegerField()), 0),
+            'last_post_author_name': Subquery(last_post.values('author_name')[:1]),
+            'last_post_at': Subquery(last_post.values('created_at')[:1]),
+        }
 
     def __str__(self):
         return self.title
 
     class Meta:
         ordering = ['-last_activity', '-created_at'] # Order by activity first, then creation
+        indexes = [
+            # DiscussionTopicViewSet lists active topics, pinned first, by activity,
+            # optionally filtered by category. Partial indexes, because SQLite
+            # cannot use a leading boolean column for `WHERE is_active`
+            models.Index(
+                fields=['-is_pinned', '-last_activity'], condition=Q(is_active=True),
+                name='topic_active_pinned_idx'
+            ),
+            models.Index(
+                fields=['category', '-is_pinned', '-last_activity'], condition=Q(is_active=True),
+                name='topic_category_pinned_idx'
+            ),
+        ]
 
 
 class DiscussionPost(models.Model):
@@ -161,6 +281,10 @@ class DiscussionPost(models.Model):
     author_name = models.CharField(max_length=100, default='Anonymous')
     created_at = models.DateTimeField(default=timezone.now)
     updated_at = models.DateTimeField(auto_now=True)
+    # Sortable id assigned before the post is written (see core/chat_queue.py)
+    message_id = models.CharField(max_length=26, unique=True, null=True, blank=True, editable=False)
+    # Per-topic broadcast sequence number of posts sent over the WebSocket (see core/replay.py)
+    sequence = models.PositiveBigIntegerField(null=True, blank=True, editable=False)
     
     # Real-time features
     is_edited = models.BooleanField(default=False)
@@ -169,19 +293,79 @@ class DiscussionPost(models.Model):
         # Auto-set author_name if user is provided
         if self.author:
             self.author_name = self.author.first_name or self.author.username
+        if not self.message_id:
+            self.message_id = new_ulid()
         
-        # Update topic activity when new post is created
+        # Update topic activity and post statistics when new post is created
         is_new = self.pk is None
         super().save(*args, **kwargs)
         
         if is_new:
-            self.topic.update_activity()
+            DiscussionPost.record_new_posts(self.topic_id, 1, self.author_name, self.created_at)
+            # Imported here: topic_list depends on the serializers, which import this module
+            from .topic_list import POST_ACTIVITY_FIELDS, publish_topic_changes
+            publish_topic_changes([self.topic_id], POST_ACTIVITY_FIELDS)
+
+    @staticmethod
+    def record_new_posts(topic_id, count, last_author_name, last_created_at):
+        """
+        Update a topic's post statistics and activity, and its category's
+        latest topic, after `count` posts were added to it; the newest of them
+        was written by `last_author_name` at `last_created_at`.
+        """
+        # Only move the last-post pointer forward, never back to an older post
+        is_latest = Q(last_post_at__isnull=True) | Q(last_post_at__lte=last_created_at)
+        DiscussionTopic.objects.filter(pk=topic_id).update(
+            post_count=F('post_count') + count,
+            last_post_author_name=Case(
+                When(is_latest, then=Value(last_author_name)),
+                default=F('last_post_author_name')
+            ),
+            last_post_at=Case(
+                When(is_latest, then=Value(last_created_at)),
+                default=F('last_post_at')
+            ),
+            last_activity=timezone.now()
+        )
+        # The topic that just received a post is now its category's latest activity
+        ForumCategory.objects.filter(
+            pk=Subquery(
+                DiscussionTopic.objects.filter(pk=topic_id, is_active=True).order_by().values('category_id')[:1]
+            )
+        ).update(latest_topic=topic_id)
+
+    def delete(self, *args, **kwargs):
+        topic_id = self.topic_id
+        created_at = self.created_at
+        result = super().delete(*args, **kwargs)
+        
+        # Recompute the last-post pointer only if this post was the latest one
+        last_post_stats = DiscussionTopic.post_stats_expressions()
+        was_latest = Q(last_post_at=created_at)
+        DiscussionTopic.objects.filter(pk=topic_id).update(
+            post_count=Greatest(F('post_count') - 1, 0),
+            last_post_author_name=Case(
+                When(was_latest, then=last_post_stats['last_post_author_name']),
+                default=F('last_post_author_name')
+            ),
+            last_post_at=Case(
+                When(was_latest, then=last_post_stats['last_post_at']),
+                default=F('last_post_at')
+            )
+        )
+        return result
 
     def __str__(self):
         return f"Post by {self.author_name} on {self.topic.title[:30]}..."
 
     class Meta:
         ordering = ['created_at'] # Order posts within a topic from oldest to newest
+        indexes = [
+            # Posts are always read per topic in (created_at, id) order
+            models.Index(fields=['topic', 'created_at', 'id'], name='post_topic_created_idx'),
+            # Replay of missed WebSocket messages reads a topic's posts by sequence range
+            models.Index(fields=['topic', 'sequence'], name='post_topic_sequence_idx'),
+        ]
 
 
 #
@@ -270,6 +454,12 @@ class UserPreparationPlan(models.Model):
     
     class Meta:
         ordering = ['-last_accessed', '-created_at']
+        indexes = [
+            models.Index(
+                fields=['user', '-last_accessed'], condition=Q(is_active=True),
+                name='plan_user_active_idx'
+            ),
+        ]
 
 
 class PlanProgress(models.Model):
@@ -321,4 +511,95 @@ class PlanProgress(models.Model):
         return f"{status} {self.section_name}: {self.topic_name}"
     
     class Meta:
-        unique_together = ['plan', 'section_name', 'topic_name']
\ No newline at end of file
+        unique_together = ['plan', 'section_name', 'topic_name']
+
+#
+# AI Response Caches
+#
+
+class TopicExplanation(models.Model):
+    """
+    A cached AITopicExplainerView answer (see core/explanation_cache.py).
+    The key hashes the normalized topic inputs together with the namespace
+    (model and prompt version), so entries of another model are never hit.
+    """
+    key = models.CharField(max_length=64, unique=True)
+    namespace = models.CharField(max_length=100)
+    # Normalized inputs, kept for inspection
+    topic_name = models.CharField(max_length=200)
+    skill_context = models.CharField(max_length=200, blank=True)
+    user_level = models.CharField(max_length=50, blank=True)
+    explanation = models.TextField()
+    size = models.PositiveIntegerField(help_text="Size of the explanation in bytes (UTF-8)")
+    hits = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(default=timezone.now)
+    last_used_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    def __str__(self):
+        return f"{self.topic_name} ({self.user_level}, {self.namespace})"
+
+
+class PlanTemplate(models.Model):
+    """
+    A cached Gemini preparation plan (see core/plan_templates.py), shared by
+    every user who submits the same normalized role, job description and
+    academic details. Each user still gets their own UserPreparationPlan.
+    """
+    key = models.CharField(max_length=64, unique=True)
+    # Model and prompt fingerprint the template was generated with
+    namespace = models.CharField(max_length=100)
+    preferred_role = models.CharField(max_length=200, blank=True)
+    plan_data = models.JSONField()
+    hits = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(default=timezone.now)
+    last_used_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    def __str__(self):
+        return f"{self.preferred_role or 'Job description'} ({self.namespace})"
+
+
+#
+# Background Jobs
+#
+
+class Job(models.Model):
+    """
+    A long-running AI generation queued by one of the views that support
+    background=true and run by a worker (see core/jobs.py). The result is
+    the response data the view would have returned inline.
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (SUCCEEDED, 'Succeeded'),
+        (FAILED, 'Failed'),
+    ]
+    FINISHED = (SUCCEEDED, FAILED)
+
+    id = models.CharField(primary_key=True, max_length=26, default=new_ulid, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='jobs')
+    kind = models.CharField(max_length=50)
+    payload = models.JSONField(encoder=DjangoJSONEncoder)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=QUEUED)
+    result = models.JSONField(encoder=DjangoJSONEncoder, null=True, blank=True)
+    # HTTP status of the result, as the view would have answered inline
+    result_status = models.PositiveSmallIntegerField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    # A running job whose lease has passed belonged to a worker that died; it is requeued
+    locked_until = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.kind} job {self.id} ({self.status})"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='job_status_created_idx'),
+        ]
@@ -0,0 +1,101 @@
+import base64
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class PostKeysetPagination(BasePagination):
+    """
+    Keyset (cursor) pagination for discussion posts on (created_at, id).
+
+    The first page holds the newest posts; the `before` cursor loads the page
+    of posts immediately older than it. Every page is a single indexed range
+    scan, so loading older posts costs O(page size) regardless of thread depth.
+    Posts within a page are returned oldest to newest for display.
+    """
+    page_size = 50
+    max_page_size = 200
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'before'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        page_size = self.get_page_size(request)
+
+        cursor = request.query_params.get(self.cursor_query_param)
+        before = self.decode_cursor(cursor) if cursor else None
+
+        self.page, self.older_cursor = self.get_page(queryset, page_size, before)
+        return self.page
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        return max(1, min(page_size, self.max_page_size))
+
+    @classmethod
+    def get_page(cls, queryset, page_size=None, before=None):
+        """
+        Return (posts, older_cursor) for the page of posts preceding `before`
+        (a decoded (created_at, id) cursor), or the newest page if it is None.
+        """
+        page_size = page_size or cls.page_size
+        if before is not None:
+            created_at, post_id = before
+            queryset = queryset.filter(
+                Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=post_id)
+            )
+        posts = list(queryset.order_by('-created_at', '-id')[:page_size + 1])
+        has_older = len(posts) > page_size
+        posts = posts[:page_size]
+        posts.reverse()
+        older_cursor = cls.encode_cursor(posts[0]) if has_older else None
+        return posts, older_cursor
+
+    @staticmethod
+    def encode_cursor(post):
+        position = f'{post.created_at.isoformat()}|{post.id}'
+        return base64.urlsafe_b64encode(position.encode('ascii')).decode('ascii')
+
+    def decode_cursor(self, encoded):
+        try:
+            position = base64.urlsafe_b64decode(encoded.encode('ascii')).decode('ascii')
+            created_at, post_id = position.rsplit('|', 1)
+            created_at = parse_datetime(created_at)
+            post_id = int(post_id)
+        except (TypeError, ValueError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if created_at is None:
+            raise NotFound(self.invalid_cursor_message)
+        return created_at, post_id
+
+    def get_older_link(self):
+        if self.older_cursor is None:
+            return None
+        return replace_query_param(self.base_url, self.cursor_query_param, self.older_cursor)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'older': self.get_older_link(),
+            'older_cursor': self.older_cursor,
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'older': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'older_cursor': {'type': 'string', 'nullable': True},
+                'results': schema,
+            },
+        }
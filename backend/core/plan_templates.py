@@ -0,0 +1,130 @@
+"""
+Cache of Gemini preparation plans for PersonalizedPrepPlanView.
+
+At campus-drive time many students submit near-identical inputs. The plan
+Gemini generates for a (preferred_role, job_description, academic_details)
+fingerprint is therefore stored as a PlanTemplate. Each user still gets
+their own UserPreparationPlan and PlanProgress rows, created from a copy of
+the template.
+
+* Fingerprints hash the normalized inputs (see normalize_text).
+* Templates are namespaced by the model and a fingerprint of the prompt
+  the view renders. Editing _create_gemini_prompt, bumping
+  PREP_PLAN_TEMPLATE_VERSION or switching models therefore starts a fresh
+  cache; the old templates are evicted on the next store.
+  invalidate() drops every template, e.g. after the learning resources
+  embedded in the plans change.
+* Templates expire PREP_PLAN_TEMPLATE_TTL seconds after they were
+  generated. Beyond PREP_PLAN_TEMPLATE_MAX_ENTRIES, the least recently
+  used templates are evicted.
+* Concurrent misses for the same fingerprint in this process share one
+  generation (single flight).
+"""
+import copy
+import hashlib
+import json
+import threading
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .explanation_cache import normalize_text
+from .llm import llm_gateway
+from .models import PlanTemplate
+from .single_flight import SingleFlight
+
+INPUT_FIELDS = ('preferred_role', 'job_description', 'academic_details')
+
+
+def prompt_fingerprint(build_prompt):
+    """Hash of the prompt `build_prompt(preferred_role, job_description, academic_details)` renders"""
+    rendered = build_prompt('{preferred_role}', '{job_description}', '{academic_details}') + build_prompt('', '', '')
+    return hashlib.sha256(rendered.encode('utf-8')).hexdigest()[:16]
+
+
+class PlanTemplateCache:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._single_flight = SingleFlight()
+        self._counts = Counter()
+
+    @property
+    def ttl(self):
+        return timedelta(seconds=getattr(settings, 'PREP_PLAN_TEMPLATE_TTL', 7 * 24 * 3600))
+
+    def namespace(self, prompt_version):
+        return f"{llm_gateway.model}:v{getattr(settings, 'PREP_PLAN_TEMPLATE_VERSION', 1)}:{prompt_version}"
+
+    def key(self, inputs, prompt_version):
+        normalized = {field: normalize_text(inputs.get(field, '')) for field in INPUT_FIELDS}
+        material = json.dumps({'namespace': self.namespace(prompt_version), **normalized}, sort_keys=True)
+        return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+    def get_or_generate(self, inputs, generate, prompt_version):
+        """
+        (plan_data, cached): a copy of the cached template for the inputs, or
+        of the one `generate()` returns, which is then stored. `prompt_version`
+        is the prompt_fingerprint() of the view's prompt.
+        """
+        key = self.key(inputs, prompt_version)
+        template = PlanTemplate.objects.filter(
+            key=key, created_at__gte=timezone.now() - self.ttl
+        ).values_list('plan_data', flat=True).first()
+        if template is not None:
+            PlanTemplate.objects.filter(key=key).update(last_used_at=timezone.now(), hits=F('hits') + 1)
+            self._count('hits')
+            return template, True
+
+        template, shared = self._single_flight.do(key, lambda: self._generate(key, inputs, generate, prompt_version))
+        if shared:
+            self._count('coalesced')
+        # Callers add their plan_id, so every caller gets its own copy
+        return copy.deepcopy(template), False
+
+    def _generate(self, key, inputs, generate, prompt_version):
+        self._count('misses')
+        template = generate()
+        now = timezone.now()
+        PlanTemplate.objects.update_or_create(key=key, defaults={
+            'namespace': self.namespace(prompt_version),
+            'preferred_role': normalize_text(inputs.get('preferred_role', ''))[:200],
+            'plan_data': template,
+            'hits': 0,
+            'created_at': now,
+            'last_used_at': now,
+        })
+        self.evict(prompt_version)
+        return template
+
+    def evict(self, prompt_version):
+        """Delete expired templates and templates of other namespaces, then the least recently used over the limit"""
+        evicted, _ = PlanTemplate.objects.filter(
+            Q(created_at__lt=timezone.now() - self.ttl) | ~Q(namespace=self.namespace(prompt_version))
+        ).delete()
+        max_entries = getattr(settings, 'PREP_PLAN_TEMPLATE_MAX_ENTRIES', 1000)
+        stale = PlanTemplate.objects.order_by('-last_used_at').values_list('pk', flat=True)[max_entries:]
+        evicted += PlanTemplate.objects.filter(pk__in=list(stale)).delete()[0]
+        self._count('evictions', evicted)
+
+    def invalidate(self):
+        """Drop every template"""
+        deleted, _ = PlanTemplate.objects.all().delete()
+        self._count('evictions', deleted)
+        return deleted
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self._counts)
+        lookups = counts.get('hits', 0) + counts.get('misses', 0) + counts.get('coalesced', 0)
+        counts['hit_ratio'] = round(counts.get('hits', 0) / lookups, 3) if lookups else None
+        return counts
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self._counts[name] += amount
+
+
+plan_template_cache = PlanTemplateCache()
@@ -0,0 +1,248 @@
+"""
+Presence tracking for discussion rooms.
+
+The registry keeps who is online in each room in memory, keyed by topic and
+user, so joins, leaves and heartbeats never touch the database. Sockets that
+stop sending frames for longer than the presence TTL are expired. Changes to
+``last_seen`` are flushed to UserOnlineStatus periodically as one bulk upsert,
+like the topic view counts in view_counts.py. Each flush first expires silent
+sockets and broadcasts ``user_leave`` for users who went offline that way.
+
+The registry covers the sockets served by this process.
+"""
+import atexit
+import logging
+import threading
+import time
+
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
+from .channel_groups import group_send_discussion, send_from_sync
+from .models import DiscussionTopic, UserOnlineStatus
+from .wire import encode_frames
+
+logger = logging.getLogger(__name__)
+
+
+def presence_event(event_type, user_id, name):
+    """Channel-layer message announcing a user_join or user_leave in a room"""
+    return {
+        'type': event_type,
+        'user_id': user_id,
+        **encode_frames({
+            'type': event_type,
+            'user': name,
+            'user_id': user_id,
+            'timestamp': timezone.now().isoformat()
+        })
+    }
+
+
+def publish_expired(expired):
+    """Broadcast user_leave for (topic id, user id, name) triples returned by expire()"""
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    for topic_id, user_id, name in expired:
+        try:
+            send_from_sync(group_send_discussion, channel_layer, topic_id, presence_event('user_leave', user_id, name))
+        except Exception:
+            logger.exception("Failed to broadcast presence expiry in topic %s", topic_id)
+
+
+class PresenceRegistry:
+    """
+    Thread-safe map of topic id -> user id -> member, where a member holds
+    the user's display name and the last heartbeat of each of their sockets
+    in that room. A user is online in a room while any socket is live.
+    """
+
+    def __init__(self, ttl=None, flush_interval=None):
+        self._ttl = ttl
+        self._flush_interval = flush_interval
+        self._rooms = {}
+        self._user_rooms = {}
+        # user id -> (last seen, topic of the latest event or None once offline)
+        self._dirty = {}
+        self._lock = threading.Lock()
+        self._timer = None
+
+    @property
+    def ttl(self):
+        if self._ttl is not None:
+            return self._ttl
+        return getattr(settings, 'DISCUSSION_PRESENCE_TTL', 60.0)
+
+    @property
+    def flush_interval(self):
+        if self._flush_interval is not None:
+            return self._flush_interval
+        return getattr(settings, 'DISCUSSION_PRESENCE_FLUSH_INTERVAL', 15.0)
+
+    def join(self, topic_id, user_id, name, channel_name, now=None):
+        """Register a socket; returns True if the user was not yet online in the room"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            room = self._rooms.setdefault(topic_id, {})
+            member = room.get(user_id)
+            first = member is None
+            if first:
+                member = room[user_id] = {'user': name, 'user_id': user_id, 'connections': {}}
+                self._user_rooms.setdefault(user_id, set()).add(topic_id)
+            member['connections'][channel_name] = now
+            self._mark_dirty(user_id, topic_id)
+        return first
+
+    def heartbeat(self, topic_id, user_id, name, channel_name, now=None):
+        """
+        Refresh a socket's heartbeat, re-registering it if it had expired;
+        returns True if that brought the user back online in the room
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            member = self._rooms.get(topic_id, {}).get(user_id)
+            if member is not None and channel_name in member['connections']:
+                member['connections'][channel_name] = now
+                self._mark_dirty(user_id, topic_id)
+                return False
+        return self.join(topic_id, user_id, name, channel_name, now)
+
+    def leave(self, topic_id, user_id, channel_name):
+        """Unregister a socket; returns True if it was the user's last one in the room"""
+        with self._lock:
+            member = self._rooms.get(topic_id, {}).get(user_id)
+            if member is None or member['connections'].pop(channel_name, None) is None:
+                return False
+            if member['connections']:
+                return False
+            self._remove_member(topic_id, user_id)
+            return True
+
+    def online(self, topic_id):
+        """Users online in a room, as {'user', 'user_id'} dicts"""
+        with self._lock:
+            return [
+                {'user': member['user'], 'user_id': member['user_id']}
+                for member in self._rooms.get(topic_id, {}).values()
+            ]
+
+    def is_online(self, topic_id, user_id):
+        with self._lock:
+            return user_id in self._rooms.get(topic_id, ())
+
+    def count(self, topic_id):
+        with self._lock:
+            return len(self._rooms.get(topic_id, ()))
+
+    def expire(self, now=None):
+        """Drop sockets without a heartbeat within the TTL; returns (topic id, user id, name) of users gone offline"""
+        now = time.monotonic() if now is None else now
+        deadline = now - self.ttl
+        expired = []
+        with self._lock:
+            for topic_id, room in list(self._rooms.items()):
+                for user_id, member in list(room.items()):
+                    connections = member['connections']
+                    for channel_name, last_heartbeat in list(connections.items()):
+                        if last_heartbeat < deadline:
+                            del connections[channel_name]
+                    if not connections:
+                        self._remove_member(topic_id, user_id)
+                        expired.append((topic_id, user_id, member['user']))
+        return expired
+
+    def flush(self):
+        """
+        Expire stale sockets and broadcast their users' leaves, then write
+        the presence of every user that changed since the last flush to
+        UserOnlineStatus in one upsert.
+
+        Returns the number of users written.
+        """
+        publish_expired(self.expire())
+        with self._lock:
+            dirty, self._dirty = self._dirty, {}
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        if not dirty:
+            return 0
+
+        topic_ids = {topic_id for _, topic_id in dirty.values() if topic_id is not None}
+        # Room ids come from socket URLs, so only link topics that exist
+        existing_topics = set(DiscussionTopic.objects.filter(pk__in=topic_ids).values_list('pk', flat=True))
+        try:
+            UserOnlineStatus.objects.bulk_create(
+                [
+                    UserOnlineStatus(
+                        user_id=user_id,
+                        is_online=topic_id is not None,
+                        last_seen=last_seen,
+                        current_topic_id=topic_id if topic_id in existing_topics else None,
+                    )
+                    for user_id, (last_seen, topic_id) in dirty.items()
+                ],
+                update_conflicts=True,
+                unique_fields=['user'],
+                update_fields=['is_online', 'last_seen', 'current_topic'],
+            )
+        except Exception:
+            logger.exception("Failed to flush discussion presence")
+            with self._lock:
+                for user_id, state in dirty.items():
+                    self._dirty.setdefault(user_id, state)
+            raise
+        return len(dirty)
+
+    def _mark_dirty(self, user_id, topic_id):
+        # Called with the lock held
+        self._dirty[user_id] = (timezone.now(), topic_id)
+        self._schedule_flush()
+
+    def _remove_member(self, topic_id, user_id):
+        # Called with the lock held
+        room = self._rooms[topic_id]
+        del room[user_id]
+        if not room:
+            del self._rooms[topic_id]
+        rooms = self._user_rooms.get(user_id, set())
+        rooms.discard(topic_id)
+        if not rooms:
+            self._user_rooms.pop(user_id, None)
+        self._dirty[user_id] = (timezone.now(), next(iter(rooms), None))
+        self._schedule_flush()
+
+    def _schedule_flush(self):
+        # Called with the lock held
+        if self._timer is None:
+            self._timer = threading.Timer(self.flush_interval, self._flush_from_timer)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _flush_from_timer(self):
+        with self._lock:
+            self._timer = None
+        try:
+            self.flush()
+        except Exception:
+            pass
+        finally:
+            connections.close_all()
+            # Keep sweeping for expired sockets while anyone is connected
+            with self._lock:
+                if self._rooms:
+                    self._schedule_flush()
+
+
+presence_registry = PresenceRegistry()
+
+
+@atexit.register
+def _flush_at_exit():
+    try:
+        presence_registry.flush()
+    except Exception:
+        pass
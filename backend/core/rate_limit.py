@@ -0,0 +1,96 @@
+"""
+Inbound frame limits for discussion WebSockets.
+
+Every inbound frame (chat_message, typing, ping) spends a token from a
+per-user bucket shared by all of the user's sockets in this process.
+Frames over the limit are dropped, and drops are counted by reason and
+message type so they can be watched from the realtime stats endpoint.
+"""
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+
+
+class TokenBucket:
+    """Token bucket refilled at `rate` tokens per second up to `capacity`"""
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated')
+
+    def __init__(self, rate, capacity, now=None):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic() if now is None else now
+
+    def refill(self, now=None):
+        now = time.monotonic() if now is None else now
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def consume(self, cost=1, now=None):
+        """Take `cost` tokens if available; returns whether the frame is allowed"""
+        self.refill(now)
+        if self.tokens < cost:
+            return False
+        self.tokens -= cost
+        return True
+
+
+class FrameRateLimiter:
+    """
+    Token buckets keyed by user. Once more than `max_keys` buckets exist,
+    buckets that have refilled completely (idle users) are discarded.
+    """
+
+    def __init__(self, rate=None, burst=None, max_keys=10_000):
+        self._rate = rate
+        self._burst = burst
+        self.max_keys = max_keys
+        self._buckets = {}
+
+    @property
+    def rate(self):
+        if self._rate is not None:
+            return self._rate
+        return getattr(settings, 'DISCUSSION_FRAME_RATE', 5.0)
+
+    @property
+    def burst(self):
+        if self._burst is not None:
+            return self._burst
+        return getattr(settings, 'DISCUSSION_FRAME_BURST', 20)
+
+    def allow(self, key, now=None):
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            if len(self._buckets) >= self.max_keys:
+                self._prune(now)
+            bucket = self._buckets[key] = TokenBucket(self.rate, self.burst, now)
+        return bucket.consume(now=now)
+
+    def _prune(self, now=None):
+        for key, bucket in list(self._buckets.items()):
+            bucket.refill(now)
+            if bucket.tokens >= bucket.capacity:
+                del self._buckets[key]
+
+
+frame_rate_limiter = FrameRateLimiter()
+
+_dropped_frames = Counter()
+_dropped_frames_lock = threading.Lock()
+
+
+def record_dropped_frame(reason, message_type):
+    with _dropped_frames_lock:
+        _dropped_frames[reason, message_type] += 1
+
+
+def dropped_frame_counts():
+    """Dropped inbound frames in this process as {reason: {message type: count}}"""
+    with _dropped_frames_lock:
+        counts = {}
+        for (reason, message_type), count in _dropped_frames.items():
+            counts.setdefault(reason, {})[message_type] = count
+        return counts
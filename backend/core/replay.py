@@ -0,0 +1,176 @@
+"""
+Sequence numbers and replay of missed chat messages for discussion rooms.
+
+Every chat message broadcast in a room gets the room's next sequence number.
+A socket that reconnects with ?resume_from=<last seen seq> is sent only the
+messages it missed. They come from a bounded per-room ring buffer, kept by
+each process while it has sockets in the room. If the buffer has rolled past
+resume_from, the messages come from a range query on DiscussionPost.sequence,
+followed by buffered messages that the write-behind queue has not persisted yet.
+
+Sequence numbers are allocated in-process, or with Redis INCR when
+DISCUSSION_SEQUENCE_REDIS_URL is set (several ASGI workers share a room).
+Either way, allocation starts after the highest sequence already stored.
+"""
+import asyncio
+from collections import OrderedDict
+
+from channels.db import database_sync_to_async
+from django.conf import settings
+from django.db.models import Max
+
+from .chat_queue import ChatMessage
+from .models import DiscussionPost
+from .wire import encode_frames
+
+
+def last_persisted_sequence(topic_id):
+    return DiscussionPost.objects.filter(topic_id=topic_id).aggregate(last=Max('sequence'))['last'] or 0
+
+
+def persisted_messages(topic_id, after, limit):
+    """Up to `limit` persisted messages of a topic with a sequence above `after`, in order"""
+    posts = DiscussionPost.objects.filter(topic_id=topic_id, sequence__gt=after).order_by('sequence')[:limit]
+    return [ChatMessage.from_post(post) for post in posts]
+
+
+class LocalSequenceAllocator:
+    """Per-topic counters in this process"""
+
+    def __init__(self):
+        self._last = {}
+
+    async def next(self, topic_id):
+        if topic_id not in self._last:
+            seed = await database_sync_to_async(last_persisted_sequence)(topic_id)
+            # Another message may have seeded the counter while we queried
+            self._last.setdefault(topic_id, seed)
+        self._last[topic_id] += 1
+        return self._last[topic_id]
+
+
+class RedisSequenceAllocator:
+    """Per-topic counters shared by all processes through Redis INCR"""
+    key_prefix = 'discussion:sequence:'
+
+    def __init__(self, url):
+        self.url = url
+        self._client = None
+        self._loop = None
+        self._seeded = set()
+
+    def client(self):
+        # redis.asyncio clients belong to the event loop they were created on
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            from redis.asyncio import Redis
+            self._client = Redis.from_url(self.url)
+            self._loop = loop
+        return self._client
+
+    async def next(self, topic_id):
+        client = self.client()
+        key = f'{self.key_prefix}{topic_id}'
+        seed = None
+        if topic_id not in self._seeded:
+            seed = await database_sync_to_async(last_persisted_sequence)(topic_id)
+            await client.set(key, seed, nx=True)
+            self._seeded.add(topic_id)
+        sequence = await client.incr(key)
+        if seed is not None and sequence <= seed:
+            # Redis lost the counter (e.g. restored from an old snapshot); jump past the database
+            sequence = await client.incrby(key, seed - sequence + 1)
+        return sequence
+
+
+class ReplayBuffers:
+    """
+    Per-room ring buffers of recently broadcast messages, keyed by sequence.
+    A room's buffer exists while this process has sockets in it, because
+    only then does the process receive every message broadcast there.
+    """
+
+    def __init__(self, size=None):
+        self._size = size
+        self._rooms = {}
+        self._sockets = {}
+
+    @property
+    def size(self):
+        if self._size is not None:
+            return self._size
+        return getattr(settings, 'DISCUSSION_REPLAY_BUFFER_SIZE', 500)
+
+    def attach(self, topic_id):
+        self._sockets[topic_id] = self._sockets.get(topic_id, 0) + 1
+
+    def detach(self, topic_id):
+        remaining = self._sockets.get(topic_id, 0) - 1
+        if remaining > 0:
+            self._sockets[topic_id] = remaining
+        else:
+            self._sockets.pop(topic_id, None)
+            self._rooms.pop(topic_id, None)
+
+    def record(self, topic_id, sequence, message_id, frames):
+        """
+        Remember a broadcast message (its encode_frames() dict); every socket
+        in the room reports it, only the first report counts.
+        """
+        if sequence is None or topic_id not in self._sockets:
+            return
+        buffer = self._rooms.setdefault(topic_id, OrderedDict())
+        if sequence in buffer:
+            return
+        out_of_order = bool(buffer) and sequence < next(reversed(buffer))
+        buffer[sequence] = (message_id, frames)
+        if out_of_order:
+            self._rooms[topic_id] = buffer = OrderedDict(sorted(buffer.items()))
+        while len(buffer) > self.size:
+            buffer.popitem(last=False)
+
+    def discard(self, topic_id, message_id):
+        """Forget a message that was retracted because it could not be saved"""
+        buffer = self._rooms.get(topic_id, {})
+        for sequence, (buffered_id, _) in list(buffer.items()):
+            if buffered_id == message_id:
+                del buffer[sequence]
+
+    def since(self, topic_id, after):
+        """
+        Returns (covered, frames): the buffered (sequence, frames) pairs above
+        `after`, and whether the buffer reaches back far enough to hold all of them.
+        """
+        buffer = self._rooms.get(topic_id)
+        if not buffer:
+            return False, []
+        covered = next(iter(buffer)) <= after + 1
+        return covered, [(sequence, frames) for sequence, (_, frames) in buffer.items() if sequence > after]
+
+
+def get_sequence_allocator():
+    url = getattr(settings, 'DISCUSSION_SEQUENCE_REDIS_URL', '')
+    return RedisSequenceAllocator(url) if url else LocalSequenceAllocator()
+
+
+sequence_allocator = get_sequence_allocator()
+replay_buffers = ReplayBuffers()
+
+
+async def missed_frames(topic_id, resume_from, buffers=None):
+    """
+    Encoded frames (encode_frames() dicts) of the messages after `resume_from`, in sequence order,
+    or None if more were missed than DISCUSSION_REPLAY_MAX_MESSAGES (the
+    client should reload the topic instead).
+    """
+    buffers = buffers or replay_buffers
+    limit = getattr(settings, 'DISCUSSION_REPLAY_MAX_MESSAGES', 500)
+    covered, buffered = buffers.since(topic_id, resume_from)
+    if covered:
+        frames = [frame for _, frame in buffered]
+    else:
+        persisted = await database_sync_to_async(persisted_messages)(topic_id, resume_from, limit + 1)
+        last = persisted[-1].sequence if persisted else resume_from
+        frames = [encode_frames(message.to_frame()) for message in persisted]
+        frames += [frame for sequence, frame in buffered if sequence > last]
+    return frames if len(frames) <= limit else None
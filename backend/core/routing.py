@@ -4,4 +4,5 @@ from . import consumers
 websocket_urlpatterns = [
     re_path(r'^ws/discussion/(?P<topic_id>\d+)/$', consumers.DiscussionConsumer.as_asgi()),
     re_path(r'^ws/discussion_list/$', consumers.DiscussionListConsumer.as_asgi()),
+    re_path(r'^ws/jobs/$', consumers.JobsConsumer.as_asgi()),
 ] 
\ No newline at end of file
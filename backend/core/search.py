@@ -0,0 +1,273 @@
+"""
+Full-text search index for discussion topics, posts and company drives.
+
+Each searchable model has a document table maintained by model signals
+(see core/signals.py). The backend is chosen from the database vendor:
+SQLite uses FTS5 virtual tables and PostgreSQL uses tsvector columns with
+GIN indexes; both are created and filled by migration 0013. On any other
+database, or when the index tables are missing, FullTextSearchFilter
+falls back to DRF's SearchFilter.
+"""
+import re
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.db import connection
+from django.db.models.expressions import RawSQL
+from rest_framework import filters
+from rest_framework.settings import api_settings
+
+from .models import CompanyDrive, DiscussionPost, DiscussionTopic, ForumCategory, Skill
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def _join(*values):
+    return ' '.join(value for value in values if value)
+
+
+@dataclass(frozen=True)
+class SearchDocument:
+    """
+    Describes how a model instance is indexed: `title` text ranks above
+    `body` text, and hits on documents with a `parent_field` (posts) are
+    reported against the parent object (their topic). `fields` lists the
+    model fields whose changes require re-indexing. `depends_on` lists the
+    (related model, field, relation) triples of text embedded from related
+    objects: changing that field re-indexes the documents whose `relation`
+    points at the object.
+    """
+    name: str
+    model: type
+    table: str
+    build: callable
+    fields: frozenset
+    select_related: tuple = ()
+    parent_field: str = None
+    depends_on: tuple = ()
+
+
+SEARCH_DOCUMENTS = {
+    document.name: document for document in [
+        SearchDocument(
+            name='topic', model=DiscussionTopic, table='core_search_topic',
+            fields=frozenset({'title', 'content', 'author_name', 'category', 'related_skill', 'related_company'}),
+            select_related=('category', 'related_skill', 'related_company'),
+            depends_on=(
+                (ForumCategory, 'name', 'category'),
+                (Skill, 'name', 'related_skill'),
+                (CompanyDrive, 'company_name', 'related_company'),
+            ),
+            build=lambda topic: (
+                topic.title,
+                _join(
+                    topic.content, topic.author_name,
+                    topic.category.name if topic.category_id else '',
+                    topic.related_skill.name if topic.related_skill_id else '',
+                    topic.related_company.company_name if topic.related_company_id else '',
+                ),
+            ),
+        ),
+        SearchDocument(
+            name='post', model=DiscussionPost, table='core_search_post', parent_field='topic_id',
+            fields=frozenset({'content', 'author_name', 'topic'}),
+            build=lambda post: ('', _join(post.content, post.author_name)),
+        ),
+        SearchDocument(
+            name='drive', model=CompanyDrive, table='core_search_drive',
+            fields=frozenset({'company_name', 'role', 'domain', 'location'}),
+            build=lambda drive: (_join(drive.company_name, drive.role), _join(drive.domain, drive.location)),
+        ),
+    ]
+}
+
+
+def tokenize(terms):
+    """Split search terms into plain word tokens, dropping query syntax"""
+    return [token for term in terms for token in TOKEN_RE.findall(term)]
+
+
+class SearchBackend:
+    """Base class for the full-text index backends"""
+    vendor = None
+
+    def __init__(self):
+        self._available = None
+
+    def is_available(self):
+        if self._available is None:
+            tables = set(connection.introspection.table_names())
+            self._available = all(document.table in tables for document in SEARCH_DOCUMENTS.values())
+        return self._available
+
+    def index_objects(self, document, objects):
+        rows = []
+        for obj in objects:
+            title, body = document.build(obj)
+            parent_id = getattr(obj, document.parent_field) if document.parent_field else None
+            rows.append((obj.pk, parent_id, title or '', body or ''))
+        if rows:
+            self._upsert(document, rows)
+
+    def remove(self, document, object_ids):
+        object_ids = list(object_ids)
+        if object_ids:
+            with connection.cursor() as cursor:
+                cursor.executemany(
+                    f'DELETE FROM {document.table} WHERE {self.id_column} = %s',
+                    [(object_id,) for object_id in object_ids]
+                )
+
+    def clear(self, document):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {document.table}')
+
+    def search(self, document, terms, limit):
+        """Return (object_id, parent_id, score) tuples, best match first"""
+        raise NotImplementedError
+
+    def ranked_ordering(self, model, ranked_ids):
+        """
+        Ordering expression that sorts rows of `model` in the order of
+        `ranked_ids`, as one parameter rather than a CASE with a branch per id.
+        """
+        raise NotImplementedError
+
+    def _upsert(self, document, rows):
+        raise NotImplementedError
+
+
+class SQLiteFTS5Backend(SearchBackend):
+    """FTS5 virtual tables keyed by rowid = object id, ranked with bm25"""
+    vendor = 'sqlite'
+    id_column = 'rowid'
+
+    def _upsert(self, document, rows):
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT OR REPLACE INTO {document.table} (rowid, parent_id, title, body) VALUES (%s, %s, %s, %s)',
+                rows
+            )
+
+    def search(self, document, terms, limit):
+        tokens = tokenize(terms)
+        if not tokens:
+            return []
+        # Every token must match, as a prefix, like SearchFilter's AND of icontains
+        match = ' '.join(f'"{token}"*' for token in tokens)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid, parent_id, -bm25({document.table}, 0, 10.0, 1.0) AS score '
+                f'FROM {document.table} WHERE {document.table} MATCH %s ORDER BY score DESC LIMIT %s',
+                [match, limit]
+            )
+            return cursor.fetchall()
+
+    def ranked_ordering(self, model, ranked_ids):
+        column = f'"{model._meta.db_table}"."{model._meta.pk.column}"'
+        positions = ',' + ','.join(str(pk) for pk in ranked_ids) + ','
+        return RawSQL(f"instr(%s, ',' || {column} || ',')", [positions])
+
+
+class PostgresTsvectorBackend(SearchBackend):
+    """tsvector documents with a GIN index, ranked with ts_rank_cd"""
+    vendor = 'postgresql'
+    id_column = 'object_id'
+
+    def _upsert(self, document, rows):
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f"INSERT INTO {document.table} (object_id, parent_id, document) VALUES "
+                f"(%s, %s, setweight(to_tsvector('english', %s), 'A') || setweight(to_tsvector('english', %s), 'B')) "
+                f"ON CONFLICT (object_id) DO UPDATE SET parent_id = EXCLUDED.parent_id, document = EXCLUDED.document",
+                rows
+            )
+
+    def search(self, document, terms, limit):
+        tokens = tokenize(terms)
+        if not tokens:
+            return []
+        query = ' & '.join(f'{token}:*' for token in tokens)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT object_id, parent_id, ts_rank_cd(document, query) AS score "
+                f"FROM {document.table}, to_tsquery('english', %s) query "
+                f"WHERE document @@ query ORDER BY score DESC LIMIT %s",
+                [query, limit]
+            )
+            return cursor.fetchall()
+
+    def ranked_ordering(self, model, ranked_ids):
+        column = f'"{model._meta.db_table}"."{model._meta.pk.column}"'
+        return RawSQL(f'array_position(%s::bigint[], {column})', [list(ranked_ids)])
+
+
+SEARCH_BACKENDS = {backend.vendor: backend for backend in (SQLiteFTS5Backend, PostgresTsvectorBackend)}
+_backends = {}
+
+
+def get_search_backend():
+    """Return the search backend for the default database, or None if unsupported"""
+    if not getattr(settings, 'FULL_TEXT_SEARCH_ENABLED', True):
+        return None
+    backend_class = SEARCH_BACKENDS.get(connection.vendor)
+    if backend_class is None:
+        return None
+    if connection.alias not in _backends:
+        _backends[connection.alias] = backend_class()
+    backend = _backends[connection.alias]
+    return backend if backend.is_available() else None
+
+
+def rebuild_index(document, batch_size=2000):
+    """Rebuild one document table from the database; returns the number of indexed objects"""
+    backend = get_search_backend()
+    if backend is None:
+        return 0
+    backend.clear(document)
+    return index_queryset(backend, document, document.model.objects.all(), batch_size)
+
+
+def index_queryset(backend, document, queryset, batch_size=2000):
+    """Re-index the objects of `queryset` in primary key batches; returns the number of indexed objects"""
+    queryset = queryset.order_by('pk').select_related(*document.select_related)
+    indexed = 0
+    last_pk = 0
+    while True:
+        batch = list(queryset.filter(pk__gt=last_pk)[:batch_size])
+        if not batch:
+            return indexed
+        backend.index_objects(document, batch)
+        indexed += len(batch)
+        last_pk = batch[-1].pk
+
+
+class FullTextSearchFilter(filters.SearchFilter):
+    """
+    SearchFilter backed by the full-text index. Views list the documents to
+    search in `search_documents`; results are ordered by relevance unless the
+    client asked for an explicit ?ordering=. Falls back to SearchFilter's
+    LIKE lookups over `search_fields` when no index backend is available.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        search_terms = self.get_search_terms(request)
+        documents = getattr(view, 'search_documents', None)
+        backend = get_search_backend() if search_terms and documents else None
+        if backend is None:
+            return super().filter_queryset(request, queryset, view)
+
+        limit = getattr(settings, 'FULL_TEXT_SEARCH_MAX_RESULTS', 500)
+        scores = {}
+        for name in documents:
+            document = SEARCH_DOCUMENTS[name]
+            for object_id, parent_id, score in backend.search(document, search_terms, limit):
+                target_id = parent_id if document.parent_field else object_id
+                if target_id is not None and score > scores.get(target_id, float('-inf')):
+                    scores[target_id] = score
+
+        ranked_ids = sorted(scores, key=scores.get, reverse=True)[:limit]
+        queryset = queryset.filter(pk__in=ranked_ids)
+        if ranked_ids and not request.query_params.get(api_settings.ORDERING_PARAM):
+            queryset = queryset.order_by(backend.ranked_ordering(queryset.model, ranked_ids))
+        return queryset
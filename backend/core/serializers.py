@@ -2,7 +2,9 @@ from rest_framework import serializers
 from django.contrib.auth import authenticate
 from django.contrib.auth.models import User
 from django.contrib.auth.password_validation import validate_password
-from .models import CompanyDrive, MockInterviewQuestion, Skill, LearningTopic, LearningResource, DiscussionTopic, DiscussionPost, ForumCategory
+from django.urls import reverse
+from .models import Job, CompanyDrive, MockInterviewQuestion, Skill, LearningTopic, LearningResource, DiscussionTopic, DiscussionPost, ForumCategory
+from .pagination import PostKeysetPagination
 
 # Authentication Serializers
 class UserRegistrationSerializer(serializers.ModelSerializer):
@@ -186,19 +188,16 @@ class AnswerFeedbackSerializer(serializers.Serializer):
 # --- Collaborative Learning ---
 
 class ForumCategorySerializer(serializers.ModelSerializer):
-    topic_count = serializers.SerializerMethodField()
+    # Reads the precomputed statistics; ForumCategoryViewSet joins latest_topic
     latest_activity = serializers.SerializerMethodField()
     
     class Meta:
         model = ForumCategory
         fields = ['id', 'name', 'description', 'icon', 'color', 'is_active', 'order', 'topic_count', 'latest_activity', 'created_at']
-        read_only_fields = ['created_at']
-    
-    def get_topic_count(self, obj):
-        return obj.topics.filter(is_active=True).count()
+        read_only_fields = ['created_at', 'topic_count']
     
     def get_latest_activity(self, obj):
-        latest_topic = obj.topics.filter(is_active=True).order_by('-last_activity').first()
+        latest_topic = obj.latest_topic
         if latest_topic:
             return {
                 'topic_id': latest_topic.id,
@@ -212,13 +211,14 @@ class DiscussionPostSerializer(serializers.ModelSerializer):
     class Meta:
         model = DiscussionPost
         # Read-only fields for ID and timestamp, allowing author_name and content to be writable
-        fields = ['id', 'topic', 'content', 'author_name', 'created_at', 'updated_at', 'is_edited']
-        read_only_fields = ['created_at', 'updated_at'] # Auto-set on creation
+        fields = ['id', 'message_id', 'topic', 'content', 'author_name', 'created_at', 'updated_at', 'is_edited']
+        read_only_fields = ['message_id', 'created_at', 'updated_at'] # Auto-set on creation
 
 class DiscussionTopicSerializer(serializers.ModelSerializer):
-    # Nested serializer to display posts directly within the topic details
-    # This will be used when retrieving a single topic with its posts
-    posts = DiscussionPostSerializer(many=True, read_only=True)
+    # Only the newest page of posts is embedded in the topic details; older
+    # posts are loaded from the nested posts endpoint with older_posts_cursor
+    posts = serializers.SerializerMethodField()
+    older_posts_cursor = serializers.SerializerMethodField()
     # Include related skill/company names for better context
     related_skill_name = serializers.CharField(source='related_skill.name', read_only=True, allow_null=True)
     related_company_name = serializers.CharField(source='related_company.company_name', read_only=True, allow_null=True)
@@ -233,7 +233,7 @@ class DiscussionTopicSerializer(serializers.ModelSerializer):
             'id', 'title', 'content', 'author_name', 'created_at', 'updated_at', 'last_activity',
             'category', 'category_name', 'category_color', 'category_icon',
             'related_skill', 'related_skill_name', 'related_company', 'related_company_name',
-            'is_pinned', 'is_locked', 'view_count', 'posts'
+            'is_pinned', 'is_locked', 'view_count', 'posts', 'older_posts_cursor'
         ]
         read_only_fields = ['created_at', 'updated_at', 'last_activity', 'view_count']
         # Make related fields writable by ID if creating/updating topics
@@ -243,9 +243,25 @@ class DiscussionTopicSerializer(serializers.ModelSerializer):
             'related_company': {'write_only': True, 'required': False, 'allow_null': True},
         }
 
+    def _get_newest_posts_page(self, obj):
+        # Both method fields share one query per topic
+        if not hasattr(self, '_newest_posts_pages'):
+            self._newest_posts_pages = {}
+        if obj.pk not in self._newest_posts_pages:
+            self._newest_posts_pages[obj.pk] = PostKeysetPagination.get_page(obj.posts.all())
+        return self._newest_posts_pages[obj.pk]
+
+    def get_posts(self, obj):
+        posts, _ = self._get_newest_posts_page(obj)
+        return DiscussionPostSerializer(posts, many=True).data
+
+    def get_older_posts_cursor(self, obj):
+        _, older_cursor = self._get_newest_posts_page(obj)
+        return older_cursor
+
 # A simpler serializer for listing topics (without all posts, for performance)
+# Post statistics come from the denormalized columns on DiscussionTopic
 class DiscussionTopicListSerializer(serializers.ModelSerializer):
-    post_count = serializers.SerializerMethodField()
     related_skill_name = serializers.CharField(source='related_skill.name', read_only=True, allow_null=True)
     related_company_name = serializers.CharField(source='related_company.company_name', read_only=True, allow_null=True)
     # Include category information
@@ -263,14 +279,29 @@ class DiscussionTopicListSerializer(serializers.ModelSerializer):
             'is_pinned', 'is_locked', 'view_count', 'last_post'
         ]
 
-    def get_post_count(self, obj):
-        return obj.posts.count()
-    
     def get_last_post(self, obj):
-        last_post = obj.posts.order_by('-created_at').first()
-        if last_post:
+        if obj.last_post_at:
             return {
-                'author_name': last_post.author_name,
-                'created_at': last_post.created_at
+                'author_name': obj.last_post_author_name,
+                # Rendered here so list rows can also be pushed over WebSockets (core/topic_list.py)
+                'created_at': serializers.DateTimeField().to_representation(obj.last_post_at)
             }
         return None
+
+
+# Background Job Serializers
+class JobSerializer(serializers.ModelSerializer):
+    job_id = serializers.CharField(source='id', read_only=True)
+    status_url = serializers.SerializerMethodField()
+    result_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Job
+        fields = ['job_id', 'kind', 'status', 'error', 'attempts', 'created_at', 'started_at', 'finished_at', 'status_url', 'result_url']
+        read_only_fields = fields
+
+    def get_status_url(self, obj):
+        return reverse('job-status', args=[obj.id])
+
+    def get_result_url(self, obj):
+        return reverse('job-result', args=[obj.id])
@@ -0,0 +1,121 @@
+"""
+Signal receivers that keep the full-text search index (core/search.py)
+in sync with topic, post and company drive writes (and with renames of the
+categories, skills and companies embedded in topic documents), and that publish topic
+lock/activation changes to the WebSocket rooms (core/topic_state.py) and
+new topics and pin/lock changes to the topic lists (core/topic_list.py).
+"""
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .models import CompanyDrive, DiscussionPost, DiscussionTopic, ForumCategory, Skill
+from .search import SEARCH_DOCUMENTS, get_search_backend, index_queryset
+from .topic_list import publish_new_topic, publish_topic_changes
+from .topic_state import TopicState, publish_topic_state
+
+DOCUMENTS_BY_MODEL = {document.model: document for document in SEARCH_DOCUMENTS.values()}
+# Related model -> (document, field, relation) for text documents embed from related objects
+DEPENDENT_DOCUMENTS = {}
+for _document in SEARCH_DOCUMENTS.values():
+    for _model, _field, _relation in _document.depends_on:
+        DEPENDENT_DOCUMENTS.setdefault(_model, []).append((_document, _field, _relation))
+
+
+@receiver(post_save, sender=DiscussionTopic)
+@receiver(post_save, sender=DiscussionPost)
+@receiver(post_save, sender=CompanyDrive)
+def index_search_document(sender, instance, update_fields=None, raw=False, **kwargs):
+    document = DOCUMENTS_BY_MODEL[sender]
+    # Saves that only touch unindexed fields (e.g. last_activity) need no re-index
+    if raw or (update_fields is not None and not document.fields.intersection(update_fields)):
+        return
+    backend = get_search_backend()
+    if backend is not None:
+        backend.index_objects(document, [instance])
+
+
+@receiver(post_delete, sender=DiscussionTopic)
+@receiver(post_delete, sender=DiscussionPost)
+@receiver(post_delete, sender=CompanyDrive)
+def remove_search_document(sender, instance, **kwargs):
+    backend = get_search_backend()
+    if backend is not None:
+        backend.remove(DOCUMENTS_BY_MODEL[sender], [instance.pk])
+
+
+@receiver(pre_save, sender=ForumCategory)
+@receiver(pre_save, sender=Skill)
+@receiver(pre_save, sender=CompanyDrive)
+def remember_embedded_search_text(sender, instance, update_fields=None, raw=False, **kwargs):
+    """Load the stored values of fields other documents embed, so a rename can be detected after the save"""
+    fields = {field for _, field, _ in DEPENDENT_DOCUMENTS[sender]}
+    instance._stored_search_text = None
+    if raw or instance.pk is None or (update_fields is not None and not fields.intersection(update_fields)):
+        return
+    if get_search_backend() is not None:
+        instance._stored_search_text = sender.objects.filter(pk=instance.pk).values(*fields).first()
+
+
+@receiver(post_save, sender=ForumCategory)
+@receiver(post_save, sender=Skill)
+@receiver(post_save, sender=CompanyDrive)
+def reindex_dependent_documents(sender, instance, **kwargs):
+    stored = getattr(instance, '_stored_search_text', None)
+    backend = get_search_backend()
+    if not stored or backend is None:
+        return
+    for document, field, relation in DEPENDENT_DOCUMENTS[sender]:
+        if stored[field] != getattr(instance, field):
+            index_queryset(backend, document, document.model.objects.filter(**{relation: instance.pk}))
+
+
+@receiver(pre_delete, sender=Skill)
+@receiver(pre_delete, sender=CompanyDrive)
+def remember_dependent_documents(sender, instance, **kwargs):
+    """Documents whose relation is cleared by the delete (SET_NULL) must drop the embedded text"""
+    if get_search_backend() is not None:
+        instance._dependent_search_ids = [
+            (document, list(document.model.objects.filter(**{relation: instance.pk}).values_list('pk', flat=True)))
+            for document, _, relation in DEPENDENT_DOCUMENTS[sender]
+        ]
+
+
+@receiver(post_delete, sender=Skill)
+@receiver(post_delete, sender=CompanyDrive)
+def reindex_orphaned_documents(sender, instance, **kwargs):
+    backend = get_search_backend()
+    if backend is None:
+        return
+    for document, object_ids in getattr(instance, '_dependent_search_ids', []):
+        if object_ids:
+            index_queryset(backend, document, document.model.objects.filter(pk__in=object_ids))
+
+
+@receiver(post_save, sender=DiscussionTopic)
+def publish_room_state_change(sender, instance, created, update_fields=None, raw=False, **kwargs):
+    if raw or created or not instance.room_state_changed():
+        return
+    if update_fields is not None and not {'is_active', 'is_locked'}.intersection(update_fields):
+        return
+    state = TopicState.of(instance)
+    transaction.on_commit(lambda: publish_topic_state(instance.pk, state))
+
+
+@receiver(post_delete, sender=DiscussionTopic)
+def publish_room_deleted(sender, instance, **kwargs):
+    topic_id = instance.pk
+    transaction.on_commit(lambda: publish_topic_state(topic_id, TopicState(exists=False)))
+
+
+@receiver(post_save, sender=DiscussionTopic)
+def publish_topic_list_change(sender, instance, created, raw=False, **kwargs):
+    # New posts publish their own deltas (DiscussionPost.record_new_posts)
+    if raw:
+        return
+    if created:
+        publish_new_topic(instance.pk)
+        return
+    changed = instance.changed_list_flags()
+    if changed:
+        publish_topic_changes([instance.pk], changed)
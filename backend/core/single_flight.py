@@ -0,0 +1,51 @@
+"""
+Request coalescing for expensive calls (the AI response caches).
+
+SingleFlight.do(key, func) runs func once per key at a time: callers that
+arrive with the same key while it runs wait for its result (or exception)
+instead of starting their own call. This works within one process.
+
+Calls that cannot run as one function (e.g. a stream relayed as it arrives)
+use begin() and finish() instead: the leader finishes the call, and the
+other callers wait on the returned future.
+"""
+import threading
+from concurrent.futures import Future
+
+
+class SingleFlight:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, func):
+        """(result, shared): shared is True when the result came from another caller's call"""
+        future, leader = self.begin(key)
+        if not leader:
+            return future.result(), True
+
+        try:
+            result = func()
+        except BaseException as e:
+            self.finish(key, error=e)
+            raise
+        self.finish(key, result)
+        return result, False
+
+    def begin(self, key):
+        """(future, leader): the leader must finish() the call; the others wait on the future"""
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                return future, False
+            future = self._calls[key] = Future()
+            return future, True
+
+    def finish(self, key, result=None, error=None):
+        """Resolve the leader's call with its result, or with `error`"""
+        with self._lock:
+            future = self._calls.pop(key)
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
@@ -0,0 +1,74 @@
+"""
+Server-sent event responses for the AI views.
+
+With stream=true (in the body or the query string) AIChatbotView and
+AITopicExplainerView answer with text/event-stream instead of JSON:
+
+* ``token`` events, ``{"text": ...}``, as the model generates the answer
+* one closing ``done`` event with the fields of the JSON response other
+  than the answer itself, or an ``error`` event ``{"error": ...}``
+
+The view validates the request and builds the prompt synchronously; the
+tokens are then relayed by an async iterator on the server's event loop,
+so under ASGI no worker thread waits on the model. When the client
+disconnects, Django closes the iterator, which closes the upstream
+request (see LLMGateway.astream).
+
+Only the ASGI handler streams an async iterator; WSGI would buffer it whole
+(and warn). Requests served by WSGI (e.g. runserver without daphne) get the
+same events in one non-streamed response instead.
+"""
+import json
+
+from asgiref.sync import async_to_sync
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils import timezone
+
+from .llm import LLMError, LLMTimeout, LLMUnavailable
+
+TRUE_VALUES = {True, 'true', 'True', '1', 1}
+
+
+def wants_stream(request):
+    return request.query_params.get('stream', request.data.get('stream', False)) in TRUE_VALUES
+
+
+def sse_event(event, data):
+    return f'event: {event}\ndata: {json.dumps(data)}\n\n'
+
+
+async def text_chunks(*texts):
+    """An async iterator over already generated text, for sse_response()"""
+    for text in texts:
+        yield text
+
+
+async def collect(events):
+    return ''.join([event async for event in events])
+
+
+def sse_response(request, chunks, **done):
+    """Relay the text chunks of an async iterator (e.g. LLMGateway.astream()) as server-sent events"""
+    async def events():
+        try:
+            async for text in chunks:
+                yield sse_event('token', {'text': text})
+        except LLMTimeout:
+            yield sse_event('error', {'error': 'The AI service took too long to respond. Please try again.'})
+        except LLMUnavailable:
+            yield sse_event('error', {'error': 'AI service is busy. Please try again shortly.'})
+        except LLMError as e:
+            print(f"Error streaming AI response: {e}")
+            yield sse_event('error', {'error': 'Failed to generate response. Please try again.'})
+        else:
+            yield sse_event('done', {**done, 'timestamp': timezone.now().isoformat()})
+
+    if isinstance(request._request, ASGIRequest):
+        response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    else:
+        response = HttpResponse(async_to_sync(collect)(events()), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Stop proxies (nginx) from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
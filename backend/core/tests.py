@@ -1,3 +1,1837 @@
-from django.test import TestCase
+import asyncio
+import gc
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from unittest import skipUnless
+from unittest.mock import patch
 
-# Create your tests here.
+import httpx
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.management import call_command
+from channels.db import database_sync_to_async
+from channels.routing import URLRouter
+from django.conf import settings
+from django.db import connection
+from django.test import AsyncClient, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+try:
+    from fakeredis import TcpFakeServer
+except ImportError:
+    TcpFakeServer = None
+
+from .channel_groups import discussion_group_for, discussion_group_names, remember_server_loop, send_from_sync
+from .chat_queue import ChatMessage, ChatWriteQueue, TopicUnavailable, write_chat_messages
+from .explanation_cache import ExplanationCache
+from .fanout import OutboundBatcher
+from .jobs import JobWorker
+from .llm import LLMError, LLMGateway, LLMTimeout, LLMUnavailable
+from .management.commands._websocket import InProcessWebSocket
+from .plan_templates import PlanTemplateCache
+from .presence import PresenceRegistry, publish_expired
+from .tts import SpeechSynthesizer
+from .topic_list import POST_ACTIVITY_FIELDS, topic_list_frames
+from .topic_state import TopicState, TopicStateCache
+from .replay import LocalSequenceAllocator, ReplayBuffers, missed_frames
+from .rate_limit import FrameRateLimiter, TokenBucket, dropped_frame_counts
+from .models import (
+    CompanyDrive, DiscussionPost, DiscussionTopic, ForumCategory, Job, PlanTemplate, Skill, TopicExplanation, UserOnlineStatus,
+    UserPreparationPlan,
+)
+from .pagination import PostKeysetPagination
+from .search import SEARCH_DOCUMENTS, get_search_backend
+from .sse import text_chunks
+from .routing import websocket_urlpatterns
+from . import ulid
+from .views import PersonalizedPrepPlanView
+from .view_counts import ViewCountBuffer, view_count_buffer
+from .wire import (
+    MAX_INFLATED_FRAME_SIZE, DeflateMsgpackCodec, FrameTooLarge, InvalidFrame, JSONCodec, MsgpackCodec, encode_frames,
+    negotiate,
+)
+
+
+def create_topics(count, posts_per_topic=2):
+    """Create discussion topics with related objects and a few posts each"""
+    category = ForumCategory.objects.create(name=f'Category {ForumCategory.objects.count()}')
+    skill = Skill.objects.create(name=f'Skill {Skill.objects.count()}')
+    company = CompanyDrive.objects.create(
+        company_name='Acme', role='SDE', domain='Software',
+        hiring_timeline='Batch 2026', drive_date='2026-01-01',
+        location='Remote', interview_process_description='Two rounds'
+    )
+    topics = []
+    for i in range(count):
+        topic = DiscussionTopic.objects.create(
+            title=f'Topic {i}', category=category,
+            related_skill=skill, related_company=company
+        )
+        for j in range(posts_per_topic):
+            DiscussionPost.objects.create(topic=topic, content=f'Reply {j}', author_name=f'user{j}')
+        topics.append(topic)
+    return topics
+
+
+class DiscussionTopicListQueryTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_list_query_count_is_constant(self):
+        create_topics(3)
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/discussion_topics/')
+        self.assertEqual(len(response.data), 3)
+
+        create_topics(30)
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/discussion_topics/')
+        self.assertEqual(len(response.data), 33)
+
+    def test_list_includes_post_stats_and_related_names(self):
+        topic = create_topics(1, posts_per_topic=3)[0]
+        DiscussionTopic.objects.create(title='Empty topic')
+
+        response = self.client.get('/api/discussion_topics/')
+        by_id = {item['id']: item for item in response.data}
+
+        self.assertEqual(by_id[topic.id]['post_count'], 3)
+        self.assertEqual(by_id[topic.id]['last_post']['author_name'], 'user2')
+        self.assertEqual(by_id[topic.id]['category_name'], topic.category.name)
+        self.assertEqual(by_id[topic.id]['related_company_name'], 'Acme')
+
+        empty = next(item for item in response.data if item['title'] == 'Empty topic')
+        self.assertEqual(empty['post_count'], 0)
+        self.assertIsNone(empty['last_post'])
+
+
+class DiscussionTopicPostStatsTests(TestCase):
+    def setUp(self):
+        self.topic = DiscussionTopic.objects.create(title='Stats topic')
+
+    def test_post_create_and_delete_maintain_stats(self):
+        first = DiscussionPost.objects.create(topic=self.topic, content='First', author_name='alice')
+        last = DiscussionPost.objects.create(topic=self.topic, content='Second', author_name='bob')
+        self.topic.refresh_from_db()
+        self.assertEqual(self.topic.post_count, 2)
+        self.assertEqual(self.topic.last_post_author_name, 'bob')
+        self.assertEqual(self.topic.last_post_at, last.created_at)
+
+        first.delete()
+        self.topic.refresh_from_db()
+        self.assertEqual(self.topic.post_count, 1)
+        self.assertEqual(self.topic.last_post_author_name, 'bob')
+
+        last.delete()
+        self.topic.refresh_from_db()
+        self.assertEqual(self.topic.post_count, 0)
+        self.assertIsNone(self.topic.last_post_author_name)
+        self.assertIsNone(self.topic.last_post_at)
+
+    def test_post_create_is_single_update_per_table(self):
+        # INSERT post, index it for search, UPDATE topic stats, UPDATE category latest topic
+        with self.assertNumQueries(4):
+            DiscussionPost.objects.create(topic=self.topic, content='Hello', author_name='alice')
+
+    def test_rebuild_command_recomputes_stats(self):
+        DiscussionPost.objects.create(topic=self.topic, content='Hello', author_name='alice')
+        DiscussionTopic.objects.update(post_count=0, last_post_author_name=None, last_post_at=None)
+
+        call_command('rebuild_topic_stats', batch_size=1, stdout=io.StringIO())
+        self.topic.refresh_from_db()
+        self.assertEqual(self.topic.post_count, 1)
+        self.assertEqual(self.topic.last_post_author_name, 'alice')
+
+
+class ForumCategoryStatsTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.category = ForumCategory.objects.create(name='Stats category')
+
+    def test_stats_follow_topic_and_post_writes(self):
+        older = DiscussionTopic.objects.create(title='Older', category=self.category)
+        newer = DiscussionTopic.objects.create(title='Newer', category=self.category)
+        self.category.refresh_from_db()
+        self.assertEqual(self.category.topic_count, 2)
+        self.assertEqual(self.category.latest_topic_id, newer.id)
+
+        DiscussionPost.objects.create(topic=older, content='Bump', author_name='alice')
+        self.category.refresh_from_db()
+        self.assertEqual(self.category.latest_topic_id, older.id)
+
+        older.is_active = False
+        older.save()
+        self.category.refresh_from_db()
+        self.assertEqual(self.category.topic_count, 1)
+        self.assertEqual(self.category.latest_topic_id, newer.id)
+
+    def test_category_list_is_single_query(self):
+        for i in range(5):
+            category = ForumCategory.objects.create(name=f'Category {i}')
+            DiscussionTopic.objects.create(title=f'Topic {i}', category=category)
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/forum_categories/')
+        self.assertEqual(len(response.data), 6)
+        latest = next(item for item in response.data if item['name'] == 'Category 0')
+        self.assertEqual(latest['topic_count'], 1)
+        self.assertEqual(latest['latest_activity']['topic_title'], 'Topic 0')
+
+    def test_reconcile_command_recomputes_stats(self):
+        topic = DiscussionTopic.objects.create(title='Imported', category=self.category)
+        ForumCategory.objects.update(topic_count=0, latest_topic=None)
+
+        call_command('reconcile_category_stats', stdout=io.StringIO())
+        self.category.refresh_from_db()
+        self.assertEqual(self.category.topic_count, 1)
+        self.assertEqual(self.category.latest_topic_id, topic.id)
+
+
+class ViewCountBufferTests(TestCase):
+    def setUp(self):
+        self.topic = DiscussionTopic.objects.create(title='Popular topic')
+        self.other = DiscussionTopic.objects.create(title='Other topic')
+
+    def test_concurrent_views_are_not_lost(self):
+        buffer = ViewCountBuffer(flush_interval=60)
+        threads_count, views_per_thread = 8, 250
+
+        def view_topics():
+            for _ in range(views_per_thread):
+                buffer.record(self.topic.pk)
+                buffer.record(self.other.pk)
+
+        threads = [threading.Thread(target=view_topics) for _ in range(threads_count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # Both topics share an increment, so they are flushed in one UPDATE
+        with CaptureQueriesContext(connection) as queries:
+            buffer.flush()
+        updates = [q for q in queries.captured_queries if q['sql'].startswith('UPDATE')]
+        self.assertEqual(len(updates), 1)
+        self.topic.refresh_from_db()
+        self.other.refresh_from_db()
+        self.assertEqual(self.topic.view_count, threads_count * views_per_thread)
+        self.assertEqual(self.other.view_count, threads_count * views_per_thread)
+        self.assertEqual(buffer.pending(self.topic.pk), 0)
+
+    def test_buffer_flushes_when_too_many_topics_pending(self):
+        buffer = ViewCountBuffer(flush_interval=60, max_pending=1)
+        flushed = threading.Event()
+        flush_threads = []
+
+        def flush():
+            flush_threads.append(threading.current_thread())
+            flushed.set()
+
+        # The overflow flush runs on the timer thread, not in record()
+        with patch.object(buffer, 'flush', side_effect=flush):
+            buffer.record(self.topic.pk)
+            buffer.record(self.other.pk)
+            self.assertTrue(flushed.wait(5))
+        self.assertNotIn(threading.current_thread(), flush_threads)
+        self.assertEqual(buffer.pending(self.other.pk), 1)
+
+    def test_retrieve_buffers_view_increment(self):
+        client = APIClient()
+        with self.assertNumQueries(2):
+            response = client.get(f'/api/discussion_topics/{self.topic.pk}/')
+        client.get(f'/api/discussion_topics/{self.topic.pk}/')
+        self.assertEqual(response.data['view_count'], 1)
+
+        view_count_buffer.flush()
+        self.topic.refresh_from_db()
+        self.assertEqual(self.topic.view_count, 2)
+
+
+class DiscussionPostPaginationTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.topic = DiscussionTopic.objects.create(title='Long thread')
+        created_at = timezone.now()
+        # Posts sharing a timestamp exercise the id tie-breaker
+        DiscussionPost.objects.bulk_create([
+            DiscussionPost(topic=self.topic, content=f'Post {i}', created_at=created_at + timedelta(seconds=i // 2))
+            for i in range(7)
+        ])
+
+    def test_pages_walk_thread_from_newest_to_oldest(self):
+        url = f'/api/discussion_topics/{self.topic.pk}/posts/'
+        response = self.client.get(url, {'page_size': 3})
+        self.assertEqual([p['content'] for p in response.data['results']], ['Post 4', 'Post 5', 'Post 6'])
+
+        seen = [p['content'] for p in response.data['results']]
+        while response.data['older_cursor']:
+            with self.assertNumQueries(1):
+                response = self.client.get(url, {'page_size': 3, 'before': response.data['older_cursor']})
+            seen = [p['content'] for p in response.data['results']] + seen
+        self.assertEqual(seen, [f'Post {i}' for i in range(7)])
+
+    def test_invalid_cursor_returns_404(self):
+        response = self.client.get(f'/api/discussion_topics/{self.topic.pk}/posts/', {'before': 'garbage'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_topic_detail_embeds_newest_page_and_cursor(self):
+        response = self.client.get(f'/api/discussion_topics/{self.topic.pk}/')
+        self.assertEqual(len(response.data['posts']), 7)
+        self.assertIsNone(response.data['older_posts_cursor'])
+
+        with patch.object(PostKeysetPagination, 'page_size', 5):
+            response = self.client.get(f'/api/discussion_topics/{self.topic.pk}/')
+        view_count_buffer.flush()
+        self.assertEqual(response.data['posts'][0]['content'], 'Post 2')
+        older = self.client.get(
+            f'/api/discussion_topics/{self.topic.pk}/posts/',
+            {'before': response.data['older_posts_cursor']}
+        )
+        self.assertEqual([p['content'] for p in older.data['results']], ['Post 0', 'Post 1'])
+
+
+class FullTextSearchTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.title_hit = DiscussionTopic.objects.create(title='Binary search interview tips')
+        self.body_hit = DiscussionTopic.objects.create(title='Weekly prep thread', content='Binary trees and search')
+        self.post_hit = DiscussionTopic.objects.create(title='Misc')
+        DiscussionPost.objects.create(topic=self.post_hit, content='I practised binary searching daily')
+        DiscussionTopic.objects.create(title='Unrelated topic')
+
+    def test_topic_search_is_ranked_and_includes_post_matches(self):
+        response = self.client.get('/api/discussion_topics/', {'search': 'binary search'})
+        ids = [item['id'] for item in response.data]
+        self.assertEqual(ids[0], self.title_hit.id)
+        self.assertCountEqual(ids, [self.title_hit.id, self.body_hit.id, self.post_hit.id])
+
+    def test_index_follows_updates_and_deletes(self):
+        self.title_hit.title = 'Dynamic programming'
+        self.title_hit.save()
+        self.post_hit.posts.get().delete()
+
+        response = self.client.get('/api/discussion_topics/', {'search': 'dynamic'})
+        self.assertEqual([item['id'] for item in response.data], [self.title_hit.id])
+        response = self.client.get('/api/discussion_topics/', {'search': 'binary'})
+        self.assertEqual([item['id'] for item in response.data], [self.body_hit.id])
+
+    def test_company_drive_search_and_like_fallback(self):
+        CompanyDrive.objects.create(
+            company_name='Globex', role='Data Analyst', domain='Analytics',
+            hiring_timeline='Batch 2026', drive_date='2026-03-01',
+            location='Pune', interview_process_description='Case study'
+        )
+        user = User.objects.create_user(username='searcher', password='pass')
+        self.client.force_authenticate(user)
+        response = self.client.get('/api/companies/', {'search': 'analyst'})
+        self.assertEqual([item['company_name'] for item in response.data], ['Globex'])
+
+        with self.settings(FULL_TEXT_SEARCH_ENABLED=False):
+            response = self.client.get('/api/companies/', {'search': 'analyst'})
+        self.assertEqual([item['company_name'] for item in response.data], ['Globex'])
+
+        # Both paths search the same fields
+        for enabled in (True, False):
+            with self.settings(FULL_TEXT_SEARCH_ENABLED=enabled):
+                response = self.client.get('/api/companies/', {'search': 'pune'})
+            self.assertEqual([item['company_name'] for item in response.data], ['Globex'])
+
+    def test_renaming_embedded_objects_reindexes_their_topics(self):
+        skill = Skill.objects.create(name='Graphs')
+        category = ForumCategory.objects.create(name='Placements')
+        topic = DiscussionTopic.objects.create(title='Weekly thread', related_skill=skill, category=category)
+
+        skill.name = 'Heaps'
+        skill.save()
+        category.name = 'Internships'
+        category.save(update_fields=['name'])
+        for term, expected in (('graphs', []), ('heaps', [topic.id]), ('placements', []), ('internships', [topic.id])):
+            response = self.client.get('/api/discussion_topics/', {'search': term})
+            self.assertEqual([item['id'] for item in response.data], expected, term)
+
+        skill.delete()
+        response = self.client.get('/api/discussion_topics/', {'search': 'heaps'})
+        self.assertEqual(response.data, [])
+
+    def test_rebuild_command_restores_index(self):
+        backend = get_search_backend()
+        backend.clear(SEARCH_DOCUMENTS['topic'])
+        call_command('rebuild_search_index', document=['topic'], stdout=io.StringIO())
+        response = self.client.get('/api/discussion_topics/', {'search': 'interview'})
+        self.assertEqual([item['id'] for item in response.data], [self.title_hit.id])
+
+
+class OutboundBatcherTests(SimpleTestCase):
+    async def test_frames_in_one_window_are_sent_as_one_array(self):
+        sent = []
+
+        async def send(text):
+            sent.append(text)
+
+        batcher = OutboundBatcher(send, window=0.02)
+        await batcher.add(json.dumps({'type': 'chat_message', 'post_id': 1}))
+        await batcher.add(json.dumps({'type': 'typing', 'user_id': 3, 'is_typing': True}), key=('typing', 3))
+        await batcher.add(json.dumps({'type': 'chat_message', 'post_id': 2}))
+        await batcher.add(json.dumps({'type': 'typing', 'user_id': 3, 'is_typing': False}), key=('typing', 3))
+        self.assertEqual(sent, [])
+
+        await asyncio.sleep(0.05)
+        self.assertEqual(len(sent), 1)
+        self.assertEqual(json.loads(sent[0]), [
+            {'type': 'chat_message', 'post_id': 1},
+            {'type': 'chat_message', 'post_id': 2},
+            {'type': 'typing', 'user_id': 3, 'is_typing': False},
+        ])
+        self.assertEqual(batcher.frames_coalesced, 1)
+
+    async def test_full_batch_is_sent_without_waiting(self):
+        sent = []
+
+        async def send(text):
+            sent.append(text)
+
+        batcher = OutboundBatcher(send, window=10, max_batch=2)
+        await batcher.add('{"n":1}')
+        await batcher.add('{"n":2}')
+        self.assertEqual(sent, ['[{"n":1},{"n":2}]'])
+        batcher.close()
+
+
+class DiscussionConsumerFanoutTests(SimpleTestCase):
+    def setUp(self):
+        for patcher in (
+            patch('core.consumers.presence_registry', PresenceRegistry(flush_interval=3600)),
+            # These rooms have no topic rows; treat them as open topics
+            patch('core.topic_state.load_topic_state', return_value=TopicState(exists=True, is_active=True)),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def connect(self, user, topic_id=5):
+        return InProcessWebSocket(
+            URLRouter(websocket_urlpatterns), f'/ws/discussion/{topic_id}/', scope={'user': user}
+        )
+
+    async def test_typing_storm_reaches_peers_as_one_coalesced_frame(self):
+        reader = self.connect(User(id=1, username='reader'))
+        typist = self.connect(User(id=2, username='typist'))
+        for socket in (reader, typist):
+            self.assertTrue((await socket.connect())[0])
+            await socket.receive_json_from()  # connection_established
+            await socket.receive_json_from()  # presence_snapshot
+
+        for is_typing in (True, False, True, True, False, True):
+            await typist.send_json_to({'type': 'typing', 'is_typing': is_typing})
+
+        batch = await reader.receive_json_from(timeout=1)
+        self.assertEqual([(frame['type'], frame['user_id']) for frame in batch], [('user_join', 1), ('user_join', 2), ('typing', 2)])
+        self.assertTrue(batch[-1]['is_typing'])
+        self.assertTrue(await reader.receive_nothing(timeout=0.1))
+
+        for socket in (reader, typist):
+            await socket.disconnect()
+
+    async def test_msgpack_deflate_socket_gets_binary_batches(self):
+        reader = InProcessWebSocket(
+            URLRouter(websocket_urlpatterns), '/ws/discussion/5/',
+            subprotocols=['connectconquer.msgpack.deflate'], scope={'user': User(id=1, username='reader')},
+        )
+        self.assertEqual(await reader.connect(), (True, 'connectconquer.msgpack.deflate'))
+        client = DeflateMsgpackCodec()
+        self.assertEqual(client.decode(bytes_data=await reader.receive_bytes_from())['type'], 'connection_established')
+        self.assertEqual(client.decode(bytes_data=await reader.receive_bytes_from())['type'], 'presence_snapshot')
+
+        typist = self.connect(User(id=2, username='typist'))
+        await typist.connect()
+        await typist.send_json_to({'type': 'typing', 'is_typing': True})
+        batch = client.decode(bytes_data=await reader.receive_bytes_from())
+        self.assertEqual([(frame['type'], frame['user_id']) for frame in batch], [('user_join', 1), ('user_join', 2), ('typing', 2)])
+
+        await reader.send_bytes_to(client.send_kwargs(client.encode({'type': 'ping'}))['bytes_data'])
+        self.assertEqual(client.decode(bytes_data=await reader.receive_bytes_from()), {'type': 'pong'})
+        for socket in (reader, typist):
+            await socket.disconnect()
+
+
+class WireCodecTests(SimpleTestCase):
+    def test_subprotocol_negotiation(self):
+        self.assertIsInstance(negotiate(None), JSONCodec)
+        self.assertIsInstance(negotiate(['chat.v2', 'connectconquer.msgpack']), MsgpackCodec)
+        self.assertEqual(negotiate(['connectconquer.msgpack.deflate']).subprotocol, 'connectconquer.msgpack.deflate')
+
+    def test_deflate_stream_round_trips_batches(self):
+        server, client = DeflateMsgpackCodec(), DeflateMsgpackCodec()
+        frame = {'type': 'chat_message', 'seq': 1, 'content': 'hello', 'author_name': 'ann'}
+        sizes = []
+        for _ in range(3):
+            batch = server.join([server.pick(encode_frames(frame)), server.pick({'frame': json.dumps(frame)})])
+            data = server.send_kwargs(batch)['bytes_data']
+            sizes.append(len(data))
+            self.assertEqual(client.decode(bytes_data=data), [frame, frame])
+        # The compression context carries over, so repeated frames shrink to back-references
+        self.assertLess(sizes[1], sizes[0] / 2)
+
+    def test_undecodable_frames(self):
+        with self.assertRaises(InvalidFrame):
+            JSONCodec().decode('{')
+        with self.assertRaises(InvalidFrame):
+            MsgpackCodec().decode(bytes_data=b'\xc1')
+        with self.assertRaises(InvalidFrame):
+            DeflateMsgpackCodec().decode(bytes_data=b'\xff\xff\xff')
+        for codec, frame in ((JSONCodec(), {'text_data': '[1, 2]'}), (MsgpackCodec(), {'bytes_data': b'\x01'})):
+            with self.assertRaises(InvalidFrame):
+                codec.decode_frame(**frame)
+
+    async def test_oversized_deflate_frame_closes_the_socket(self):
+        # Compresses to about 1 KB, but inflates past the frame size limit
+        bomb = {'type': 'ping', 'padding': 'x' * (MAX_INFLATED_FRAME_SIZE * 4)}
+        with self.assertRaises(FrameTooLarge):
+            DeflateMsgpackCodec().decode(bytes_data=DeflateMsgpackCodec().send_kwargs(MsgpackCodec().encode(bomb))['bytes_data'])
+
+        socket = InProcessWebSocket(
+            URLRouter(websocket_urlpatterns), '/ws/discussion_list/',
+            subprotocols=['connectconquer.msgpack.deflate'], scope={'user': AnonymousUser()},
+        )
+        await socket.connect()
+        client = DeflateMsgpackCodec()
+        data = client.send_kwargs(client.encode(bomb))['bytes_data']
+        self.assertLess(len(data), 4096)
+        await socket.send_bytes_to(data)
+        self.assertEqual(client.decode(bytes_data=await socket.receive_bytes_from()), {'type': 'error', 'message': 'Frame too large'})
+        self.assertEqual(await socket.receive_output(1), {'type': 'websocket.close', 'code': 1009})
+        await socket.disconnect()
+
+    async def test_list_socket_rejects_frames_that_are_not_objects(self):
+        socket = InProcessWebSocket(URLRouter(websocket_urlpatterns), '/ws/discussion_list/', scope={'user': AnonymousUser()})
+        await socket.connect()
+        await socket.send_json_to(['new_topic'])
+        self.assertEqual(await socket.receive_json_from(), {'type': 'error', 'message': 'Frames must be objects'})
+        await socket.send_json_to({'type': 'ping'})
+        self.assertEqual(await socket.receive_json_from(), {'type': 'pong'})
+        await socket.disconnect()
+
+
+class DiscussionConsumerLimitTests(SimpleTestCase):
+    def setUp(self):
+        for patcher in (
+            patch('core.consumers.presence_registry', PresenceRegistry(flush_interval=3600)),
+            # These rooms have no topic rows; treat them as open topics
+            patch('core.topic_state.load_topic_state', return_value=TopicState(exists=True, is_active=True)),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def connect(self, user, topic_id=6):
+        return InProcessWebSocket(
+            URLRouter(websocket_urlpatterns), f'/ws/discussion/{topic_id}/', scope={'user': user}
+        )
+
+    def dropped(self, reason, message_type):
+        return dropped_frame_counts().get(reason, {}).get(message_type, 0)
+
+    def test_token_bucket_refills_over_time(self):
+        bucket = TokenBucket(rate=2, capacity=2, now=0)
+        self.assertTrue(bucket.consume(now=0))
+        self.assertTrue(bucket.consume(now=0))
+        self.assertFalse(bucket.consume(now=0.1))
+        self.assertTrue(bucket.consume(now=0.6))
+
+    async def test_typing_broadcasts_only_transitions_and_expires(self):
+        debounced_before = self.dropped('typing_debounced', 'typing')
+        with self.settings(DISCUSSION_TYPING_TIMEOUT=0.1, DISCUSSION_FANOUT_WINDOW=0.01):
+            reader = self.connect(User(id=11, username='reader'))
+            typist = self.connect(User(id=12, username='typist'))
+            for socket in (reader, typist):
+                await socket.connect()
+                await socket.receive_json_from()  # connection_established
+                await socket.receive_json_from()  # presence_snapshot
+            await reader.receive_json_from()  # join notifications
+
+            for _ in range(4):
+                await typist.send_json_to({'type': 'typing', 'is_typing': True})
+            started = await reader.receive_json_from()
+            self.assertEqual([(frame['type'], frame['is_typing']) for frame in started], [('typing', True)])
+
+            # No stop frame from the client: the server expires the indicator
+            stopped = await reader.receive_json_from(timeout=1)
+            self.assertEqual([(frame['type'], frame['is_typing']) for frame in stopped], [('typing', False)])
+
+            for socket in (reader, typist):
+                await socket.disconnect()
+        self.assertEqual(self.dropped('typing_debounced', 'typing') - debounced_before, 3)
+
+    async def test_frames_over_the_user_limit_are_dropped(self):
+        limited_before = self.dropped('rate_limited', 'ping')
+        with patch('core.consumers.frame_rate_limiter', FrameRateLimiter(rate=0.001, burst=3)):
+            socket = self.connect(AnonymousUser())
+            await socket.connect()
+            await socket.receive_json_from()  # connection_established
+            await socket.receive_json_from()  # presence_snapshot
+            for _ in range(5):
+                await socket.send_json_to({'type': 'ping'})
+            for _ in range(3):
+                self.assertEqual((await socket.receive_json_from())['type'], 'pong')
+            self.assertTrue(await socket.receive_nothing(timeout=0.1))
+            await socket.disconnect()
+        self.assertEqual(self.dropped('rate_limited', 'ping') - limited_before, 2)
+
+
+class PresenceRegistryTests(TestCase):
+    def test_user_is_online_until_last_socket_leaves(self):
+        registry = PresenceRegistry(flush_interval=3600)
+        self.assertTrue(registry.join(1, 10, 'ann', 'chan-a'))
+        self.assertFalse(registry.join(1, 10, 'ann', 'chan-b'))
+        registry.join(1, 11, 'bob', 'chan-c')
+        self.assertEqual(registry.count(1), 2)
+        self.assertEqual(sorted(user['user'] for user in registry.online(1)), ['ann', 'bob'])
+
+        self.assertFalse(registry.leave(1, 10, 'chan-a'))
+        self.assertTrue(registry.is_online(1, 10))
+        self.assertTrue(registry.leave(1, 10, 'chan-b'))
+        self.assertFalse(registry.is_online(1, 10))
+        self.assertEqual(registry.online(2), [])
+
+    def test_silent_sockets_expire(self):
+        registry = PresenceRegistry(ttl=30, flush_interval=3600)
+        registry.join(1, 10, 'ann', 'chan-a', now=0)
+        registry.join(1, 11, 'bob', 'chan-b', now=0)
+        registry.heartbeat(1, 11, 'bob', 'chan-b', now=20)
+        self.assertEqual(registry.expire(now=40), [(1, 10, 'ann')])
+        self.assertEqual([user['user_id'] for user in registry.online(1)], [11])
+
+    def test_flush_writes_presence_in_one_upsert(self):
+        topic = DiscussionTopic.objects.create(title='Presence')
+        ann, bob = User.objects.create(username='ann'), User.objects.create(username='bob')
+        UserOnlineStatus.objects.create(user=bob, is_online=True)
+
+        registry = PresenceRegistry(flush_interval=3600)
+        registry.join(topic.pk, ann.pk, 'ann', 'chan-a')
+        registry.join(topic.pk, bob.pk, 'bob', 'chan-b')
+        registry.heartbeat(topic.pk, ann.pk, 'ann', 'chan-a')
+        registry.leave(topic.pk, bob.pk, 'chan-b')
+
+        with CaptureQueriesContext(connection) as context:
+            self.assertEqual(registry.flush(), 2)
+        self.assertEqual([query['sql'].split()[0] for query in context.captured_queries], ['SELECT', 'INSERT'])
+
+        statuses = {status.user_id: status for status in UserOnlineStatus.objects.all()}
+        self.assertTrue(statuses[ann.pk].is_online)
+        self.assertEqual(statuses[ann.pk].current_topic_id, topic.pk)
+        self.assertFalse(statuses[bob.pk].is_online)
+        self.assertIsNone(statuses[bob.pk].current_topic_id)
+        self.assertEqual(registry.flush(), 0)
+
+
+class DiscussionConsumerPresenceTests(SimpleTestCase):
+    def setUp(self):
+        self.registry = PresenceRegistry(flush_interval=3600)
+        for patcher in (
+            patch('core.consumers.presence_registry', self.registry),
+            patch('core.topic_state.load_topic_state', return_value=TopicState(exists=True, is_active=True)),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def connect(self, user, topic_id=8):
+        return InProcessWebSocket(
+            URLRouter(websocket_urlpatterns), f'/ws/discussion/{topic_id}/', scope={'user': user}
+        )
+
+    async def test_joiners_receive_snapshot_and_join_is_broadcast_once_per_user(self):
+        first = self.connect(User(id=21, username='ann'))
+        await first.connect()
+        await first.receive_json_from()  # connection_established
+        self.assertEqual((await first.receive_json_from())['users'], [{'user': 'ann', 'user_id': 21}])
+        await first.receive_json_from()  # own join
+
+        second_tab = self.connect(User(id=21, username='ann'))
+        await second_tab.connect()
+        await second_tab.receive_json_from()  # connection_established
+        await second_tab.receive_json_from()  # presence_snapshot
+        newcomer = self.connect(AnonymousUser())
+        await newcomer.connect()
+        await newcomer.receive_json_from()  # connection_established
+        snapshot = await newcomer.receive_json_from()
+        self.assertEqual(snapshot, {'type': 'presence_snapshot', 'users': [{'user': 'ann', 'user_id': 21}]})
+        self.assertTrue(await first.receive_nothing(timeout=0.1))
+
+        await first.disconnect()
+        self.assertTrue(self.registry.is_online(8, 21))
+        await second_tab.disconnect()
+        self.assertFalse(self.registry.is_online(8, 21))
+        leave = await newcomer.receive_json_from()
+        self.assertEqual([(frame['type'], frame['user_id']) for frame in leave], [('user_leave', 21)])
+        await newcomer.disconnect()
+
+    async def test_expired_user_leaves_and_rejoins_on_next_frame(self):
+        self.registry = PresenceRegistry(ttl=30, flush_interval=3600)
+        ann = self.connect(User(id=21, username='ann'))
+        watcher = self.connect(AnonymousUser())
+        with patch('core.consumers.presence_registry', self.registry):
+            await ann.connect()
+            for _ in range(3):
+                await ann.receive_json_from()  # connection_established, presence_snapshot, own join
+            await watcher.connect()
+            for _ in range(2):
+                await watcher.receive_json_from()  # connection_established, presence_snapshot
+
+            # The flush timer thread expires ann's silent socket
+            expired = self.registry.expire(now=time.monotonic() + 60)
+            self.assertEqual([(user_id, name) for _, user_id, name in expired], [(21, 'ann')])
+            await asyncio.to_thread(publish_expired, expired)
+            leave = await watcher.receive_json_from()
+            self.assertEqual([(frame['type'], frame['user_id']) for frame in leave], [('user_leave', 21)])
+
+            # Her next frame brings her back, with a fresh snapshot and a join for the room
+            await ann.receive_json_from()  # own leave
+            await ann.send_json_to({'type': 'ping'})
+            snapshot = await ann.receive_json_from()
+            self.assertEqual(snapshot, {'type': 'presence_snapshot', 'users': [{'user': 'ann', 'user_id': 21}]})
+            join = await watcher.receive_json_from()
+            self.assertEqual([(frame['type'], frame['user_id']) for frame in join], [('user_join', 21)])
+            await ann.disconnect()
+            await watcher.disconnect()
+
+
+def chat_message(topic_id, content, author_name='ann', seconds=0):
+    return ChatMessage(
+        message_id=ulid.new_ulid(), topic_id=topic_id, content=content, author_id=None,
+        author_name=author_name, created_at=timezone.now() + timedelta(seconds=seconds)
+    )
+
+
+class ChatWriteBehindTests(TestCase):
+    def test_batch_is_one_insert_and_one_update_per_topic(self):
+        category = ForumCategory.objects.create(name='Chat')
+        first = DiscussionTopic.objects.create(title='First', category=category)
+        second = DiscussionTopic.objects.create(title='Second', category=category)
+        messages = [
+            chat_message(first.pk, 'one'),
+            chat_message(second.pk, 'two'),
+            chat_message(first.pk, 'three', author_name='bob', seconds=1),
+        ]
+
+        with CaptureQueriesContext(connection) as context:
+            results = write_chat_messages(messages)
+        # executemany statements are logged as "N times: INSERT ..."
+        statements = [query['sql'].split(': ')[-1].split()[0] for query in context.captured_queries
+                      if 'SAVEPOINT' not in query['sql']]
+        # bulk INSERT, topic + category UPDATE per topic, search index INSERT
+        self.assertEqual(statements, ['INSERT', 'UPDATE', 'UPDATE', 'UPDATE', 'UPDATE', 'INSERT'])
+
+        posts = {post.message_id: post for post in DiscussionPost.objects.all()}
+        self.assertEqual(results, [posts[message.message_id].pk for message in messages])
+        first.refresh_from_db()
+        self.assertEqual((first.post_count, first.last_post_author_name), (2, 'bob'))
+        category.refresh_from_db()
+        self.assertIn(category.latest_topic_id, {first.pk, second.pk})
+
+
+class ChatWriteBehindConsumerTests(TransactionTestCase):
+    def test_batch_with_a_deleted_topic_is_retried_without_it(self):
+        topic = DiscussionTopic.objects.create(title='Still here')
+        messages = [chat_message(topic.pk, 'kept'), chat_message(999_999, 'orphan')]
+        results = write_chat_messages(messages)
+        self.assertEqual(results[0], DiscussionPost.objects.get(message_id=messages[0].message_id).pk)
+        self.assertIsInstance(results[1], TopicUnavailable)
+        self.assertEqual(DiscussionPost.objects.count(), 1)
+
+    def connect(self, user, topic_id):
+        return InProcessWebSocket(
+            URLRouter(websocket_urlpatterns), f'/ws/discussion/{topic_id}/', scope={'user': user}
+        )
+
+    async def test_message_is_broadcast_before_it_is_acked_as_persisted(self):
+        topic = await DiscussionTopic.objects.acreate(title='Write-behind')
+        with patch('core.consumers.presence_registry', PresenceRegistry(flush_interval=3600)), \
+                patch('core.consumers.chat_write_queue', ChatWriteQueue(flush_interval=0.05)):
+            reader = self.connect(AnonymousUser(), topic.pk)
+            sender = self.connect(AnonymousUser(), topic.pk)
+            for socket in (reader, sender):
+                await socket.connect()
+                await socket.receive_json_from()  # connection_established
+                await socket.receive_json_from()  # presence_snapshot
+
+            await sender.send_json_to({'type': 'chat_message', 'content': 'Hello', 'client_ref': 'temp-1'})
+            accepted = await sender.receive_json_from()
+            self.assertEqual((accepted['type'], accepted['status'], accepted['client_ref']), ('message_ack', 'accepted', 'temp-1'))
+            [broadcast] = await reader.receive_json_from()
+            self.assertEqual((broadcast['message_id'], broadcast['content']), (accepted['message_id'], 'Hello'))
+
+            persisted = await sender.receive_json_from(timeout=2)
+            self.assertEqual(persisted['status'], 'persisted')
+            post = await DiscussionPost.objects.aget(message_id=accepted['message_id'])
+            self.assertEqual(persisted['post_id'], post.pk)
+            await topic.arefresh_from_db()
+            self.assertEqual(topic.post_count, 1)
+
+            for socket in (reader, sender):
+                await socket.disconnect()
+
+
+class MessageReplayTests(TransactionTestCase):
+    def connect(self, topic_id, query=''):
+        return InProcessWebSocket(
+            URLRouter(websocket_urlpatterns), f'/ws/discussion/{topic_id}/{query}', scope={'user': AnonymousUser()}
+        )
+
+    def test_ring_buffer_reports_whether_it_covers_a_resume_point(self):
+        buffers = ReplayBuffers(size=3)
+        buffers.record(1, 1, 'a', '{}')  # no socket in the room: not buffered
+        buffers.attach(1)
+        for sequence in (2, 3, 5, 4, 6):
+            buffers.record(1, sequence, f'm{sequence}', f'"{sequence}"')
+        self.assertEqual(buffers.since(1, 3), (True, [(4, '"4"'), (5, '"5"'), (6, '"6"')]))
+        self.assertFalse(buffers.since(1, 2)[0])
+        buffers.discard(1, 'm5')
+        self.assertEqual(buffers.since(1, 4), (True, [(6, '"6"')]))
+        buffers.detach(1)
+        self.assertEqual(buffers.since(1, 0), (False, []))
+
+    async def test_rolled_over_buffer_falls_back_to_persisted_messages(self):
+        topic = await DiscussionTopic.objects.acreate(title='Replay')
+        for sequence in (1, 2, 3):
+            await DiscussionPost.objects.acreate(topic=topic, content=f'post {sequence}', sequence=sequence)
+        buffers = ReplayBuffers(size=2)
+        buffers.attach(topic.pk)
+        # Broadcast but not written yet by the write-behind queue
+        buffers.record(topic.pk, 4, 'pending', encode_frames({'seq': 4}))
+
+        frames = [json.loads(frame['frame']) for frame in await missed_frames(topic.pk, 1, buffers)]
+        self.assertEqual([frame['seq'] for frame in frames], [2, 3, 4])
+        self.assertEqual(frames[0]['content'], 'post 2')
+        with self.settings(DISCUSSION_REPLAY_MAX_MESSAGES=2):
+            self.assertIsNone(await missed_frames(topic.pk, 0, buffers))
+
+    async def test_reconnecting_socket_receives_only_missed_messages(self):
+        topic = await DiscussionTopic.objects.acreate(title='Reconnect')
+        with patch('core.consumers.presence_registry', PresenceRegistry(flush_interval=3600)), \
+                patch('core.consumers.chat_write_queue', ChatWriteQueue(flush_interval=0.01)), \
+                patch('core.consumers.sequence_allocator', LocalSequenceAllocator()), \
+                patch('core.consumers.replay_buffers', ReplayBuffers()):
+            sender = self.connect(topic.pk)
+            await sender.connect()
+            await sender.receive_json_from()  # connection_established
+            await sender.receive_json_from()  # presence_snapshot
+            for content in ('one', 'two', 'three'):
+                await sender.send_json_to({'type': 'chat_message', 'content': content})
+                await sender.receive_json_from()  # accepted
+                self.assertEqual((await sender.receive_json_from(timeout=2))['status'], 'persisted')
+
+            resumed = self.connect(topic.pk, '?resume_from=1')
+            await resumed.connect()
+            await resumed.receive_json_from()  # connection_established
+            await resumed.receive_json_from()  # presence_snapshot
+            replayed = await resumed.receive_json_from()
+            self.assertEqual([(frame['seq'], frame['content']) for frame in replayed], [(2, 'two'), (3, 'three')])
+            self.assertEqual(await resumed.receive_json_from(), {'type': 'replay_complete', 'resume_from': 1, 'replayed': 2})
+
+            for socket in (sender, resumed):
+                await socket.disconnect()
+
+
+class TopicStateCacheTests(TransactionTestCase):
+    def connect(self, topic_id):
+        return InProcessWebSocket(
+            URLRouter(websocket_urlpatterns), f'/ws/discussion/{topic_id}/', scope={'user': AnonymousUser()}
+        )
+
+    async def test_locking_a_topic_rejects_posts_without_a_query(self):
+        topic = await DiscussionTopic.objects.acreate(title='Lockable')
+        cache = TopicStateCache()
+        with patch('core.consumers.presence_registry', PresenceRegistry(flush_interval=3600)), \
+                patch('core.consumers.topic_state_cache', cache), \
+                patch('core.consumers.chat_write_queue') as write_queue:
+            socket = self.connect(topic.pk)
+            await socket.connect()
+            await socket.receive_json_from()  # connection_established
+            await socket.receive_json_from()  # presence_snapshot
+            self.assertEqual(cache.get(topic.pk), TopicState(exists=True, is_active=True, is_locked=False))
+
+            topic.is_locked = True
+            await topic.asave()  # published to the room on commit
+            [state] = await socket.receive_json_from()
+            self.assertEqual((state['type'], state['is_locked']), ('topic_state', True))
+            self.assertTrue(cache.get(topic.pk).is_locked)
+
+            with patch('core.topic_state.load_topic_state') as load_topic_state:
+                await socket.send_json_to({'type': 'chat_message', 'content': 'Too late', 'client_ref': 'temp-9'})
+                error = await socket.receive_json_from()
+            self.assertEqual((error['code'], error['client_ref']), ('topic_locked', 'temp-9'))
+            load_topic_state.assert_not_called()
+            write_queue.submit.assert_not_called()
+
+            await socket.disconnect()
+        self.assertIsNone(cache.get(topic.pk))
+
+
+class TopicListDeltaTests(TransactionTestCase):
+    def connect(self, category):
+        return InProcessWebSocket(
+            URLRouter(websocket_urlpatterns), f'/ws/discussion_list/?category={category.pk}', scope={'user': AnonymousUser()}
+        )
+
+    async def test_category_list_receives_new_topics_and_deltas(self):
+        category = await ForumCategory.objects.acreate(name='Interviews')
+        other = await ForumCategory.objects.acreate(name='Offers')
+        listing, other_listing = self.connect(category), self.connect(other)
+        for socket in (listing, other_listing):
+            self.assertTrue((await socket.connect())[0])
+
+        topic = await DiscussionTopic.objects.acreate(title='Graph rounds', category=category)
+        [created] = await listing.receive_json_from()
+        self.assertEqual(created['type'], 'new_topic')
+        self.assertEqual((created['topic']['id'], created['topic']['post_count']), (topic.pk, 0))
+
+        await DiscussionPost.objects.acreate(topic=topic, content='BFS everywhere', author_name='ann')
+        [delta] = await listing.receive_json_from()
+        self.assertEqual((delta['type'], delta['topic_id'], delta['post_count']), ('topic_updated', topic.pk, 1))
+        self.assertEqual(set(delta['changes']), set(POST_ACTIVITY_FIELDS))
+        self.assertEqual(delta['changes']['last_post']['author_name'], 'ann')
+
+        topic = await DiscussionTopic.objects.aget(pk=topic.pk)
+        topic.is_pinned = True
+        await topic.asave()
+        [delta] = await listing.receive_json_from()
+        self.assertEqual(delta['changes'], {'is_pinned': True})
+
+        views = ViewCountBuffer(flush_interval=3600)
+        views.record(topic.pk, 3)
+        # Flushes run on timer threads, outside the server's event loop
+        await asyncio.to_thread(views.flush)
+        [delta] = await listing.receive_json_from()
+        self.assertEqual(delta['changes'], {'view_count': 3})
+
+        self.assertTrue(await other_listing.receive_nothing())
+        for socket in (listing, other_listing):
+            await socket.disconnect()
+
+    def test_deltas_for_many_topics_take_one_query(self):
+        category = ForumCategory.objects.create(name='Interviews')
+        topics = [DiscussionTopic.objects.create(title=f'Topic {i}', category=category) for i in range(3)]
+        DiscussionTopic.objects.filter(pk=topics[2].pk).update(is_active=False)
+        with self.assertNumQueries(1):
+            frames = topic_list_frames([topic.pk for topic in topics], ['view_count'])
+        self.assertEqual(set(frames), {'discussion_list', f'discussion_list_{category.pk}'})
+        self.assertCountEqual(
+            [json.loads(frame['frame'])['topic_id'] for frame in frames['discussion_list']],
+            [topics[0].pk, topics[1].pk],
+        )
+
+
+class SendFromSyncTests(SimpleTestCase):
+    async def test_sends_from_own_threads_run_on_the_server_loop(self):
+        remember_server_loop()
+        loops = []
+
+        async def send(value):
+            loops.append(asyncio.get_running_loop())
+            return value
+
+        self.assertEqual(await asyncio.to_thread(send_from_sync, send, 'sent'), 'sent')
+        self.assertEqual(loops, [asyncio.get_running_loop()])
+        # Without a running server loop (e.g. manage.py commands) the send gets its own loop
+        self.assertEqual(await asyncio.to_thread(lambda: send_from_sync(send, 'alone')), 'alone')
+
+
+class DiscussionGroupShardTests(SimpleTestCase):
+    def test_single_shard_keeps_plain_group_name(self):
+        with self.settings(DISCUSSION_GROUP_SHARDS=1):
+            self.assertEqual(discussion_group_names(7), ['discussion_7'])
+            self.assertEqual(discussion_group_for(7, 'specific.abc!1'), 'discussion_7')
+
+    def test_channels_spread_over_shards(self):
+        with self.settings(DISCUSSION_GROUP_SHARDS=4):
+            names = discussion_group_names(7)
+            self.assertEqual(len(names), 4)
+            joined = {discussion_group_for(7, f'specific.abc!{i}') for i in range(200)}
+            self.assertEqual(joined, set(names))
+            self.assertEqual(discussion_group_for(7, 'specific.abc!1'), discussion_group_for(7, 'specific.abc!1'))
+
+
+@skipUnless(TcpFakeServer, 'fakeredis is required for the multi-process channel layer test')
+class MultiProcessChannelLayerTests(SimpleTestCase):
+    """
+    Two worker processes share a fake Redis server through the production
+    channel layer configuration; a chat message posted on worker A must
+    reach a socket connected to worker B.
+    """
+
+    def setUp(self):
+        self.redis = TcpFakeServer(('127.0.0.1', 0), server_type='redis')
+        threading.Thread(target=self.redis.serve_forever, daemon=True).start()
+        self.addCleanup(self.redis.server_close)
+        self.addCleanup(self.redis.shutdown)
+
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        host, port = self.redis.server_address
+        self.env = {
+            **os.environ,
+            'DJANGO_SQLITE_PATH': os.path.join(self.tmp.name, 'db.sqlite3'),
+            'CHANNEL_REDIS_URL': f'redis://{host}:{port}/0',
+            'DISCUSSION_GROUP_SHARDS': '4',
+        }
+
+    def manage(self, *args, **kwargs):
+        return subprocess.run(
+            [sys.executable, str(settings.BASE_DIR / 'manage.py'), *args],
+            env=self.env, capture_output=True, text=True, check=True, timeout=120, **kwargs
+        )
+
+    def test_message_posted_on_worker_a_reaches_socket_on_worker_b(self):
+        self.manage('migrate', '--verbosity', '0')
+        topic_id = self.manage(
+            'shell', '-c',
+            "from core.models import DiscussionTopic; print(DiscussionTopic.objects.create(title='Cross-worker').pk)"
+        ).stdout.strip().splitlines()[-1]
+
+        worker_b = subprocess.Popen(
+            [sys.executable, str(settings.BASE_DIR / 'manage.py'), 'probe_discussion_socket',
+             '--topic', topic_id, '--expect', 'chat_message', '--timeout', '30'],
+            env=self.env, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True
+        )
+        self.addCleanup(worker_b.kill)
+        self.assertEqual(json.loads(worker_b.stdout.readline())['type'], 'probe_ready')
+
+        self.manage('probe_discussion_socket', '--topic', topic_id, '--send', 'Hello from worker A')
+
+        output, _ = worker_b.communicate(timeout=60)
+        frames = [json.loads(line) for line in output.splitlines() if line.startswith('{')]
+        self.assertEqual(frames[-1]['type'], 'chat_message')
+        self.assertEqual(frames[-1]['content'], 'Hello from worker A')
+        # Sequence numbers come from the shared Redis counter
+        self.assertEqual(frames[-1]['seq'], 1)
+
+
+def gemini_reply(text):
+    return httpx.Response(200, json={'candidates': [{'content': {'parts': [{'text': text}]}}]})
+
+
+class LLMGatewayTests(SimpleTestCase):
+    def gateway(self, handler, **kwargs):
+        options = {'api_key': 'test-key', 'timeout': 5, 'retry_backoff': 0.01, **kwargs}
+        return LLMGateway(transport=httpx.MockTransport(handler), **options)
+
+    def test_retries_unavailable_upstream_then_returns_text(self):
+        calls = []
+
+        def handler(request):
+            calls.append(request)
+            return httpx.Response(503) if len(calls) == 1 else gemini_reply('Hello')
+
+        self.assertEqual(self.gateway(handler).generate('Hi'), 'Hello')
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(calls[0].headers['x-goog-api-key'], 'test-key')
+        self.assertTrue(calls[0].url.path.endswith(':generateContent'))
+
+    def test_deadline_covers_retries(self):
+        def handler(request):
+            raise httpx.ReadTimeout('slow', request=request)
+
+        with self.assertRaises(LLMTimeout):
+            self.gateway(handler, timeout=0.05, max_retries=100, retry_backoff=0.02).generate('Hi')
+
+    def test_async_calls_share_the_concurrency_limit(self):
+        active = []
+        peak = []
+
+        async def handler(request):
+            active.append(request)
+            peak.append(len(active))
+            await asyncio.sleep(0.01)
+            active.remove(request)
+            return gemini_reply('ok')
+
+        gateway = self.gateway(handler, max_concurrency=2)
+
+        async def run():
+            return await asyncio.gather(*(gateway.agenerate(f'prompt {i}') for i in range(6)))
+
+        self.assertEqual(asyncio.run(run()), ['ok'] * 6)
+        self.assertEqual(max(peak), 2)
+
+    def test_each_event_loop_keeps_its_own_async_client(self):
+        gateway = self.gateway(lambda request: gemini_reply('ok'))
+
+        async def clients():
+            return gateway._async_client()[0], gateway._async_client()[0]
+
+        first, again = asyncio.run(clients())
+        self.assertIs(first, again)
+        second, _ = asyncio.run(clients())
+        self.assertIsNot(first, second)
+        # Clients of finished loops are not kept around
+        gc.collect()
+        self.assertEqual(len(gateway._async_clients), 0)
+
+    def test_deadline_covers_a_trickling_response(self):
+        class Trickle(httpx.SyncByteStream):
+            def __iter__(self):
+                for _ in range(50):
+                    time.sleep(0.01)
+                    yield b' '
+
+        gateway = self.gateway(lambda request: httpx.Response(200, stream=Trickle()), timeout=0.1)
+        started = time.monotonic()
+        with self.assertRaises(LLMTimeout):
+            gateway.generate('Hi')
+        self.assertLess(time.monotonic() - started, 0.3)
+
+    def test_malformed_responses_raise_llm_errors(self):
+        with self.assertRaises(LLMError):
+            self.gateway(lambda request: httpx.Response(200, text='{"candidates": [')).generate('Hi')
+
+        stream = b'data: {"candidates": [{"content": {"parts": [{"text": "Hel"}]}}]}\n\ndata: {"cand\n\n'
+        gateway = self.gateway(lambda request: httpx.Response(200, content=stream))
+
+        async def consume():
+            return [text async for text in gateway.astream('Hi')]
+
+        with self.assertRaises(LLMError):
+            asyncio.run(consume())
+
+    def test_unavailable_without_api_key(self):
+        gateway = self.gateway(lambda request: gemini_reply('unused'), api_key='')
+        self.assertFalse(gateway.available)
+        with self.assertRaises(LLMUnavailable):
+            gateway.generate('Hi')
+
+
+class AIChatbotViewTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user(username='asker'))
+
+    @patch('core.views.llm_gateway')
+    def test_returns_model_reply(self, gateway):
+        gateway.available = True
+        gateway.generate.return_value = 'Practice graphs daily.'
+        response = self.client.post('/api/ai_chatbot/', {'message': 'How do I prepare?'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['response'], 'Practice graphs daily.')
+
+    @patch('core.views.llm_gateway')
+    def test_model_timeout_is_a_gateway_timeout(self, gateway):
+        gateway.available = True
+        gateway.generate.side_effect = LLMTimeout('Model call deadline passed')
+        response = self.client.post('/api/ai_chatbot/', {'message': 'How do I prepare?'}, format='json')
+        self.assertEqual(response.status_code, 504)
+
+
+class InterviewEvaluationTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user(username='candidate'))
+        self.payload = {
+            'company_name': 'Acme',
+            'job_description': 'Backend engineer',
+            'question_answers': [
+                {'question_text': 'Q1', 'user_answer': 'first answer'},
+                {'question_text': 'Q2', 'user_answer': ''},
+                {'question_text': 'Q3', 'user_answer': 'third answer'},
+                {'question_text': 'Q4', 'user_answer': 'fourth answer'},
+            ],
+        }
+
+    def evaluate(self):
+        with patch('builtins.print'):
+            response = self.client.post('/api/evaluate_interview_answers/', self.payload, format='json')
+        self.assertEqual(response.status_code, 200)
+        return response.data['evaluations']
+
+    @patch('core.views.llm_gateway')
+    def test_concurrent_results_keep_question_order_and_fall_back_per_answer(self, gateway):
+        def generate(prompt, timeout=None):
+            # Earlier answers finish last; the third one misses its deadline
+            for score, answer in ((9, 'first answer'), (5, 'fourth answer')):
+                if answer in prompt:
+                    time.sleep(0.05 if score == 9 else 0)
+                    return json.dumps({'score': score, 'strengths': [], 'improvements': [], 'suggestions': [],
+                                       'overall_comment': answer})
+            raise LLMTimeout('Model call deadline passed')
+
+        gateway.available = True
+        gateway.generate.side_effect = generate
+        evaluations = self.evaluate()
+
+        self.assertEqual([evaluation['question_text'] for evaluation in evaluations], ['Q1', 'Q2', 'Q3', 'Q4'])
+        self.assertEqual(evaluations[0]['score'], 9)
+        self.assertEqual(evaluations[1]['user_answer'], 'No answer provided')
+        # The fallback scores short answers 4
+        self.assertEqual(evaluations[2]['score'], 4)
+        self.assertEqual(evaluations[3]['score'], 5)
+        self.assertEqual(gateway.generate.call_count, 3)
+
+    @patch('core.views.llm_gateway')
+    def test_batched_mode_scores_all_answers_with_one_call(self, gateway):
+        gateway.available = True
+        # The reply leaves out the second answered question (Q3)
+        gateway.generate.return_value = '```json\n' + json.dumps([
+            {'answer': 1, 'score': 8, 'strengths': [], 'improvements': [], 'suggestions': [], 'overall_comment': ''},
+            {'answer': 3, 'score': 6, 'strengths': [], 'improvements': [], 'suggestions': [], 'overall_comment': ''},
+        ]) + '\n```'
+        with self.settings(INTERVIEW_EVALUATION_BATCHED=True):
+            evaluations = self.evaluate()
+
+        self.assertEqual(gateway.generate.call_count, 1)
+        self.assertEqual([evaluation['score'] for evaluation in evaluations], [8, 0, 4, 6])
+        self.assertEqual(evaluations[3]['question_text'], 'Q4')
+        self.assertNotIn('answer', evaluations[0])
+
+    @patch('core.views.llm_gateway')
+    def test_batched_mode_accepts_string_answer_numbers(self, gateway):
+        gateway.available = True
+        gateway.generate.return_value = json.dumps([
+            {'answer': '1', 'score': 8, 'strengths': [], 'improvements': [], 'suggestions': [], 'overall_comment': ''},
+            {'answer': ' 2 ', 'score': 7, 'strengths': [], 'improvements': [], 'suggestions': [], 'overall_comment': ''},
+            {'answer': 'third', 'score': 6, 'strengths': [], 'improvements': [], 'suggestions': [], 'overall_comment': ''},
+        ])
+        with self.settings(INTERVIEW_EVALUATION_BATCHED=True):
+            evaluations = self.evaluate()
+
+        # The unnumbered third item falls back
+        self.assertEqual([evaluation['score'] for evaluation in evaluations], [8, 0, 7, 4])
+
+
+class FakeTextToSpeech:
+    def __init__(self):
+        self.calls = []
+        self.active = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+
+    def convert(self, text, **options):
+        with self.lock:
+            self.calls.append(text)
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(0.02)
+        with self.lock:
+            self.active -= 1
+        return iter([b'ID3', text.encode()])
+
+
+class SpeechSynthesizerTests(SimpleTestCase):
+    def setUp(self):
+        cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(cache_dir.cleanup)
+        self.tts = FakeTextToSpeech()
+        self.client = type('FakeElevenLabs', (), {'text_to_speech': self.tts})()
+        self.synthesizer = SpeechSynthesizer(client=self.client, cache_dir=cache_dir.name)
+
+    def test_synthesizes_distinct_texts_concurrently_and_caches_them(self):
+        keys = self.synthesizer.synthesize_many(['Q1', 'Q2', 'Q1', 'Q3'])
+
+        self.assertEqual(keys[0], keys[2])
+        self.assertEqual(len(set(keys)), 3)
+        self.assertEqual(sorted(self.tts.calls), ['Q1', 'Q2', 'Q3'])
+        self.assertGreater(self.tts.peak, 1)
+        self.assertEqual(self.synthesizer.audio_path(keys[1]).read_bytes(), b'ID3Q2')
+
+        self.assertEqual(self.synthesizer.synthesize_many(['Q2']), [keys[1]])
+        self.assertEqual(len(self.tts.calls), 3)
+
+    def test_least_recently_used_audio_is_evicted_over_the_size_limit(self):
+        first, second = self.synthesizer.synthesize_many(['Q1', 'Q2'])
+        old = time.time() - 60
+        os.utime(self.synthesizer.audio_path(first), (old, old))
+        os.utime(self.synthesizer.audio_path(second), (old - 60, old - 60))
+        # A hit makes Q2 the most recently used
+        self.synthesizer.synthesize('Q2')
+
+        # Each file is 5 bytes, so only two fit
+        with self.settings(TTS_CACHE_MAX_BYTES=10):
+            third = self.synthesizer.synthesize('Q3')
+        self.assertFalse(self.synthesizer.audio_path(first).exists())
+        self.assertTrue(self.synthesizer.audio_path(second).exists())
+        self.assertTrue(self.synthesizer.audio_path(third).exists())
+
+    def test_key_covers_voice_options(self):
+        key = self.synthesizer.audio_key('Q1')
+        with self.settings(TTS_VOICE_ID='another-voice'):
+            self.assertNotEqual(self.synthesizer.audio_key('Q1'), key)
+        self.assertIsNone(self.synthesizer.audio_path('../settings'))
+
+
+class TTSAudioViewTests(SimpleTestCase):
+    def setUp(self):
+        cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(cache_dir.cleanup)
+        self.synthesizer = SpeechSynthesizer(cache_dir=cache_dir.name)
+        self.key = self.synthesizer.audio_key('Q1')
+        path = self.synthesizer.audio_path(self.key)
+        path.parent.mkdir(parents=True)
+        path.write_bytes(bytes(range(100)))
+        patcher = patch('core.views.speech_synthesizer', self.synthesizer)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def get(self, **headers):
+        return APIClient().get(f'/api/tts_audio/{self.key}/', headers=headers)
+
+    def body(self, response):
+        # Audio is streamed from the cache file, not loaded into the response
+        self.assertTrue(response.streaming)
+        body = b''.join(response.streaming_content)
+        response.close()
+        return body
+
+    def test_whole_file(self):
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.body(response), bytes(range(100)))
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(response['Content-Type'], 'audio/mpeg')
+        self.assertEqual(response['Content-Length'], '100')
+
+    def test_byte_ranges(self):
+        response = self.get(Range='bytes=10-19')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(self.body(response), bytes(range(10, 20)))
+        self.assertEqual(response['Content-Range'], 'bytes 10-19/100')
+        self.assertEqual(response['Content-Length'], '10')
+
+        self.assertEqual(self.body(self.get(Range='bytes=90-')), bytes(range(90, 100)))
+        self.assertEqual(self.body(self.get(Range='bytes=-5')), bytes(range(95, 100)))
+        self.assertEqual(self.get(Range='bytes=100-').status_code, 416)
+
+    def test_conditional_and_unknown_keys(self):
+        self.assertEqual(self.get(**{'If-None-Match': f'"{self.key}"'}).status_code, 304)
+        self.assertEqual(APIClient().get(f'/api/tts_audio/{"0" * 64}/').status_code, 404)
+        self.assertEqual(APIClient().get('/api/tts_audio/not-a-key/').status_code, 404)
+
+
+class MockInterviewAudioTests(TestCase):
+    @patch('core.views.speech_synthesizer')
+    @patch('core.views.llm_gateway')
+    def test_questions_carry_audio_urls(self, gateway, synthesizer):
+        gateway.available = True
+        gateway.generate.return_value = json.dumps({'questions': [
+            {'question_text': 'Tell me about yourself', 'difficulty_level': 'easy'},
+            {'question_text': 'Design a URL shortener', 'difficulty_level': 'hard'},
+        ]})
+        synthesizer.available = True
+        synthesizer.synthesize_many.return_value = ['a' * 64, None]
+
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user(username='interviewee'))
+        response = client.post('/api/generate_mock_interview/', {
+            'company_name': 'Acme', 'job_description': 'Backend engineer', 'num_questions': 2,
+        }, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        questions = response.data['questions']
+        self.assertEqual(questions[0]['audio_url'], f'http://testserver/api/tts_audio/{"a" * 64}/')
+        self.assertNotIn('audio_url', questions[1])
+        self.assertNotIn('audio_data', questions[0])
+        synthesizer.synthesize_many.assert_called_once_with(['Tell me about yourself', 'Design a URL shortener'])
+
+
+def gemini_sse(*texts):
+    return ''.join(
+        f"data: {json.dumps({'candidates': [{'content': {'parts': [{'text': text}]}}]})}\r\n\r\n" for text in texts
+    ).encode()
+
+
+async def read_sse_events(response, events):
+    """Read the events of a streaming response the way the ASGI handler does (or of a buffered one)"""
+    chunks = response.streaming_content if response.streaming else text_chunks(response.content)
+    async for chunk in chunks:
+        for block in chunk.decode().split('\n\n'):
+            if block:
+                event, data = block.split('\n', 1)
+                events.append({'event': event[len('event: '):], **json.loads(data[len('data: '):])})
+    return events
+
+
+class EndlessModelStream(httpx.AsyncByteStream):
+    """An upstream stream that sends one chunk and then stalls until it is closed"""
+
+    def __init__(self):
+        self.closed = False
+
+    async def __aiter__(self):
+        yield gemini_sse('First token')
+        await asyncio.Event().wait()
+
+    async def aclose(self):
+        self.closed = True
+
+
+class AIStreamingTests(TestCase):
+    def setUp(self):
+        user = User.objects.create_user(username='streamer')
+        # Responses are only streamed to requests served by ASGI
+        self.async_client = AsyncClient()
+        self.token = str(AccessToken.for_user(user))
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+
+    def post(self, path, data):
+        return async_to_sync(self.async_client.post)(
+            path, data, content_type='application/json', headers={'Authorization': f'Bearer {self.token}'}
+        )
+
+    def collect(self, response):
+        self.assertTrue(response.streaming)
+        return asyncio.run(read_sse_events(response, []))
+
+    def test_gateway_retries_before_first_chunk_and_relays_tokens(self):
+        calls = []
+
+        async def handler(request):
+            calls.append(request)
+            if len(calls) == 1:
+                return httpx.Response(503)
+            return httpx.Response(200, content=gemini_sse('Hel', 'lo'))
+
+        gateway = LLMGateway(api_key='key', retry_backoff=0.01, transport=httpx.MockTransport(handler))
+        with patch('core.views.llm_gateway', gateway):
+            response = self.post('/api/ai_chatbot/', {'message': 'Hi', 'stream': True})
+            events = self.collect(response)
+
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertEqual([event['event'] for event in events], ['token', 'token', 'done'])
+        self.assertEqual(''.join(event.get('text', '') for event in events), 'Hello')
+        self.assertEqual(calls[1].url.params['alt'], 'sse')
+        self.assertTrue(calls[1].url.path.endswith(':streamGenerateContent'))
+
+    def test_client_disconnect_aborts_the_upstream_call(self):
+        upstream = EndlessModelStream()
+        gateway = LLMGateway(
+            api_key='key', max_concurrency=1,
+            transport=httpx.MockTransport(lambda request: httpx.Response(200, stream=upstream)),
+        )
+        with patch('core.views.llm_gateway', gateway):
+            response = self.post('/api/ai_topic_explainer/?stream=true', {'topic_name': 'Arrays'})
+
+            async def disconnect_after_first_token():
+                events = []
+                task = asyncio.ensure_future(read_sse_events(response, events))
+                while not events:
+                    await asyncio.sleep(0.01)
+                # Django cancels the response task when the client disconnects
+                task.cancel()
+                with self.assertRaises(asyncio.CancelledError):
+                    await task
+                _, slots = gateway._async_client()
+                return events, upstream.closed, slots.locked()
+
+            events, closed, slot_held = asyncio.run(disconnect_after_first_token())
+
+        self.assertEqual(events, [{'event': 'token', 'text': 'First token'}])
+        self.assertTrue(closed)
+        # The concurrency slot was released with it
+        self.assertFalse(slot_held)
+
+    @patch('core.views.llm_gateway')
+    def test_errors_after_headers_are_sent_as_events(self, gateway):
+        async def failing_stream(prompt):
+            raise LLMTimeout('Model call deadline passed')
+            yield
+
+        gateway.available = True
+        gateway.astream.side_effect = failing_stream
+        response = self.post('/api/ai_topic_explainer/', {'topic_name': 'Arrays', 'stream': 'true'})
+        events = self.collect(response)
+        self.assertEqual(events[-1]['event'], 'error')
+
+    @patch('core.views.llm_gateway')
+    def test_wsgi_requests_get_the_events_in_one_response(self, gateway):
+        async def tokens(prompt):
+            yield 'Hel'
+            yield 'lo'
+
+        gateway.available = True
+        gateway.astream.side_effect = tokens
+        response = self.client.post('/api/ai_chatbot/', {'message': 'Hi', 'stream': True}, format='json')
+
+        self.assertFalse(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        events = asyncio.run(read_sse_events(response, []))
+        self.assertEqual([event['event'] for event in events], ['token', 'token', 'done'])
+
+
+ARRAYS = {'topic_name': 'Arrays', 'topic_description': 'Contiguous storage', 'skill_context': 'DSA', 'user_level': 'intermediate'}
+
+
+class ExplanationCacheTests(TestCase):
+    def setUp(self):
+        self.cache = ExplanationCache()
+
+    def test_key_normalizes_inputs_and_is_namespaced(self):
+        variant = {**ARRAYS, 'topic_name': '  ARRAYS? ', 'skill_context': 'dsa'}
+        self.assertEqual(self.cache.key(variant), self.cache.key(ARRAYS))
+        self.assertNotEqual(self.cache.key({**ARRAYS, 'user_level': 'beginner'}), self.cache.key(ARRAYS))
+        key = self.cache.key(ARRAYS)
+        with self.settings(LLM_MODEL='another-model'):
+            self.assertNotEqual(self.cache.key(ARRAYS), key)
+
+    def test_miss_then_hit(self):
+        generate = lambda: 'Arrays store elements contiguously.'
+        self.assertEqual(self.cache.get_or_generate(ARRAYS, generate), ('Arrays store elements contiguously.', False))
+        self.assertEqual(
+            self.cache.get_or_generate({**ARRAYS, 'topic_name': 'arrays'}, lambda: self.fail('not cached')),
+            ('Arrays store elements contiguously.', True)
+        )
+        self.assertEqual(TopicExplanation.objects.get().hits, 1)
+        self.assertEqual(self.cache.stats(), {'misses': 1, 'hits': 1, 'evictions': 0, 'hit_ratio': 0.5})
+
+    def test_expired_and_other_namespace_entries_are_not_served(self):
+        self.cache.get_or_generate(ARRAYS, lambda: 'old')
+        TopicExplanation.objects.update(created_at=timezone.now() - timedelta(days=60))
+        self.assertIsNone(self.cache.get(ARRAYS))
+
+        self.cache.get_or_generate(ARRAYS, lambda: 'new')
+        with self.settings(TOPIC_EXPLANATION_PROMPT_VERSION=2):
+            self.assertIsNone(self.cache.get(ARRAYS))
+            self.cache.get_or_generate(ARRAYS, lambda: 'newer')
+            # Storing under the new prompt version evicted the old entry
+            self.assertEqual(list(TopicExplanation.objects.values_list('explanation', flat=True)), ['newer'])
+
+    def test_least_recently_used_entries_are_evicted_over_the_limits(self):
+        with self.settings(TOPIC_EXPLANATION_CACHE_MAX_ENTRIES=2):
+            for name in ('Arrays', 'Graphs', 'Trees'):
+                self.cache.get_or_generate({**ARRAYS, 'topic_name': name}, lambda: f'About {name}')
+                if name == 'Graphs':
+                    # Touch Arrays, so Graphs is the least recently used
+                    self.cache.get(ARRAYS)
+        self.assertEqual(sorted(TopicExplanation.objects.values_list('topic_name', flat=True)), ['arrays', 'trees'])
+
+        with self.settings(TOPIC_EXPLANATION_CACHE_MAX_BYTES=15):
+            self.cache.get_or_generate({**ARRAYS, 'topic_name': 'Heaps'}, lambda: 'About Heaps')
+        self.assertEqual(list(TopicExplanation.objects.values_list('topic_name', flat=True)), ['heaps'])
+
+        with self.settings(TOPIC_EXPLANATION_CACHE_MAX_ENTRY_BYTES=5):
+            self.cache.get_or_generate({**ARRAYS, 'topic_name': 'Tries'}, lambda: 'Too long to keep')
+        self.assertFalse(TopicExplanation.objects.filter(topic_name='tries').exists())
+        self.assertEqual(self.cache.stats()['evictions'], 3)
+
+
+class ExplanationSingleFlightTests(TransactionTestCase):
+    def test_concurrent_misses_share_one_upstream_call(self):
+        cache = ExplanationCache()
+        release = threading.Event()
+        calls = []
+
+        def generate():
+            calls.append(1)
+            release.wait(5)
+            return 'Binary search halves the range.'
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(cache.get_or_generate(ARRAYS, generate)))
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        # Followers count as coalesced only once they have the result; give them time to join the call
+        while not calls:
+            time.sleep(0.01)
+        time.sleep(0.1)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual({explanation for explanation, _ in results}, {'Binary search halves the range.'})
+        self.assertEqual(cache.stats()['coalesced'], 4)
+        self.assertEqual(TopicExplanation.objects.count(), 1)
+
+
+    async def test_concurrent_streaming_misses_share_one_upstream_call(self):
+        cache = ExplanationCache()
+        release = asyncio.Event()
+        calls = []
+
+        async def upstream():
+            calls.append(1)
+            await release.wait()
+            yield 'Binary search '
+            yield 'halves the range.'
+
+        async def consume():
+            return ''.join([text async for text in cache.stream(ARRAYS, upstream())])
+
+        streams = [asyncio.create_task(consume()) for _ in range(2)]
+        while cache.stats().get('coalesced', 0) < 1:
+            await asyncio.sleep(0.01)
+        release.set()
+
+        self.assertEqual(await asyncio.gather(*streams), ['Binary search halves the range.'] * 2)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual((cache.stats()['misses'], cache.stats()['coalesced']), (1, 1))
+        self.assertEqual(await TopicExplanation.objects.acount(), 1)
+
+    async def test_followers_of_an_abandoned_stream_get_an_error(self):
+        cache = ExplanationCache()
+
+        async def upstream():
+            yield 'Binary search '
+            await asyncio.sleep(5)
+
+        leader = cache.stream(ARRAYS, upstream())
+        self.assertEqual(await anext(leader), 'Binary search ')
+        follower = asyncio.create_task(anext(cache.stream(ARRAYS, upstream())))
+        while cache.stats().get('coalesced', 0) < 1:
+            await asyncio.sleep(0.01)
+        await leader.aclose()
+        with self.assertRaises(LLMError):
+            await follower
+        self.assertFalse(await TopicExplanation.objects.aexists())
+
+
+class TopicExplainerCacheViewTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user(username='learner'))
+        self.cache = ExplanationCache()
+        patcher = patch('core.views.topic_explanation_cache', self.cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @patch('core.views.llm_gateway')
+    def test_repeated_topics_are_answered_from_the_cache(self, gateway):
+        gateway.available = True
+        gateway.generate.return_value = 'Arrays store elements contiguously.'
+        first = self.client.post('/api/ai_topic_explainer/', ARRAYS, format='json')
+        second = self.client.post('/api/ai_topic_explainer/', {**ARRAYS, 'topic_name': 'arrays '}, format='json')
+
+        self.assertFalse(first.data['cached'])
+        self.assertTrue(second.data['cached'])
+        self.assertEqual(second.data['explanation'], 'Arrays store elements contiguously.')
+        self.assertEqual(gateway.generate.call_count, 1)
+
+        streamed = self.client.post('/api/ai_topic_explainer/', {**ARRAYS, 'stream': True}, format='json')
+        body = asyncio.run(read_sse_events(streamed, []))
+        self.assertEqual(body[0], {'event': 'token', 'text': 'Arrays store elements contiguously.'})
+        self.assertTrue(body[-1]['cached'])
+        gateway.astream.assert_not_called()
+
+
+GEMINI_PLAN = json.dumps({
+    'summary': 'Backend plan',
+    'time_estimation': {'total_weeks': 8, 'breakdown': 'Basics then APIs'},
+    'roadmap': [{'phase': 'Foundation', 'duration_weeks': 4, 'skills': [{
+        'name': 'Python', 'priority': 'high',
+        'topics': [{'name': 'Generators', 'description': 'yield', 'estimated_hours': 3},
+                   {'name': 'Decorators', 'description': 'wrapping', 'estimated_hours': 2}],
+    }]}],
+})
+
+
+class PlanTemplateCacheTests(TestCase):
+    def setUp(self):
+        self.cache = PlanTemplateCache()
+        patcher = patch('core.views.plan_template_cache', self.cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def generate_plan(self, username, **inputs):
+        client = APIClient()
+        client.force_authenticate(User.objects.get_or_create(username=username)[0])
+        with patch('builtins.print'):
+            response = client.post('/api/generate_prep_plan/', {
+                'preferred_role': 'Backend Developer', 'academic_course_details': 'B.Tech CSE, DBMS', **inputs,
+            }, format='json')
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    @patch('core.views.llm_gateway')
+    def test_identical_inputs_share_one_generation_but_get_their_own_plans(self, gateway):
+        gateway.available = True
+        gateway.generate.return_value = GEMINI_PLAN
+        first = self.generate_plan('student_a')
+        second = self.generate_plan('student_b', preferred_role='backend developer ', academic_course_details='b.tech  cse, dbms')
+
+        self.assertEqual(gateway.generate.call_count, 1)
+        self.assertEqual(self.cache.stats()['hits'], 1)
+        self.assertNotEqual(first['plan_id'], second['plan_id'])
+        self.assertEqual(second['summary'], 'Backend plan')
+        plan = UserPreparationPlan.objects.get(pk=second['plan_id'])
+        self.assertEqual(plan.user.username, 'student_b')
+        self.assertEqual(plan.total_topics, 2)
+        self.assertEqual(plan.topic_progress.count(), 2)
+        self.assertEqual(PlanTemplate.objects.get().hits, 1)
+
+    @patch('core.views.llm_gateway')
+    def test_prompt_changes_invalidate_templates(self, gateway):
+        gateway.available = True
+        gateway.generate.return_value = GEMINI_PLAN
+        self.generate_plan('student_a')
+        original = PersonalizedPrepPlanView._create_gemini_prompt
+
+        with patch.object(PersonalizedPrepPlanView, '_create_gemini_prompt',
+                          lambda view, *args: original(view, *args) + 'Include mock interviews.'):
+            self.generate_plan('student_b')
+
+        self.assertEqual(gateway.generate.call_count, 2)
+        # The template of the old prompt was evicted
+        self.assertEqual(PlanTemplate.objects.count(), 1)
+
+    @patch('core.views.llm_gateway')
+    def test_unparseable_plans_fall_back_and_are_not_cached(self, gateway):
+        gateway.available = True
+        gateway.generate.return_value = 'Sorry, I cannot help with that.'
+        plan = self.generate_plan('student_a')
+        self.assertIn('plan_id', plan)
+        self.assertFalse(PlanTemplate.objects.exists())
+
+    def test_least_recently_used_templates_are_evicted(self):
+        with self.settings(PREP_PLAN_TEMPLATE_MAX_ENTRIES=2):
+            for role in ('Backend', 'Frontend', 'Data'):
+                self.cache.get_or_generate({'preferred_role': role}, lambda: {'summary': role}, prompt_version='p1')
+        self.assertEqual(sorted(PlanTemplate.objects.values_list('preferred_role', flat=True)), ['data', 'frontend'])
+        self.assertEqual(self.cache.invalidate(), 2)
+
+
+@override_settings(JOBS_EMBEDDED_WORKERS=0)
+class BackgroundJobTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='student', password='pw')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def enqueue_plan(self):
+        response = self.client.post('/api/generate_prep_plan/?background=true', {
+            'preferred_role': 'Backend Developer', 'academic_course_details': 'B.Tech CSE',
+        }, format='json')
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data['status'], Job.QUEUED)
+        return response.data
+
+    @patch('core.views.plan_template_cache', PlanTemplateCache())
+    @patch('core.views.llm_gateway')
+    def test_queued_plan_is_generated_by_a_worker(self, gateway):
+        gateway.available = True
+        gateway.generate.return_value = GEMINI_PLAN
+        job = self.enqueue_plan()
+        gateway.generate.assert_not_called()
+        self.assertEqual(self.client.get(job['result_url']).status_code, 202)
+
+        with patch('builtins.print'):
+            self.assertTrue(JobWorker().run_once())
+        self.assertFalse(JobWorker().run_once())
+
+        status_response = self.client.get(job['status_url'])
+        self.assertEqual((status_response.data['status'], status_response.data['attempts']), (Job.SUCCEEDED, 1))
+        result = self.client.get(job['result_url'])
+        self.assertEqual(result.status_code, 200)
+        self.assertEqual(result.data['summary'], 'Backend plan')
+        self.assertEqual(UserPreparationPlan.objects.get(pk=result.data['plan_id']).user, self.user)
+
+        other = APIClient()
+        other.force_authenticate(User.objects.create_user(username='other', password='pw'))
+        self.assertEqual(other.get(job['result_url']).status_code, 404)
+
+    def test_invalid_requests_are_rejected_before_queueing(self):
+        response = self.client.post('/api/generate_mock_interview/?background=true', {}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Job.objects.exists())
+
+    def test_failed_jobs_report_their_error(self):
+        job = Job.objects.create(user=self.user, kind='answer_evaluation', payload={})
+        with self.assertLogs('core.jobs', 'ERROR'):
+            JobWorker().run_once()
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        response = self.client.get(f'/api/jobs/{job.pk}/result/')
+        self.assertEqual(response.status_code, 500)
+        self.assertIn('company_name', response.data['error'])
+
+    def test_jobs_of_dead_workers_are_requeued_then_failed(self):
+        job = Job.objects.create(
+            user=self.user, kind='prep_plan', payload={}, status=Job.RUNNING, attempts=1,
+            locked_until=timezone.now() - timedelta(seconds=1),
+        )
+        worker = JobWorker(max_attempts=2)
+        worker.requeue_expired()
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.QUEUED)
+
+        Job.objects.filter(pk=job.pk).update(status=Job.RUNNING, attempts=2, locked_until=timezone.now() - timedelta(seconds=1))
+        worker.requeue_expired()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.error), (Job.FAILED, 'The worker running this job stopped'))
+
+
+@override_settings(JOBS_EMBEDDED_WORKERS=0)
+class BackgroundJobPushTests(TransactionTestCase):
+    def connect(self, path, user=None):
+        return InProcessWebSocket(URLRouter(websocket_urlpatterns), path, scope={'user': user or AnonymousUser()})
+
+    async def test_job_updates_are_pushed_to_the_owner(self):
+        user = await User.objects.acreate(username='student')
+        socket = self.connect('/ws/jobs/', user)
+        self.assertTrue((await socket.connect())[0])
+        job = await Job.objects.acreate(user=user, kind='mock_interview', payload={
+            'company_name': 'Acme', 'job_description': 'Python developer', 'num_questions': 2,
+            'base_url': 'http://testserver/',
+        })
+
+        with patch('core.views.llm_gateway') as gateway, patch('builtins.print'):
+            gateway.available = False
+            # As an embedded worker thread would
+            await asyncio.to_thread(JobWorker().run_once)
+
+        running = await socket.receive_json_from()
+        self.assertEqual((running['type'], running['job_id'], running['status']), ('job_update', job.pk, Job.RUNNING))
+        finished = await socket.receive_json_from()
+        self.assertEqual(finished['status'], Job.SUCCEEDED)
+        self.assertEqual(finished['result_url'], f'/api/jobs/{job.pk}/result/')
+        await socket.disconnect()
+
+    async def test_sockets_authenticate_with_a_jwt(self):
+        user = await User.objects.acreate(username='student')
+        anonymous = self.connect('/ws/jobs/')
+        self.assertFalse((await anonymous.connect())[0])
+
+        token = AccessToken.for_user(user)
+        socket = self.connect(f'/ws/jobs/?token={token}')
+        self.assertTrue((await socket.connect())[0])
+        await socket.disconnect()
+
+
+class PrepPlanPersistenceTests(TestCase):
+    def plan_with_topics(self, count):
+        return {'sections': [
+            {'skill': f'Skill {section}', 'topics': [
+                {'name': f'Topic {topic}', 'description': 'Learn it', 'estimated_hours': 2} for topic in range(count // 6)
+            ]}
+            for section in range(6)
+        ]}
+
+    def save_plan(self, plan_details):
+        user, _ = User.objects.get_or_create(username='student')
+        with CaptureQueriesContext(connection) as queries:
+            plan = PersonalizedPrepPlanView()._save_plan_to_database(
+                plan_details, 'Backend Developer', '', 'B.Tech CSE', 'My plan', user
+            )
+        return plan, len(queries)
+
+    def test_plan_creation_takes_a_constant_number_of_queries(self):
+        _, small = self.save_plan(self.plan_with_topics(6))
+        plan, large = self.save_plan(self.plan_with_topics(60))
+        # Savepoint, plan insert, one bulk insert of the topics, release
+        self.assertLessEqual(large, 4)
+        self.assertEqual(small, large)
+        self.assertEqual((plan.total_topics, plan.completed_topics, plan.progress_percentage), (60, 0, 0.0))
+        self.assertEqual(plan.topic_progress.count(), 60)
+        self.assertEqual(plan.topic_progress.filter(estimated_hours=2.0).count(), 60)
+
+    def test_repeated_topics_are_tracked_once(self):
+        plan_details = {'sections': [{'skill': 'SQL', 'topics': [{'name': 'Joins'}, {'name': 'Joins'}, {'name': 'Indexes'}]}]}
+        plan, _ = self.save_plan(plan_details)
+        self.assertEqual(plan.total_topics, 2)
+        self.assertEqual(sorted(plan.topic_progress.values_list('topic_name', flat=True)), ['Indexes', 'Joins'])
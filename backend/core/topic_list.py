@@ -0,0 +1,91 @@
+"""
+Live updates for the discussion topic lists.
+
+DiscussionListConsumer sockets join the list group of one category
+(?category=<id>), or the group of the whole list. When a topic is created,
+gets new posts (REST or chat write-behind), is pinned, locked or unlocked,
+or has its buffered views flushed, the change is published to the groups of
+the topic's lists once the write commits:
+
+* a ``new_topic`` frame carrying the full list row, for new topics
+* a ``topic_updated`` delta with the topic id, post_count and only the list
+  fields that changed
+
+The frames of one write are sent to each group as a single event.
+"""
+from collections import defaultdict
+
+from channels.layers import get_channel_layer
+from django.db import transaction
+
+from .channel_groups import send_from_sync
+from .models import DiscussionTopic
+from .serializers import DiscussionTopicListSerializer
+from .wire import encode_frames
+
+ALL_TOPICS_GROUP = 'discussion_list'
+# List fields that change when posts are added to a topic
+POST_ACTIVITY_FIELDS = ('post_count', 'last_post', 'last_activity')
+
+
+def list_group_name(category_id=None):
+    return ALL_TOPICS_GROUP if category_id is None else f'{ALL_TOPICS_GROUP}_{category_id}'
+
+
+def list_group_names(category_id):
+    """The groups of every list a topic in the category appears in"""
+    if category_id is None:
+        return [ALL_TOPICS_GROUP]
+    return [ALL_TOPICS_GROUP, list_group_name(category_id)]
+
+
+def publish_new_topic(topic_id):
+    transaction.on_commit(lambda: send_topic_list_frames([topic_id]), robust=True)
+
+
+def publish_topic_changes(topic_ids, fields):
+    """Publish deltas of the given list fields for the topics once the current transaction commits"""
+    topic_ids = list(topic_ids)
+    transaction.on_commit(lambda: send_topic_list_frames(topic_ids, fields), robust=True)
+
+
+def topic_list_frames(topic_ids, fields=None):
+    """
+    Client frames for the topics by list group: a new_topic frame per topic
+    when `fields` is None, else a topic_updated delta of those fields.
+    Inactive topics are not listed, so nothing is sent for them.
+    """
+    topics = DiscussionTopic.objects.filter(pk__in=topic_ids, is_active=True).select_related(
+        'category', 'related_skill', 'related_company'
+    )
+    frames_by_group = defaultdict(list)
+    for topic in topics:
+        row = DiscussionTopicListSerializer(topic).data
+        if fields is None:
+            frame = {'type': 'new_topic', 'topic': row}
+        else:
+            frame = {
+                'type': 'topic_updated',
+                'topic_id': topic.pk,
+                'post_count': topic.post_count,
+                'changes': {field: row[field] for field in fields},
+            }
+        frames = encode_frames(frame)
+        for group in list_group_names(topic.category_id):
+            frames_by_group[group].append(frames)
+    return frames_by_group
+
+
+def send_topic_list_frames(topic_ids, fields=None):
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    frames_by_group = topic_list_frames(topic_ids, fields)
+    if frames_by_group:
+        # Also called from the view count flush timer thread
+        send_from_sync(_group_send_all, channel_layer, frames_by_group)
+
+
+async def _group_send_all(channel_layer, frames_by_group):
+    for group, frames in frames_by_group.items():
+        await channel_layer.group_send(group, {'type': 'topic_list_frames', 'frames': frames})
@@ -0,0 +1,90 @@
+"""
+Per-process cache of the discussion topic state that the WebSocket path
+needs (does the topic exist, is it active, is it locked).
+
+DiscussionConsumer loads a topic's state once, when the first socket in the
+process joins its room, and checks posts against the cache. An entry is kept
+only while the process has sockets in the room, because only then does it
+receive the topic_state_changed messages that model signals publish to the
+room's groups when a topic is locked, unlocked, (de)activated or deleted.
+"""
+from dataclasses import asdict, dataclass
+
+from channels.db import database_sync_to_async
+from channels.layers import get_channel_layer
+
+from .channel_groups import group_send_discussion, send_from_sync
+from .models import DiscussionTopic
+from .wire import encode_frames
+
+
+@dataclass(frozen=True)
+class TopicState:
+    exists: bool
+    is_active: bool = False
+    is_locked: bool = False
+
+    @classmethod
+    def of(cls, topic):
+        return cls(exists=True, is_active=topic.is_active, is_locked=topic.is_locked)
+
+    def rejection(self):
+        """Why posts to the topic are refused, as (error code, message), or None if they are allowed"""
+        if not self.exists or not self.is_active:
+            return 'topic_unavailable', 'This discussion is no longer available.'
+        if self.is_locked:
+            return 'topic_locked', 'This discussion is locked. New messages are not allowed.'
+        return None
+
+
+def load_topic_state(topic_id):
+    topic = DiscussionTopic.objects.filter(pk=topic_id).only('is_active', 'is_locked').first()
+    return TopicState.of(topic) if topic else TopicState(exists=False)
+
+
+class TopicStateCache:
+    """Topic states for the rooms this process has sockets in"""
+
+    def __init__(self):
+        self._states = {}
+        self._sockets = {}
+
+    async def attach(self, topic_id):
+        """Register a socket in the room, loading the topic state if it is not cached"""
+        self._sockets[topic_id] = self._sockets.get(topic_id, 0) + 1
+        if topic_id not in self._states:
+            state = await database_sync_to_async(load_topic_state)(topic_id)
+            # A state change may have arrived while we were loading
+            self._states.setdefault(topic_id, state)
+        return self._states[topic_id]
+
+    def detach(self, topic_id):
+        remaining = self._sockets.get(topic_id, 0) - 1
+        if remaining > 0:
+            self._sockets[topic_id] = remaining
+        else:
+            self._sockets.pop(topic_id, None)
+            self._states.pop(topic_id, None)
+
+    def get(self, topic_id):
+        return self._states.get(topic_id)
+
+    def update(self, topic_id, state):
+        if topic_id in self._sockets:
+            self._states[topic_id] = state
+
+
+topic_state_cache = TopicStateCache()
+
+
+def publish_topic_state(topic_id, state):
+    """Tell every process with sockets in the topic's room about its new state"""
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    send_from_sync(group_send_discussion, channel_layer, topic_id, {
+        'type': 'topic_state_changed',
+        'topic_id': topic_id,
+        'state': asdict(state),
+        **encode_frames({'type': 'topic_state', 'topic_id': topic_id, **asdict(state)}),
+    })
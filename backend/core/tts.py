@@ -0,0 +1,135 @@
+"""
+Text-to-speech for the mock interview questions.
+
+Questions are synthesized with one shared ElevenLabs client, several at a
+time (TTS_MAX_CONCURRENCY). The audio is stored on disk under TTS_CACHE_DIR,
+named by the SHA-256 of everything that determines the output: the text,
+voice, model, output format and voice settings. The same question is
+therefore synthesized once, and responses carry a short URL to the file
+(see TTSAudioView) instead of the base64-encoded MP3. Cache hits refresh a
+file's modification time. Beyond TTS_CACHE_MAX_BYTES, the least recently
+used files are evicted.
+"""
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from django.conf import settings
+from elevenlabs import ElevenLabs
+
+AUDIO_KEY_RE = re.compile(r'^[0-9a-f]{64}$')
+
+
+class SpeechSynthesizer:
+    def __init__(self, client=None, cache_dir=None):
+        # Tests pass a fake client and a temporary directory
+        self._client = client
+        self._cache_dir = cache_dir
+        self._lock = threading.Lock()
+        self._evict_lock = threading.Lock()
+
+    @property
+    def api_key(self):
+        return getattr(settings, 'ELEVENLABS_API_KEY', '')
+
+    @property
+    def available(self):
+        return self._client is not None or bool(self.api_key)
+
+    @property
+    def cache_dir(self):
+        if self._cache_dir is not None:
+            return Path(self._cache_dir)
+        return Path(getattr(settings, 'TTS_CACHE_DIR', settings.BASE_DIR / 'tts_cache'))
+
+    @property
+    def options(self):
+        """The synthesis options, all of which are part of the audio key"""
+        return {
+            'voice_id': getattr(settings, 'TTS_VOICE_ID', 'JBFqnCBsd6RMkjVDRZzb'),
+            'model_id': getattr(settings, 'TTS_MODEL_ID', 'eleven_multilingual_v2'),
+            'output_format': getattr(settings, 'TTS_OUTPUT_FORMAT', 'mp3_44100_128'),
+            'voice_settings': getattr(settings, 'TTS_VOICE_SETTINGS', {
+                'stability': 0.5,
+                'similarity_boost': 0.75,
+                'style': 0.2,
+                'use_speaker_boost': True,
+            }),
+        }
+
+    @property
+    def client(self):
+        with self._lock:
+            if self._client is None:
+                self._client = ElevenLabs(api_key=self.api_key, timeout=getattr(settings, 'TTS_TIMEOUT', 30.0))
+            return self._client
+
+    def audio_key(self, text):
+        material = json.dumps({'text': text, **self.options}, sort_keys=True)
+        return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+    def audio_path(self, key):
+        """Path of the cached audio for `key`; None for anything that is not an audio key"""
+        if not AUDIO_KEY_RE.match(key):
+            return None
+        return self.cache_dir / key[:2] / f'{key}.mp3'
+
+    def synthesize(self, text):
+        """Key of the audio for `text`, synthesizing it unless it is cached; None if synthesis fails"""
+        key = self.audio_key(text)
+        path = self.audio_path(key)
+        try:
+            # Marks the file as recently used for eviction
+            os.utime(path)
+            return key
+        except FileNotFoundError:
+            pass
+        try:
+            audio = b''.join(self.client.text_to_speech.convert(text=text, **self.options))
+        except Exception as e:
+            print(f"TTS generation error: {e}")
+            return None
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Write to a temporary file first so a concurrent reader never sees partial audio
+        fd, temp_path = tempfile.mkstemp(dir=path.parent, suffix='.part')
+        with os.fdopen(fd, 'wb') as audio_file:
+            audio_file.write(audio)
+        os.replace(temp_path, path)
+        self.evict()
+        return key
+
+    def evict(self):
+        """Delete the least recently used audio until the cache fits in TTS_CACHE_MAX_BYTES"""
+        max_bytes = getattr(settings, 'TTS_CACHE_MAX_BYTES', 500 * 1024 * 1024)
+        with self._evict_lock:
+            files = []
+            for path in self.cache_dir.glob('*/*.mp3'):
+                try:
+                    stat = path.stat()
+                except FileNotFoundError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, path))
+            total = sum(size for _, size, _ in files)
+            for _, size, path in sorted(files, key=lambda item: item[0]):
+                if total <= max_bytes:
+                    break
+                path.unlink(missing_ok=True)
+                total -= size
+
+    def synthesize_many(self, texts):
+        """Keys (or None) for the texts, in order; each distinct text is synthesized once"""
+        distinct = list(dict.fromkeys(texts))
+        if not distinct:
+            return []
+        workers = min(getattr(settings, 'TTS_MAX_CONCURRENCY', 4), len(distinct))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            keys = dict(zip(distinct, executor.map(self.synthesize, distinct)))
+        return [keys[text] for text in texts]
+
+
+speech_synthesizer = SpeechSynthesizer()
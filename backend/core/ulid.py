@@ -0,0 +1,23 @@
+"""
+ULID generation for discussion messages.
+
+A ULID is a 26-character, lexicographically sortable id: a 48-bit
+millisecond timestamp followed by 80 random bits, in Crockford base32.
+Chat messages get one before they are written, so they can be broadcast
+and acknowledged before the database assigns a primary key.
+"""
+import os
+import time
+
+CROCKFORD_ALPHABET = '0123456789ABCDEFGHJKMNPQRSTVWXYZ'
+
+
+def new_ulid(timestamp_ms=None):
+    if timestamp_ms is None:
+        timestamp_ms = time.time_ns() // 1_000_000
+    value = (timestamp_ms << 80) | int.from_bytes(os.urandom(10), 'big')
+    chars = []
+    for _ in range(26):
+        value, index = divmod(value, 32)
+        chars.append(CROCKFORD_ALPHABET[index])
+    return ''.join(reversed(chars))
@@ -2,7 +2,7 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from rest_framework_nested import routers
 from rest_framework_simplejwt.views import TokenRefreshView
-from .views import CompanyDriveViewSet, PersonalizedPrepPlanView, GenerateMockInterviewView, EvaluateInterviewAnswersView, ResumeCheckerAPIView, DiscussionTopicViewSet, DiscussionPostViewSet, ForumCategoryViewSet, UserPreparationPlansView, PreparationPlanDetailView, UpdateTopicProgressView, DeletePreparationPlanView, UserRegistrationView, UserLoginView, UserLogoutView, UserProfileView, AIChatbotView, AITopicExplainerView
+from .views import CompanyDriveViewSet, PersonalizedPrepPlanView, GenerateMockInterviewView, TTSAudioView, EvaluateInterviewAnswersView, ResumeCheckerAPIView, DiscussionTopicViewSet, DiscussionPostViewSet, ForumCategoryViewSet, UserPreparationPlansView, PreparationPlanDetailView, UpdateTopicProgressView, DeletePreparationPlanView, UserRegistrationView, UserLoginView, UserLogoutView, UserProfileView, AIChatbotView, AITopicExplainerView, RealtimeStatsView, JobStatusView, JobResultView
 
 router = DefaultRouter()
 router.register(r'companies', CompanyDriveViewSet) # This will create routes like /api/companies/
@@ -25,8 +25,12 @@ urlpatterns = [
     # App Feature URLs
     path('generate_prep_plan/', PersonalizedPrepPlanView.as_view(), name='generate-prep-plan'),
     path('generate_mock_interview/', GenerateMockInterviewView.as_view(), name='generate-mock-interview'),
+    path('tts_audio/<str:key>/', TTSAudioView.as_view(), name='tts-audio'),
     path('evaluate_interview_answers/', EvaluateInterviewAnswersView.as_view(), name='evaluate-interview-answers'),
     path('resume_checker/', ResumeCheckerAPIView.as_view(), name='resume-checker'),
+    # Background jobs of the AI views (background=true)
+    path('jobs/<str:job_id>/', JobStatusView.as_view(), name='job-status'),
+    path('jobs/<str:job_id>/result/', JobResultView.as_view(), name='job-result'),
     # Preparation Plan Management URLs
     path('user_plans/', UserPreparationPlansView.as_view(), name='user-preparation-plans'),
     path('plan/<int:plan_id>/', PreparationPlanDetailView.as_view(), name='preparation-plan-detail'),
@@ -35,5 +39,7 @@ urlpatterns = [
     # AI Chatbot
     path('ai_chatbot/', AIChatbotView.as_view(), name='ai-chatbot'),
     path('ai_topic_explainer/', AITopicExplainerView.as_view(), name='ai-topic-explainer'),
+    # Realtime (WebSocket) counters
+    path('realtime_stats/', RealtimeStatsView.as_view(), name='realtime-stats'),
     path('', include(topics_router.urls)), # Include nested URLs
 ]
\ No newline at end of file
@@ -0,0 +1,129 @@
+"""
+Buffered view counting for discussion topics.
+
+Topic views are collected in an in-process buffer and written to the
+database periodically as batched ``F()`` increments, instead of a
+read-modify-write UPDATE on every request. Each flush publishes the new
+view counts to open topic lists (core/topic_list.py).
+"""
+import atexit
+import logging
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import F
+
+from .models import DiscussionTopic
+from .topic_list import publish_topic_changes
+
+logger = logging.getLogger(__name__)
+
+
+class ViewCountBuffer:
+    """
+    Thread-safe buffer of pending topic view increments.
+
+    Pending views are flushed by a background timer, at most
+    ``flush_interval`` seconds after they are recorded, or right away once
+    more than ``max_pending`` topics are waiting.
+    """
+
+    def __init__(self, flush_interval=None, max_pending=None):
+        self._flush_interval = flush_interval
+        self._max_pending = max_pending
+        self._pending = defaultdict(int)
+        self._lock = threading.Lock()
+        self._timer = None
+        self._timer_immediate = False
+
+    @property
+    def flush_interval(self):
+        if self._flush_interval is not None:
+            return self._flush_interval
+        return getattr(settings, 'DISCUSSION_VIEW_COUNT_FLUSH_INTERVAL', 5.0)
+
+    @property
+    def max_pending(self):
+        if self._max_pending is not None:
+            return self._max_pending
+        return getattr(settings, 'DISCUSSION_VIEW_COUNT_MAX_PENDING', 1000)
+
+    def record(self, topic_id, count=1):
+        """Record views for a topic; the database is updated on the next flush"""
+        with self._lock:
+            self._pending[topic_id] += count
+            overflow = len(self._pending) > self.max_pending
+            if self._timer is None or (overflow and not self._timer_immediate):
+                # Overflow flushes run on the timer thread too, not on the reader's request
+                if self._timer is not None:
+                    self._timer.cancel()
+                self._timer = threading.Timer(0 if overflow else self.flush_interval, self._flush_from_timer)
+                self._timer.daemon = True
+                self._timer_immediate = overflow
+                self._timer.start()
+
+    def pending(self, topic_id):
+        """Number of views recorded for a topic but not yet flushed"""
+        with self._lock:
+            return self._pending.get(topic_id, 0)
+
+    def flush(self):
+        """
+        Write all pending views to the database. Topics with the same number
+        of pending views share one UPDATE statement.
+
+        Returns a dict of topic id -> flushed increment.
+        """
+        with self._lock:
+            pending, self._pending = dict(self._pending), defaultdict(int)
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        if not pending:
+            return {}
+
+        by_increment = defaultdict(list)
+        for topic_id, increment in pending.items():
+            by_increment[increment].append(topic_id)
+
+        try:
+            with transaction.atomic():
+                for increment, topic_ids in by_increment.items():
+                    DiscussionTopic.objects.filter(pk__in=topic_ids).update(
+                        view_count=F('view_count') + increment
+                    )
+                publish_topic_changes(pending, ('view_count',))
+        except Exception:
+            # Put the views back so they are retried on the next flush
+            logger.exception("Failed to flush topic view counts")
+            with self._lock:
+                for topic_id, increment in pending.items():
+                    self._pending[topic_id] += increment
+            raise
+        return pending
+
+    def _flush_from_timer(self):
+        with self._lock:
+            # A flush or an overflow may have replaced this timer already
+            if self._timer is threading.current_thread():
+                self._timer = None
+        try:
+            self.flush()
+        except Exception:
+            pass
+        finally:
+            # Timer threads are short-lived, so release their connections
+            connections.close_all()
+
+
+view_count_buffer = ViewCountBuffer()
+
+
+@atexit.register
+def _flush_at_exit():
+    try:
+        view_count_buffer.flush()
+    except Exception:
+        pass
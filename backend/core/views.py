@@ -1,16 +1,29 @@
 from rest_framework import viewsets
 from rest_framework import filters
 from rest_framework.decorators import permission_classes
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth.models import User
-from .models import Skill, LearningTopic, LearningResource, CompanyDrive, MockInterviewQuestion, DiscussionTopic, DiscussionPost, UserPreparationPlan, PlanProgress, ForumCategory
-from .serializers import CompanyDriveSerializer, PrepPlanInputSerializer, LearningResourceSerializer, MockInterviewQuestionSerializer, MockInterviewInputSerializer, MockInterviewResponseSerializer, AnswerEvaluationInputSerializer, AnswerFeedbackSerializer, DiscussionTopicSerializer, DiscussionTopicListSerializer, DiscussionPostSerializer, PlanProgressSerializer, UserPreparationPlanSerializer, PlanProgressDetailSerializer, UserRegistrationSerializer, UserLoginSerializer, UserSerializer, ForumCategorySerializer
+from .models import Skill, LearningTopic, LearningResource, CompanyDrive, MockInterviewQuestion, DiscussionTopic, DiscussionPost, UserPreparationPlan, PlanProgress, ForumCategory, Job
+from .serializers import CompanyDriveSerializer, PrepPlanInputSerializer, LearningResourceSerializer, MockInterviewQuestionSerializer, MockInterviewInputSerializer, MockInterviewResponseSerializer, AnswerEvaluationInputSerializer, AnswerFeedbackSerializer, DiscussionTopicSerializer, DiscussionTopicListSerializer, DiscussionPostSerializer, PlanProgressSerializer, UserPreparationPlanSerializer, PlanProgressDetailSerializer, UserRegistrationSerializer, UserLoginSerializer, UserSerializer, ForumCategorySerializer, JobSerializer
+from .view_counts import view_count_buffer
+from .pagination import PostKeysetPagination
+from .search import FullTextSearchFilter
+from .rate_limit import dropped_frame_counts
+from .llm import LLMTimeout, LLMUnavailable, llm_gateway
+from .sse import sse_response, text_chunks, wants_stream
+from .explanation_cache import topic_explanation_cache
+from .plan_templates import plan_template_cache, prompt_fingerprint
+from .tts import speech_synthesizer
+from .jobs import BackgroundJobMixin
 
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from django.shortcuts import get_object_or_404
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.db import transaction
 from django.db.models import Q # Used for complex lookups
 from django.conf import settings
 from django.utils import timezone
@@ -19,16 +32,14 @@ import re
 import io # To handle file in-memory
 import json
 import os
-import base64
 import requests
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin
 
 # Import libraries for file parsing
 from PyPDF2 import PdfReader # For PDF
 from docx import Document # For DOCX
-import google.generativeai as genai
 
-# Import ElevenLabs SDK
-from elevenlabs import ElevenLabs
 
 from rest_framework.views import APIView
 from rest_framework.response import Response
@@ -112,13 +123,15 @@ class CompanyDriveViewSet(viewsets.ModelViewSet):
     queryset = CompanyDrive.objects.all()
     serializer_class = CompanyDriveSerializer
     # Filters: Order by drive_date, search by role or domain
-    filter_backends = [filters.OrderingFilter, filters.SearchFilter]
+    filter_backends = [filters.OrderingFilter, FullTextSearchFilter]
     ordering_fields = ['drive_date'] # Allows ?ordering=drive_date or ?ordering=-drive_date
-    search_fields = ['role', 'domain', 'company_name'] # Allows ?search=Software+Engineer
+    search_fields = ['role', 'domain', 'company_name', 'location'] # Allows ?search=Software+Engineer; matches the 'drive' document
+    search_documents = ['drive'] # Ranked full-text search, see core/search.py
 
 
-class PersonalizedPrepPlanView(APIView):
+class PersonalizedPrepPlanView(BackgroundJobMixin, APIView):
     permission_classes = [IsAuthenticated]
+    job_kind = 'prep_plan'
     
     def post(self, request, *args, **kwargs):
         # Use the input serializer to validate request data
@@ -136,34 +149,44 @@ class PersonalizedPrepPlanView(APIView):
             target = preferred_role if preferred_role else "Job Application"
             plan_name = f"Plan for {target} - {timezone.now().strftime('%Y-%m-%d %H:%M')}"
 
+        # With background=true the plan is generated by a job worker, see core/jobs.py
+        return self.enqueue_or_run(request, {
+            'preferred_role': preferred_role,
+            'job_description': job_description,
+            'academic_details': academic_details,
+            'plan_name': plan_name,
+        })
+
+    def run_job(self, user, payload):
+        preferred_role = payload['preferred_role']
+        job_description = payload['job_description']
+        academic_details = payload['academic_details']
+        plan_name = payload['plan_name']
+
         # Check if Gemini API is available and configured
-        gemini_api_key = os.environ.get('GEMINI_API_KEY')
-        print("this is gemini api key", gemini_api_key)
-        
-        if gemini_api_key:
+        if llm_gateway.available:
             try:
-                return self._generate_with_gemini(preferred_role, job_description, academic_details, plan_name, request.user)
+                return self._generate_with_gemini(preferred_role, job_description, academic_details, plan_name, user)
             except Exception as e:
                 print(f"Gemini API error: {e}")
                 # Fall back to rule-based approach
-                return self._generate_fallback(preferred_role, job_description, academic_details, plan_name, request.user)
+                return self._generate_fallback(preferred_role, job_description, academic_details, plan_name, user)
         else:
             # Use fallback rule-based approach
-            return self._generate_fallback(preferred_role, job_description, academic_details, plan_name, request.user)
+            return self._generate_fallback(preferred_role, job_description, academic_details, plan_name, user)
 
     def _generate_with_gemini(self, preferred_role, job_description, academic_details, plan_name=None, user=None):
         """Generate preparation plan using Gemini API"""
-        genai.configure(api_key=os.environ.get('GEMINI_API_KEY'))
-        model = genai.GenerativeModel('gemini-2.0-flash')
-        
-        # Create prompt for Gemini
-        prompt = self._create_gemini_prompt(preferred_role, job_description, academic_details)
-        
-        response = model.generate_content(prompt)
-        gemini_response = response.text
-        
-        # Parse the Gemini response and structure it
-        plan_details = self._parse_gemini_response(gemini_response, preferred_role, job_description)
+        # Identical inputs share one generated plan template, see core/plan_templates.py
+        plan_details, _ = plan_template_cache.get_or_generate(
+            {
+                'preferred_role': preferred_role,
+                'job_description': job_description,
+                'academic_details': academic_details,
+            },
+            lambda: self._generate_plan_template(preferred_role, job_description, academic_details),
+            prompt_version=prompt_fingerprint(self._create_gemini_prompt),
+        )
         
         # Save plan to database
         saved_plan = self._save_plan_to_database(
@@ -176,6 +199,15 @@ class PersonalizedPrepPlanView(APIView):
         
         return Response(plan_details, status=status.HTTP_200_OK)
 
+    def _generate_plan_template(self, preferred_role, job_description, academic_details):
+        # Create prompt for Gemini
+        prompt = self._create_gemini_prompt(preferred_role, job_description, academic_details)
+        
+        gemini_response = llm_gateway.generate(prompt)
+        
+        # Parse the Gemini response and structure it
+        return self._parse_gemini_response(gemini_response)
+
     def _create_gemini_prompt(self, preferred_role, job_description, academic_details):
         """Create a structured prompt for Gemini API"""
         target_role = preferred_role if preferred_role else "the role described in the job description"
@@ -229,7 +261,7 @@ class PersonalizedPrepPlanView(APIView):
         
         return prompt
 
-    def _parse_gemini_response(self, gemini_response, preferred_role, job_description):
+    def _parse_gemini_response(self, gemini_response):
         """Parse Gemini's response and format it for frontend"""
         try:
             # Try to extract JSON from the response
@@ -276,8 +308,8 @@ class PersonalizedPrepPlanView(APIView):
         except Exception as e:
             print(f"Error parsing Gemini response: {e}")
             
-        # Fallback if parsing fails
-        return self._generate_fallback(preferred_role, job_description, "")
+        # The view falls back to the rule-based plan; nothing is cached
+        raise ValueError("Could not parse the Gemini plan")
 
     def _get_matching_resources(self, topic_name):
         """Get learning resources that match a topic name"""
@@ -424,46 +456,48 @@ class PersonalizedPrepPlanView(APIView):
         # Determine input type
         input_type = 'role' if preferred_role else 'job_description'
         
-        # Count total topics for progress tracking
-        total_topics = sum(len(section.get('topics', [])) for section in plan_details.get('sections', []))
-        
-        # Create the preparation plan
-        plan = UserPreparationPlan.objects.create(
-            user=user,
-            plan_name=plan_name,
-            academic_details=academic_details,
-            input_type=input_type,
-            preferred_role=preferred_role if preferred_role else None,
-            job_description=job_description if job_description else None,
-            plan_data=plan_details,
-            total_topics=total_topics,
-            completed_topics=0,
-            progress_percentage=0.0
-        )
-        
-        # Create progress entries for each topic
+        # Progress entries for each topic, built in memory. PlanProgress.save()
+        # recounts and resaves the plan, so the rows are bulk created instead and
+        # the plan starts with its final counts. A topic repeated within a section
+        # (unique per plan) is tracked once.
+        progress_entries = {}
         for section in plan_details.get('sections', []):
             skill_name = section.get('skill', '')
             for topic in section.get('topics', []):
                 topic_name = topic.get('name', '')
-                topic_description = topic.get('description', '')
                 estimated_hours = topic.get('estimated_hours', 0)
-                
-                # Create or get the progress record
-                PlanProgress.objects.create(
-                    plan=plan,
+                progress_entries.setdefault((skill_name, topic_name), PlanProgress(
                     section_name=skill_name,
                     topic_name=topic_name,
-                    topic_description=topic_description,
+                    topic_description=topic.get('description', ''),
                     is_completed=False,
                     estimated_hours=float(estimated_hours) if estimated_hours else None
-                )
+                ))
+        
+        with transaction.atomic():
+            # Create the preparation plan
+            plan = UserPreparationPlan.objects.create(
+                user=user,
+                plan_name=plan_name,
+                academic_details=academic_details,
+                input_type=input_type,
+                preferred_role=preferred_role if preferred_role else None,
+                job_description=job_description if job_description else None,
+                plan_data=plan_details,
+                total_topics=len(progress_entries),
+                completed_topics=0,
+                progress_percentage=0.0
+            )
+            for progress in progress_entries.values():
+                progress.plan = plan
+            PlanProgress.objects.bulk_create(progress_entries.values())
         
         return plan
 
 
-class GenerateMockInterviewView(APIView):
+class GenerateMockInterviewView(BackgroundJobMixin, APIView):
     permission_classes = [IsAuthenticated]
+    job_kind = 'mock_interview'
     
     def post(self, request, *args, **kwargs):
         # Validate input using serializer
@@ -471,14 +505,22 @@ class GenerateMockInterviewView(APIView):
         if not input_serializer.is_valid():
             return Response(input_serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-        company_name = input_serializer.validated_data['company_name']
-        job_description = input_serializer.validated_data['job_description']
-        num_questions = input_serializer.validated_data['num_questions']
+        return self.enqueue_or_run(request, {
+            'company_name': input_serializer.validated_data['company_name'],
+            'job_description': input_serializer.validated_data['job_description'],
+            'num_questions': input_serializer.validated_data['num_questions'],
+            # Audio URLs are absolute; a job worker has no request to build them from
+            'base_url': request.build_absolute_uri('/'),
+        })
+
+    def run_job(self, user, payload):
+        company_name = payload['company_name']
+        job_description = payload['job_description']
+        num_questions = payload['num_questions']
+        self.base_url = payload['base_url']
 
         # Check if Gemini API is available
-        gemini_api_key = os.environ.get('GEMINI_API_KEY')
-        
-        if gemini_api_key:
+        if llm_gateway.available:
             try:
                 return self._generate_with_gemini(company_name, job_description, num_questions)
             except Exception as e:
@@ -491,10 +533,6 @@ class GenerateMockInterviewView(APIView):
 
     def _generate_with_gemini(self, company_name, job_description, num_questions):
         """Generate interview questions using Gemini AI and convert to speech using ElevenLabs"""
-        # Configure Gemini
-        genai.configure(api_key=os.environ.get('GEMINI_API_KEY'))
-        model = genai.GenerativeModel('gemini-2.0-flash')
-
         # Create prompt for interview question generation
         prompt = f"""
         You are an experienced technical interviewer. Generate {num_questions} realistic mock interview questions for the following job posting at {company_name}.
@@ -529,8 +567,7 @@ class GenerateMockInterviewView(APIView):
 
         try:
             # Generate questions using Gemini
-            response = model.generate_content(prompt)
-            response_text = response.text.strip()
+            response_text = llm_gateway.generate(prompt).strip()
             
             # Clean and parse JSON response
             if response_text.startswith('```json'):
@@ -544,16 +581,13 @@ class GenerateMockInterviewView(APIView):
             if not questions:
                 raise ValueError("No questions generated")
 
-            # Generate TTS audio for each question
+            # Generate TTS audio for the questions concurrently; each question gets a URL to its cached audio
+            audio_urls = self._generate_tts_audio([question['question_text'] for question in questions])
             questions_with_audio = []
-            for question in questions:
+            for question, audio_url in zip(questions, audio_urls):
                 question_with_audio = question.copy()
-                
-                # Generate audio using ElevenLabs
-                audio_data = self._generate_tts_audio(question['question_text'])
-                if audio_data:
-                    question_with_audio['audio_data'] = audio_data
-                
+                if audio_url:
+                    question_with_audio['audio_url'] = audio_url
                 questions_with_audio.append(question_with_audio)
             
             return Response({
@@ -569,41 +603,15 @@ class GenerateMockInterviewView(APIView):
             print(f"Error in Gemini generation: {e}")
             return self._generate_fallback(company_name, job_description, num_questions)
 
-    def _generate_tts_audio(self, text):
-        """Generate audio using ElevenLabs TTS API with official SDK"""
-        try:
-            elevenlabs_api_key = os.environ.get('ELEVENLABS_API_KEY')
-            if not elevenlabs_api_key:
-                print("ElevenLabs API key not found")
-                return None
-
-            # Initialize ElevenLabs client
-            client = ElevenLabs(api_key=elevenlabs_api_key)
-            
-            # Generate audio using the official SDK
-            audio = client.text_to_speech.convert(
-                text=text,
-                voice_id="JBFqnCBsd6RMkjVDRZzb",  # George - Professional male voice
-                model_id="eleven_multilingual_v2",  # Better quality model
-                output_format="mp3_44100_128",
-                voice_settings={
-                    "stability": 0.5,
-                    "similarity_boost": 0.75,
-                    "style": 0.2,
-                    "use_speaker_boost": True
-                }
-            )
-            
-            # Convert the audio generator to bytes
-            audio_bytes = b"".join(audio)
-            
-            # Return base64 encoded audio data for frontend
-            audio_base64 = base64.b64encode(audio_bytes).decode('utf-8')
-            return audio_base64
-                
-        except Exception as e:
-            print(f"TTS generation error: {e}")
-            return None
+    def _generate_tts_audio(self, texts):
+        """Generate audio using ElevenLabs TTS; returns an audio URL (or None) per text"""
+        if not speech_synthesizer.available:
+            print("ElevenLabs API key not found")
+            return [None] * len(texts)
+        return [
+            urljoin(self.base_url, reverse('tts-audio', args=[key])) if key else None
+            for key in speech_synthesizer.synthesize_many(texts)
+        ]
 
     def _generate_fallback(self, company_name, job_description, num_questions):
         """Fallback method to generate questions when Gemini is not available"""
@@ -659,7 +667,81 @@ class GenerateMockInterviewView(APIView):
         }, status=status.HTTP_200_OK)
 
 
-class EvaluateInterviewAnswersView(APIView):
+class TTSAudioView(APIView):
+    """
+    Serves cached question audio by key, with support for single byte-range
+    requests so players can seek and stream. Audio elements cannot send the
+    JWT header; the key is a SHA-256 of the question text and TTS options.
+    """
+    authentication_classes = []
+    permission_classes = [AllowAny]
+
+    def get(self, request, key):
+        path = speech_synthesizer.audio_path(key)
+        if path is None or not path.exists():
+            return Response({"error": "Audio not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        etag = f'"{key}"'
+        if request.headers.get('If-None-Match') == etag:
+            return HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+
+        size = path.stat().st_size
+        byte_range = self._parse_range(request.headers.get('Range', ''), size)
+        if byte_range is False:
+            response = HttpResponse(status=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+
+        # The file is streamed in blocks, never read whole into the worker
+        if byte_range is None:
+            response = FileResponse(open(path, 'rb'), content_type='audio/mpeg')
+        else:
+            start, end = byte_range
+            response = StreamingHttpResponse(
+                self._read_range(path, start, end - start + 1), content_type='audio/mpeg',
+                status=status.HTTP_206_PARTIAL_CONTENT
+            )
+            response['Content-Length'] = end - start + 1
+            response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Accept-Ranges'] = 'bytes'
+        response['ETag'] = etag
+        # The content of a key never changes
+        response['Cache-Control'] = 'public, max-age=31536000, immutable'
+        return response
+
+    def _read_range(self, path, start, length, block_size=64 * 1024):
+        with open(path, 'rb') as audio_file:
+            audio_file.seek(start)
+            while length > 0:
+                block = audio_file.read(min(block_size, length))
+                if not block:
+                    return
+                length -= len(block)
+                yield block
+
+    def _parse_range(self, header, size):
+        """(start, end) of a single "bytes=" range, None to send the whole file, False if unsatisfiable"""
+        match = re.fullmatch(r'bytes=(\d*)-(\d*)', header.strip())
+        if not match or match.groups() == ('', ''):
+            # No range, or a form we do not serve partially (e.g. several ranges)
+            return None
+        start, end = match.groups()
+        if not start:
+            # Suffix range: the last N bytes
+            length = int(end)
+            if length == 0:
+                return False
+            return max(size - length, 0), size - 1
+        start = int(start)
+        end = min(int(end), size - 1) if end else size - 1
+        if start >= size or start > end:
+            return False
+        return start, end
+
+
+class EvaluateInterviewAnswersView(BackgroundJobMixin, APIView):
+    job_kind = 'answer_evaluation'
+
     def post(self, request, *args, **kwargs):
         # Debug logging
         print("=== EVALUATION REQUEST DEBUG ===")
@@ -681,10 +763,19 @@ class EvaluateInterviewAnswersView(APIView):
         print(f"Successfully parsed - Question answers count: {len(question_answers)}")
         print("=== END EVALUATION DEBUG ===\n")
 
+        return self.enqueue_or_run(request, {
+            'company_name': company_name,
+            'job_description': job_description,
+            'question_answers': question_answers,
+        })
+
+    def run_job(self, user, payload):
+        company_name = payload['company_name']
+        job_description = payload['job_description']
+        question_answers = payload['question_answers']
+
         # Check if Gemini API is available
-        gemini_api_key = os.environ.get('GEMINI_API_KEY')
-        
-        if gemini_api_key:
+        if llm_gateway.available:
             try:
                 return self._evaluate_with_gemini(company_name, job_description, question_answers)
             except Exception as e:
@@ -696,111 +787,27 @@ class EvaluateInterviewAnswersView(APIView):
             return self._evaluate_fallback(company_name, job_description, question_answers)
 
     def _evaluate_with_gemini(self, company_name, job_description, question_answers):
-        """Evaluate interview answers using Gemini AI"""
-        # Configure Gemini
-        genai.configure(api_key=os.environ.get('GEMINI_API_KEY'))
-        model = genai.GenerativeModel('gemini-2.0-flash')
+        """
+        Evaluate interview answers using Gemini AI. Answers are scored
+        concurrently (INTERVIEW_EVALUATION_CONCURRENCY at a time), or with a
+        single prompt for all of them when INTERVIEW_EVALUATION_BATCHED is set.
+        An answer whose call fails or passes INTERVIEW_EVALUATION_TIMEOUT gets
+        the fallback evaluation; the others keep their AI feedback.
+        """
+        answered = [qa for qa in question_answers if qa.get('user_answer', '').strip()]
+        if getattr(settings, 'INTERVIEW_EVALUATION_BATCHED', False):
+            results = self._evaluate_batch(company_name, job_description, answered)
+        else:
+            results = self._evaluate_concurrently(company_name, job_description, answered)
 
+        # Results come back in question order; empty answers are not sent to the model
+        results = iter(results)
         evaluations = []
-        
         for qa in question_answers:
-            question_text = qa.get('question_text', '')
-            user_answer = qa.get('user_answer', '')
-            difficulty_level = qa.get('difficulty_level', 'medium')
-            
-            if not user_answer.strip():
-                # Handle empty answers
-                evaluations.append({
-                    "question_text": question_text,
-                    "user_answer": "No answer provided",
-                    "score": 0,
-                    "strengths": [],
-                    "improvements": [
-                        "An answer was not provided for this question",
-                        "In a real interview, it's important to provide some response even if you're unsure"
-                    ],
-                    "suggestions": [
-                        "Practice thinking out loud and structuring your thoughts",
-                        "Even if unsure, explain your thought process",
-                        "Ask clarifying questions if needed"
-                    ],
-                    "overall_comment": "No response was provided. In interviews, it's better to give a thoughtful partial answer than no answer at all."
-                })
-                continue
-
-            # Create detailed evaluation prompt
-            prompt = f"""
-            You are an experienced technical interviewer evaluating a candidate's answer for a position at {company_name}.
-
-            Job Description Context:
-            {job_description}
-
-            Interview Question: {question_text}
-            Difficulty Level: {difficulty_level}
-            
-            Candidate's Answer: {user_answer}
-
-            Please evaluate this answer and provide detailed feedback in the following JSON format:
-            {{
-                "score": 8,
-                "strengths": [
-                    "Specific strength point 1",
-                    "Specific strength point 2"
-                ],
-                "improvements": [
-                    "Specific area for improvement 1",
-                    "Specific area for improvement 2"
-                ],
-                "suggestions": [
-                    "Actionable suggestion 1",
-                    "Actionable suggestion 2"
-                ],
-                "overall_comment": "A comprehensive comment about the answer quality, relevance, and interview performance"
-            }}
-
-            Evaluation Criteria:
-            1. Relevance to the question and job requirements
-            2. Technical accuracy (if applicable)
-            3. Communication clarity and structure
-            4. Use of specific examples or experiences
-            5. Demonstration of problem-solving skills
-            6. Cultural fit and soft skills demonstration
-            7. Overall professionalism and confidence
-
-            Score Range:
-            - 9-10: Exceptional answer, would strongly impress interviewers
-            - 7-8: Good answer with minor areas for improvement
-            - 5-6: Average answer, meets basic expectations
-            - 3-4: Below average, significant improvements needed
-            - 1-2: Poor answer, major concerns
-
-            Focus on constructive feedback that helps the candidate improve for future interviews.
-            """
-
-            try:
-                # Generate evaluation using Gemini
-                response = model.generate_content(prompt)
-                response_text = response.text.strip()
-                
-                # Clean and parse JSON response
-                if response_text.startswith('```json'):
-                    response_text = response_text[7:]
-                if response_text.endswith('```'):
-                    response_text = response_text[:-3]
-                
-                evaluation_data = json.loads(response_text.strip())
-                
-                # Add question and answer text to the evaluation
-                evaluation_data['question_text'] = question_text
-                evaluation_data['user_answer'] = user_answer
-                
-                evaluations.append(evaluation_data)
-                
-            except (json.JSONDecodeError, Exception) as e:
-                print(f"Error evaluating answer: {e}")
-                # Fallback evaluation for this specific answer
-                fallback_eval = self._create_fallback_evaluation(question_text, user_answer, difficulty_level)
-                evaluations.append(fallback_eval)
+            if qa.get('user_answer', '').strip():
+                evaluations.append(next(results))
+            else:
+                evaluations.append(self._empty_answer_evaluation(qa.get('question_text', '')))
 
         return Response({
             "company_name": company_name,
@@ -808,6 +815,163 @@ class EvaluateInterviewAnswersView(APIView):
             "overall_summary": self._generate_overall_summary(evaluations)
         }, status=status.HTTP_200_OK)
 
+    def _evaluate_concurrently(self, company_name, job_description, question_answers):
+        if not question_answers:
+            return []
+        workers = min(getattr(settings, 'INTERVIEW_EVALUATION_CONCURRENCY', 4), len(question_answers))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(
+                lambda qa: self._evaluate_answer(company_name, job_description, qa), question_answers
+            ))
+
+    def _evaluate_answer(self, company_name, job_description, qa):
+        answer = f"""
+        Interview Question: {qa.get('question_text', '')}
+        Difficulty Level: {qa.get('difficulty_level', 'medium')}
+        
+        Candidate's Answer: {qa.get('user_answer', '')}
+        """
+        prompt = self._evaluation_prompt(
+            company_name, job_description, answer,
+            "Please evaluate this answer and provide detailed feedback in the following JSON format:"
+        )
+        try:
+            # Generate evaluation using Gemini
+            response_text = llm_gateway.generate(prompt, timeout=self._evaluation_timeout())
+            return self._with_answer(self._parse_json_response(response_text), qa)
+        except Exception as e:
+            print(f"Error evaluating answer: {e}")
+            return self._answer_fallback(qa)
+
+    def _evaluate_batch(self, company_name, job_description, question_answers):
+        """Score every answer with one prompt; answers missing from the reply get the fallback"""
+        if not question_answers:
+            return []
+        answers = "\n".join(
+            f"""
+        Answer {number}:
+        Interview Question: {qa.get('question_text', '')}
+        Difficulty Level: {qa.get('difficulty_level', 'medium')}
+        Candidate's Answer: {qa.get('user_answer', '')}
+        """
+            for number, qa in enumerate(question_answers, 1)
+        )
+        prompt = self._evaluation_prompt(
+            company_name, job_description, answers,
+            f"""Please evaluate each of these {len(question_answers)} answers and return a JSON array with one object per answer,
+        in the same order, where each object has an "answer" field with the answer number and the following JSON format:"""
+        )
+        try:
+            response_text = llm_gateway.generate(prompt, timeout=self._evaluation_timeout())
+            by_number = {}
+            for number, item in enumerate(self._parse_json_response(response_text), 1):
+                if not isinstance(item, dict):
+                    continue
+                # Models sometimes number the answers as strings ("1")
+                try:
+                    by_number[int(item.get('answer', number))] = item
+                except (TypeError, ValueError):
+                    continue
+        except Exception as e:
+            print(f"Error evaluating answers: {e}")
+            by_number = {}
+
+        results = []
+        for number, qa in enumerate(question_answers, 1):
+            evaluation = by_number.get(number)
+            if evaluation is None or 'score' not in evaluation:
+                results.append(self._answer_fallback(qa))
+            else:
+                evaluation.pop('answer', None)
+                results.append(self._with_answer(evaluation, qa))
+        return results
+
+    def _evaluation_prompt(self, company_name, job_description, answers, instructions):
+        # Create detailed evaluation prompt
+        return f"""
+        You are an experienced technical interviewer evaluating a candidate's answers for a position at {company_name}.
+
+        Job Description Context:
+        {job_description}
+        {answers}
+        {instructions}
+        {{
+            "score": 8,
+            "strengths": [
+                "Specific strength point 1",
+                "Specific strength point 2"
+            ],
+            "improvements": [
+                "Specific area for improvement 1",
+                "Specific area for improvement 2"
+            ],
+            "suggestions": [
+                "Actionable suggestion 1",
+                "Actionable suggestion 2"
+            ],
+            "overall_comment": "A comprehensive comment about the answer quality, relevance, and interview performance"
+        }}
+
+        Evaluation Criteria:
+        1. Relevance to the question and job requirements
+        2. Technical accuracy (if applicable)
+        3. Communication clarity and structure
+        4. Use of specific examples or experiences
+        5. Demonstration of problem-solving skills
+        6. Cultural fit and soft skills demonstration
+        7. Overall professionalism and confidence
+
+        Score Range:
+        - 9-10: Exceptional answer, would strongly impress interviewers
+        - 7-8: Good answer with minor areas for improvement
+        - 5-6: Average answer, meets basic expectations
+        - 3-4: Below average, significant improvements needed
+        - 1-2: Poor answer, major concerns
+
+        Focus on constructive feedback that helps the candidate improve for future interviews.
+        """
+
+    def _evaluation_timeout(self):
+        return getattr(settings, 'INTERVIEW_EVALUATION_TIMEOUT', None)
+
+    def _parse_json_response(self, response_text):
+        # Clean and parse JSON response
+        response_text = response_text.strip()
+        if response_text.startswith('```json'):
+            response_text = response_text[7:]
+        if response_text.endswith('```'):
+            response_text = response_text[:-3]
+        return json.loads(response_text.strip())
+
+    def _with_answer(self, evaluation, qa):
+        # Add question and answer text to the evaluation
+        evaluation['question_text'] = qa.get('question_text', '')
+        evaluation['user_answer'] = qa.get('user_answer', '')
+        return evaluation
+
+    def _answer_fallback(self, qa):
+        return self._create_fallback_evaluation(
+            qa.get('question_text', ''), qa.get('user_answer', ''), qa.get('difficulty_level', 'medium')
+        )
+
+    def _empty_answer_evaluation(self, question_text):
+        return {
+            "question_text": question_text,
+            "user_answer": "No answer provided",
+            "score": 0,
+            "strengths": [],
+            "improvements": [
+                "An answer was not provided for this question",
+                "In a real interview, it's important to provide some response even if you're unsure"
+            ],
+            "suggestions": [
+                "Practice thinking out loud and structuring your thoughts",
+                "Even if unsure, explain your thought process",
+                "Ask clarifying questions if needed"
+            ],
+            "overall_comment": "No response was provided. In interviews, it's better to give a thoughtful partial answer than no answer at all."
+        }
+
     def _evaluate_fallback(self, company_name, job_description, question_answers):
         """Fallback evaluation when Gemini is not available"""
         evaluations = []
@@ -899,9 +1063,10 @@ class EvaluateInterviewAnswersView(APIView):
         }
 
 
-class ResumeCheckerAPIView(APIView):
+class ResumeCheckerAPIView(BackgroundJobMixin, APIView):
     # Explicitly set parsers to handle multipart and form data
     parser_classes = [MultiPartParser, FormParser, JSONParser]
+    job_kind = 'resume_analysis'
     
     def post(self, request, *args, **kwargs):
         # Handle both multipart form data and JSON
@@ -926,10 +1091,18 @@ class ResumeCheckerAPIView(APIView):
         if isinstance(resume_text, Response):  # Error response
             return resume_text
 
+        # The extracted text is queued, not the upload
+        return self.enqueue_or_run(request, {
+            'resume_text': resume_text,
+            'job_description_text': job_description_text,
+        })
+
+    def run_job(self, user, payload):
+        resume_text = payload['resume_text']
+        job_description_text = payload['job_description_text']
+
         # Check if Gemini API is available
-        gemini_api_key = os.environ.get('GEMINI_API_KEY')
-        
-        if gemini_api_key:
+        if llm_gateway.available:
             try:
                 return self._analyze_with_gemini(resume_text, job_description_text)
             except Exception as e:
@@ -1061,13 +1234,9 @@ class ResumeCheckerAPIView(APIView):
 
     def _analyze_with_gemini(self, resume_text, job_description_text):
         """Analyze resume using Gemini AI"""
-        genai.configure(api_key=os.environ.get('GEMINI_API_KEY'))
-        model = genai.GenerativeModel('gemini-2.0-flash')
-        
         prompt = self._create_resume_analysis_prompt(resume_text, job_description_text)
         
-        response = model.generate_content(prompt)
-        gemini_response = response.text
+        gemini_response = llm_gateway.generate(prompt)
         
         # Parse the Gemini response
         analysis_result = self._parse_gemini_analysis_response(gemini_response, resume_text)
@@ -1225,6 +1394,31 @@ class ResumeCheckerAPIView(APIView):
         return Response(response_data, status=status.HTTP_200_OK)
 
 
+# --- Background Job Views ---
+
+class JobStatusView(APIView):
+    """Status of one of the user's background jobs, see core/jobs.py"""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, job_id, *args, **kwargs):
+        job = get_object_or_404(Job, id=job_id, user=request.user)
+        return Response(JobSerializer(job).data, status=status.HTTP_200_OK)
+
+
+class JobResultView(APIView):
+    """The response of a finished job, as the view would have answered inline"""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, job_id, *args, **kwargs):
+        job = get_object_or_404(Job, id=job_id, user=request.user)
+        if job.status == Job.FAILED:
+            return Response({"error": job.error or "The job failed."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        if job.status != Job.SUCCEEDED:
+            # Not finished yet: the status, with 202 so clients keep polling
+            return Response(JobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+        return Response(job.result, status=job.result_status or status.HTTP_200_OK)
+
+
 # --- Preparation Plan Management Views ---
 
 class UserPreparationPlansView(APIView):
@@ -1396,7 +1590,7 @@ class ForumCategoryViewSet(viewsets.ModelViewSet):
     API endpoint for managing forum categories.
     Supports CRUD operations for forum categories and provides category statistics.
     """
-    queryset = ForumCategory.objects.filter(is_active=True)
+    queryset = ForumCategory.objects.filter(is_active=True).select_related('latest_topic')
     serializer_class = ForumCategorySerializer
     filter_backends = [filters.OrderingFilter]
     ordering_fields = ['order', 'name', 'created_at']
@@ -1425,10 +1619,11 @@ class DiscussionTopicViewSet(viewsets.ModelViewSet):
             return DiscussionTopicListSerializer # Use simpler serializer for list view
         return DiscussionTopicSerializer # Use detailed serializer for retrieve, create, update
 
-    filter_backends = [filters.OrderingFilter, filters.SearchFilter]
+    filter_backends = [filters.OrderingFilter, FullTextSearchFilter]
     ordering_fields = ['created_at', 'last_activity', 'title', 'view_count']
     ordering = ['-is_pinned', '-last_activity']  # Pinned topics first, then by activity
     search_fields = ['title', 'content', 'author_name', 'related_skill__name', 'related_company__company_name', 'category__name']
+    search_documents = ['topic', 'post'] # Topics also match on the content of their posts
     
     def get_permissions(self):
         """
@@ -1446,16 +1641,21 @@ class DiscussionTopicViewSet(viewsets.ModelViewSet):
         category_id = self.request.query_params.get('category', None)
         if category_id:
             queryset = queryset.filter(category_id=category_id)
+        if self.action == 'list':
+            # Post statistics are denormalized on the topic, so joining the
+            # related names lets the whole list render from a single query
+            queryset = queryset.select_related('category', 'related_skill', 'related_company')
         return queryset
     
     def retrieve(self, request, *args, **kwargs):
         """Override retrieve to increment view count"""
         instance = self.get_object()
-        # Increment view count
-        instance.view_count += 1
-        instance.save(update_fields=['view_count'])
+        # Buffer the view; it is written as a batched F() increment on the next flush
+        view_count_buffer.record(instance.pk)
         serializer = self.get_serializer(instance)
-        return Response(serializer.data)
+        data = serializer.data
+        data['view_count'] = instance.view_count + view_count_buffer.pending(instance.pk)
+        return Response(data)
     
     def perform_create(self, serializer):
         """Set author information when creating topic"""
@@ -1471,9 +1671,11 @@ class DiscussionTopicViewSet(viewsets.ModelViewSet):
 class DiscussionPostViewSet(viewsets.ModelViewSet):
     """
     API endpoint that allows discussion posts (replies) to be viewed or edited.
-    Posts are nested under topics.
+    Posts are nested under topics. The list is keyset-paginated newest page
+    first; pass the `before` cursor to load older posts.
     """
     serializer_class = DiscussionPostSerializer
+    pagination_class = PostKeysetPagination
 
     def get_permissions(self):
         """
@@ -1513,6 +1715,22 @@ class DiscussionPostViewSet(viewsets.ModelViewSet):
             serializer.save(topic=topic) # Save the post with the correct topic
 
 
+class RealtimeStatsView(APIView):
+    """
+    Staff-only counters of the process serving the request: dropped inbound
+    discussion WebSocket frames by reason and message type, and the hits and
+    misses of the topic explanation and plan template caches.
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response({
+            'dropped_frames': dropped_frame_counts(),
+            'topic_explanation_cache': topic_explanation_cache.stats(),
+            'plan_template_cache': plan_template_cache.stats(),
+        })
+
+
 class AIChatbotView(APIView):
     """API view for AI chatbot interactions"""
     
@@ -1527,19 +1745,31 @@ class AIChatbotView(APIView):
             )
         
         # Check if Gemini API is available
-        gemini_api_key = os.environ.get('GEMINI_API_KEY')
-        if not gemini_api_key:
+        if not llm_gateway.available:
             return Response(
                 {"error": "AI service is currently unavailable"},
                 status=status.HTTP_503_SERVICE_UNAVAILABLE
             )
         
+        if wants_stream(request):
+            return sse_response(request, llm_gateway.astream(self._build_prompt(message, user_id)))
+
         try:
             response_text = self._generate_response_with_gemini(message, user_id)
             return Response({
                 "response": response_text,
                 "timestamp": timezone.now().isoformat()
             }, status=status.HTTP_200_OK)
+        except LLMTimeout:
+            return Response(
+                {"error": "The AI service took too long to respond. Please try again."},
+                status=status.HTTP_504_GATEWAY_TIMEOUT
+            )
+        except LLMUnavailable:
+            return Response(
+                {"error": "AI service is busy. Please try again shortly."},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
         except Exception as e:
             print(f"Error generating AI response: {e}")
             return Response(
@@ -1549,14 +1779,14 @@ class AIChatbotView(APIView):
     
     def _generate_response_with_gemini(self, message, user_id=None):
         """Generate response using Gemini AI"""
-        genai.configure(api_key=os.environ.get('GEMINI_API_KEY'))
-        model = genai.GenerativeModel('gemini-2.0-flash')
-        
+        return llm_gateway.generate(self._build_prompt(message, user_id))
+
+    def _build_prompt(self, message, user_id=None):
         # Build context
         platform_context = self._get_platform_context()
         user_context = self._get_user_context(user_id) if user_id else ""
         
-        prompt = f"""You are an AI assistant for Connect & Conquer, a comprehensive career preparation platform. 
+        return f"""You are an AI assistant for Connect & Conquer, a comprehensive career preparation platform. 
 
 Platform Context:
 {platform_context}
@@ -1567,9 +1797,6 @@ User Question: {message}
 
 Please provide a helpful, accurate, and engaging response. Keep it conversational but informative. If the question is about platform features, explain them clearly. If it's about career advice, provide actionable guidance.
 """
-        
-        response = model.generate_content(prompt)
-        return response.text
     
     def _get_platform_context(self):
         """Get context about the platform's features"""
@@ -1630,22 +1857,51 @@ class AITopicExplainerView(APIView):
             )
         
         # Check if Gemini API is available
-        gemini_api_key = os.environ.get('GEMINI_API_KEY')
-        if not gemini_api_key:
+        if not llm_gateway.available:
             return Response(
                 {"error": "AI service is currently unavailable"},
                 status=status.HTTP_503_SERVICE_UNAVAILABLE
             )
         
+        # Explanations are cached by their normalized inputs, see core/explanation_cache.py
+        inputs = {
+            'topic_name': topic_name,
+            'topic_description': topic_description,
+            'skill_context': skill_context,
+            'user_level': user_level,
+        }
+
+        if wants_stream(request):
+            explanation = topic_explanation_cache.get(inputs)
+            if explanation is not None:
+                return sse_response(request, text_chunks(explanation), topic_name=topic_name, cached=True)
+            return sse_response(
+                request, topic_explanation_cache.stream(
+                    inputs, llm_gateway.astream(self._build_prompt(topic_name, topic_description, skill_context, user_level))
+                ),
+                topic_name=topic_name, cached=False
+            )
+
         try:
-            explanation = self._generate_topic_explanation(
-                topic_name, topic_description, skill_context, user_level
+            explanation, cached = topic_explanation_cache.get_or_generate(
+                inputs, lambda: self._generate_topic_explanation(topic_name, topic_description, skill_context, user_level)
             )
             return Response({
                 "explanation": explanation,
                 "topic_name": topic_name,
+                "cached": cached,
                 "timestamp": timezone.now().isoformat()
             }, status=status.HTTP_200_OK)
+        except LLMTimeout:
+            return Response(
+                {"error": "The AI service took too long to respond. Please try again."},
+                status=status.HTTP_504_GATEWAY_TIMEOUT
+            )
+        except LLMUnavailable:
+            return Response(
+                {"error": "AI service is busy. Please try again shortly."},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
         except Exception as e:
             print(f"Error generating topic explanation: {e}")
             return Response(
@@ -1655,10 +1911,10 @@ class AITopicExplainerView(APIView):
     
     def _generate_topic_explanation(self, topic_name, topic_description, skill_context, user_level):
         """Generate detailed topic explanation using Gemini AI"""
-        genai.configure(api_key=os.environ.get('GEMINI_API_KEY'))
-        model = genai.GenerativeModel('gemini-2.0-flash')
-        
-        prompt = f"""You are an expert technical educator helping someone learn about: {topic_name}
+        return llm_gateway.generate(self._build_prompt(topic_name, topic_description, skill_context, user_level))
+
+    def _build_prompt(self, topic_name, topic_description, skill_context, user_level):
+        return f"""You are an expert technical educator helping someone learn about: {topic_name}
 
 Topic Details:
 - Topic: {topic_name}
@@ -1694,7 +1950,4 @@ Please provide a comprehensive yet accessible explanation that includes:
    - How it connects to other concepts
 
 Format your response in clear sections with headers. Use examples and analogies to make complex concepts easier to understand. Aim for a {user_level} level explanation.
-"""
-        
-        response = model.generate_content(prompt)
-        return response.text
\ No newline at end of file
+"""
\ No newline at end of file
@@ -0,0 +1,143 @@
+"""
+Wire protocols for the discussion WebSockets.
+
+Clients pick a protocol with the WebSocket subprotocol header:
+
+* no subprotocol (default): JSON text frames
+* ``connectconquer.msgpack``: MessagePack binary frames
+* ``connectconquer.msgpack.deflate``: MessagePack frames compressed with one
+  raw-deflate stream per connection, flushed per frame (the same framing as
+  permessage-deflate with context takeover). Keys repeated across frames
+  (author_name, created_at, ...) compress to back-references. ASGI servers do
+  not let the application negotiate the permessage-deflate extension, so this
+  compression is done by the application.
+
+Broadcast events carry each frame encoded once per format (see
+``encode_frames``), and batches are built by joining the encoded frames
+without re-serializing them.
+"""
+import json
+import zlib
+
+try:
+    import msgpack
+except ImportError:  # MessagePack protocols are not offered without it
+    msgpack = None
+
+# Trailer of a sync-flushed deflate block; stripped per frame as in RFC 7692
+DEFLATE_TRAILER = b'\x00\x00\xff\xff'
+# Largest inbound frame after decompression; a few KB of deflate can expand to hundreds of MB
+MAX_INFLATED_FRAME_SIZE = 256 * 1024
+
+
+class InvalidFrame(ValueError):
+    """An inbound frame that could not be decoded"""
+
+
+class FrameTooLarge(InvalidFrame):
+    """An inbound frame over the size limit; the connection cannot continue"""
+
+
+def encode_frames(payload):
+    """Encode a client frame once in every wire format, for a broadcast event"""
+    frames = {'frame': json.dumps(payload, separators=(',', ':'))}
+    if msgpack is not None:
+        frames['packed'] = msgpack.packb(payload, use_bin_type=True)
+    return frames
+
+
+class JSONCodec:
+    subprotocol = None
+    event_key = 'frame'
+
+    def encode(self, payload):
+        return json.dumps(payload, separators=(',', ':'))
+
+    def decode(self, text_data=None, bytes_data=None):
+        try:
+            return json.loads(text_data if text_data is not None else bytes_data)
+        except ValueError:
+            raise InvalidFrame('Invalid JSON format')
+
+    def decode_frame(self, text_data=None, bytes_data=None):
+        """An inbound client frame, which must be an object (decode() also reads server batches)"""
+        data = self.decode(text_data, bytes_data)
+        if not isinstance(data, dict):
+            raise InvalidFrame('Frames must be objects')
+        return data
+
+    def pick(self, frames):
+        """This codec's encoding from an encode_frames() dict"""
+        return frames[self.event_key]
+
+    def join(self, encoded_frames):
+        return '[' + ','.join(encoded_frames) + ']'
+
+    def send_kwargs(self, data):
+        return {'text_data': data}
+
+
+class MsgpackCodec(JSONCodec):
+    subprotocol = 'connectconquer.msgpack'
+    event_key = 'packed'
+
+    def encode(self, payload):
+        return msgpack.packb(payload, use_bin_type=True)
+
+    def decode(self, text_data=None, bytes_data=None):
+        if text_data is not None:
+            return super().decode(text_data)
+        try:
+            return msgpack.unpackb(bytes_data, raw=False)
+        except ValueError:
+            raise InvalidFrame('Invalid MessagePack format')
+
+    def pick(self, frames):
+        if self.event_key in frames:
+            return frames[self.event_key]
+        # Sent by a process without msgpack installed
+        return self.encode(json.loads(frames['frame']))
+
+    def join(self, encoded_frames):
+        # A MessagePack array is its header followed by the packed elements
+        packer = msgpack.Packer()
+        return packer.pack_array_header(len(encoded_frames)) + b''.join(encoded_frames)
+
+    def send_kwargs(self, data):
+        return {'bytes_data': data}
+
+
+class DeflateMsgpackCodec(MsgpackCodec):
+    subprotocol = 'connectconquer.msgpack.deflate'
+
+    def __init__(self):
+        self._compressor = zlib.compressobj(wbits=-zlib.MAX_WBITS)
+        self._decompressor = zlib.decompressobj(wbits=-zlib.MAX_WBITS)
+
+    def decode(self, text_data=None, bytes_data=None):
+        if text_data is not None:
+            return super().decode(text_data)
+        try:
+            bytes_data = self._decompressor.decompress(bytes_data + DEFLATE_TRAILER, MAX_INFLATED_FRAME_SIZE)
+        except zlib.error:
+            raise InvalidFrame('Invalid deflate stream')
+        if self._decompressor.unconsumed_tail:
+            # The rest of the frame is still in the stream, so later frames cannot be read either
+            raise FrameTooLarge('Frame too large')
+        return super().decode(bytes_data=bytes_data)
+
+    def send_kwargs(self, data):
+        compressed = self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+        return {'bytes_data': compressed[:-len(DEFLATE_TRAILER)]}
+
+
+CODECS = [DeflateMsgpackCodec, MsgpackCodec] if msgpack is not None else []
+
+
+def negotiate(requested_subprotocols):
+    """A new codec for a connection: the first supported subprotocol the client offered, else JSON"""
+    for subprotocol in requested_subprotocols or ():
+        for codec in CODECS:
+            if codec.subprotocol == subprotocol:
+                return codec()
+    return JSONCodec()
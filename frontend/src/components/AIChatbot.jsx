@@ -1,6 +1,7 @@
 import React, { useState, useRef, useEffect } from 'react';
 import './AIChatbot.css';
 import authService from '../services/authService';
+import { isEventStream, readEventStream } from '../services/eventStream';
 
 const API_BASE_URL = 'http://localhost:8000/api';
 
@@ -54,7 +55,8 @@ const AIChatbot = () => {
         try {
             const currentUser = authService.getCurrentUser();
             const requestBody = {
-                message: userMessage.text
+                message: userMessage.text,
+                stream: true
             };
 
             // Add user context if logged in
@@ -70,17 +72,43 @@ const AIChatbot = () => {
                 body: JSON.stringify(requestBody)
             });
 
-            const data = await response.json();
+            const botMessageId = Date.now() + 1;
 
-            const botMessage = {
-                id: Date.now() + 1,
-                text: data.response || "I'm sorry, I couldn't process your request right now.",
-                isBot: true,
-                timestamp: new Date(),
-                error: data.error
-            };
+            if (isEventStream(response)) {
+                // Show the answer as the tokens arrive
+                setMessages(prev => [...prev, {
+                    id: botMessageId,
+                    text: '',
+                    isBot: true,
+                    timestamp: new Date()
+                }]);
+                setIsLoading(false);
 
-            setMessages(prev => [...prev, botMessage]);
+                const updateBotMessage = (update) => setMessages(prev => prev.map(
+                    message => message.id === botMessageId ? { ...message, ...update(message) } : message
+                ));
+
+                await readEventStream(response, (event, data) => {
+                    if (event === 'token') {
+                        updateBotMessage(message => ({ text: message.text + data.text }));
+                    } else if (event === 'error') {
+                        updateBotMessage(message => ({ text: message.text || data.error, error: data.error }));
+                    }
+                });
+            } else {
+                // Validation and availability errors are plain JSON
+                const data = await response.json();
+
+                const botMessage = {
+                    id: botMessageId,
+                    text: data.response || "I'm sorry, I couldn't process your request right now.",
+                    isBot: true,
+                    timestamp: new Date(),
+                    error: data.error
+                };
+
+                setMessages(prev => [...prev, botMessage]);
+            }
 
             // If chatbot is closed, increment unread count
             if (!isOpen) {
@@ -13,7 +13,12 @@ const useWebSocket = (url, onMessage) => {
     const [authenticated, setAuthenticated] = useState(false);
     const reconnectTimeoutRef = useRef(null);
     const reconnectAttemptsRef = useRef(0);
+    const heartbeatIntervalRef = useRef(null);
+    // Highest chat sequence number seen, so a reconnect only replays what was missed
+    const lastSeqRef = useRef(null);
     const maxReconnectAttempts = 3;
+    // Keeps presence alive on the server while the user is only reading
+    const heartbeatIntervalMs = 25000;
 
     // Update the ref when onMessage changes
     useEffect(() => {
@@ -30,17 +35,26 @@ const useWebSocket = (url, onMessage) => {
 
         try {
             // Don't send token in URL to avoid authentication issues
-            ws.current = new WebSocket(url);
+            const resumeQuery = lastSeqRef.current !== null ? `?resume_from=${lastSeqRef.current}` : '';
+            ws.current = new WebSocket(`${url}${resumeQuery}`);
 
             ws.current.onopen = () => {
                 setConnectionStatus('Connected');
                 reconnectAttemptsRef.current = 0;
                 console.log('WebSocket connected:', url);
+                
+                clearInterval(heartbeatIntervalRef.current);
+                heartbeatIntervalRef.current = setInterval(() => {
+                    if (ws.current && ws.current.readyState === WebSocket.OPEN) {
+                        ws.current.send(JSON.stringify({ type: 'ping' }));
+                    }
+                }, heartbeatIntervalMs);
             };
 
             ws.current.onclose = (event) => {
                 setConnectionStatus('Disconnected');
                 console.log('WebSocket disconnected:', url, event.code);
+                clearInterval(heartbeatIntervalRef.current);
                 
                 // Attempt to reconnect if not manually closed
                 if (event.code !== 1000 && reconnectAttemptsRef.current < maxReconnectAttempts) {
@@ -59,16 +73,24 @@ const useWebSocket = (url, onMessage) => {
 
             ws.current.onmessage = (event) => {
                 try {
-                    const data = JSON.parse(event.data);
+                    const parsed = JSON.parse(event.data);
+                    // Room broadcasts arrive batched as an array of frames
+                    const frames = Array.isArray(parsed) ? parsed : [parsed];
                     
-                    // Handle connection establishment
-                    if (data.type === 'connection_established') {
-                        setAuthenticated(data.authenticated);
-                        return;
-                    }
-                    
-                    // Use the ref to call the latest onMessage callback
-                    onMessageRef.current(data);
+                    frames.forEach((data) => {
+                        if (typeof data.seq === 'number' && (lastSeqRef.current === null || data.seq > lastSeqRef.current)) {
+                            lastSeqRef.current = data.seq;
+                        }
+                        
+                        // Handle connection establishment
+                        if (data.type === 'connection_established') {
+                            setAuthenticated(data.authenticated);
+                            return;
+                        }
+                        
+                        // Use the ref to call the latest onMessage callback
+                        onMessageRef.current(data);
+                    });
                 } catch (error) {
                     console.error('Error parsing WebSocket message:', error);
                 }
@@ -86,6 +108,7 @@ const useWebSocket = (url, onMessage) => {
             if (reconnectTimeoutRef.current) {
                 clearTimeout(reconnectTimeoutRef.current);
             }
+            clearInterval(heartbeatIntervalRef.current);
             if (ws.current) {
                 ws.current.close(1000); // Normal closure
             }
@@ -127,6 +150,7 @@ const TopicChat = ({ topic, onBackToCategory }) => {
             const chatMessages = topic.posts.map(post => ({
                 id: post.id,
                 post_id: post.id, // Add post_id for deduplication consistency
+                message_id: post.message_id,
                 type: 'chat_message',
                 content: post.content,
                 author_name: post.author_name,
@@ -142,14 +166,51 @@ const TopicChat = ({ topic, onBackToCategory }) => {
             case 'chat_message':
                 // Prevent duplicate messages by checking if message already exists
                 setMessages(prev => {
-                    const messageExists = prev.some(msg => msg.post_id === data.post_id || msg.id === data.post_id);
+                    const messageExists = prev.some(msg => msg.message_id && msg.message_id === data.message_id);
                     if (messageExists) {
-                        console.log('Duplicate message detected, skipping:', data.post_id);
+                        console.log('Duplicate message detected, skipping:', data.message_id);
                         return prev;
                     }
                     return [...prev, data];
                 });
                 break;
+            case 'message_ack':
+                // The server assigned our optimistic message its id, and later confirms it is saved
+                setMessages(prev => prev.map(msg => (
+                    msg.id === data.client_ref
+                        ? { ...msg, message_id: data.message_id, post_id: data.post_id ?? msg.post_id, isOptimistic: data.status !== 'persisted' }
+                        : msg
+                )));
+                break;
+            case 'replay_truncated':
+                // Missed too much to replay over the socket; reload the newest posts instead
+                fetch(`${API_BASE_URL}/discussion_topics/${topic.id}/posts/`)
+                    .then(response => (response.ok ? response.json() : null))
+                    .then(page => {
+                        if (page) {
+                            setMessages(page.results.map(post => ({
+                                id: post.id,
+                                post_id: post.id,
+                                message_id: post.message_id,
+                                type: 'chat_message',
+                                content: post.content,
+                                author_name: post.author_name,
+                                created_at: post.created_at,
+                                timestamp: post.created_at
+                            })));
+                        }
+                    })
+                    .catch(error => console.error('Error reloading posts:', error));
+                break;
+            case 'chat_message_retracted':
+                setMessages(prev => prev.filter(msg => msg.message_id !== data.message_id));
+                break;
+            case 'error':
+                // Failed, locked-topic and unavailable-topic errors refer to an optimistic message
+                if (data.client_ref) {
+                    setMessages(prev => prev.filter(msg => msg.id !== data.client_ref));
+                }
+                break;
             case 'typing':
                 setTypingUsers(prev => {
                     if (data.is_typing) {
@@ -159,6 +220,9 @@ const TopicChat = ({ topic, onBackToCategory }) => {
                     }
                 });
                 break;
+            case 'presence_snapshot':
+                setOnlineUsers(data.users);
+                break;
             case 'user_join':
                 setOnlineUsers(prev => {
                     const exists = prev.some(user => user.user_id === data.user_id);
@@ -184,17 +248,19 @@ const TopicChat = ({ topic, onBackToCategory }) => {
 
         const messageContent = newMessage.trim();
         
-        // Try WebSocket first
+        // Try WebSocket first; client_ref ties the server's acks to the optimistic message
+        const clientRef = `temp-${Date.now()}`;
         const sent = sendMessage({
             type: 'chat_message',
-            content: messageContent
+            content: messageContent,
+            client_ref: clientRef
         });
 
         if (sent) {
             // Optimistic UI update for sender (since backend excludes sender from broadcast)
             const optimisticMessage = {
-                id: `temp-${Date.now()}`, // Temporary ID
-                post_id: `temp-${Date.now()}`, // Use same temp ID for deduplication
+                id: clientRef, // Temporary ID
+                post_id: clientRef, // Replaced by the real post id once the server acks
                 type: 'chat_message',
                 content: messageContent,
                 author_name: currentUser.first_name || currentUser.username,
@@ -377,6 +443,11 @@ const TopicChat = ({ topic, onBackToCategory }) => {
     );
 };
 
+// Pinned topics first, then by latest activity (the order of the topics API)
+const sortTopics = (topics) => [...topics].sort((a, b) =>
+    (b.is_pinned - a.is_pinned) || (new Date(b.last_activity) - new Date(a.last_activity))
+);
+
 // Forum Category Component
 const ForumCategory = ({ category, onSelectTopic }) => {
     const [topics, setTopics] = useState([]);
@@ -404,6 +475,20 @@ const ForumCategory = ({ category, onSelectTopic }) => {
         fetchTopics();
     }, [category.id]);
 
+    // New topics and topic deltas are pushed by the server, so the list never refetches
+    const handleListUpdate = useCallback((data) => {
+        if (data.type === 'new_topic') {
+            setTopics(prev => prev.some(topic => topic.id === data.topic.id) ? prev : sortTopics([data.topic, ...prev]));
+        } else if (data.type === 'topic_updated') {
+            setTopics(prev => sortTopics(prev.map(topic => topic.id === data.topic_id
+                ? { ...topic, ...data.changes, post_count: data.post_count }
+                : topic
+            )));
+        }
+    }, []);
+
+    const { connectionStatus } = useWebSocket(`${WS_BASE_URL}/discussion_list/?category=${category.id}`, handleListUpdate);
+
     const handleCreateTopic = async (e) => {
         e.preventDefault();
         if (!newTopicTitle.trim()) return;
@@ -423,7 +508,9 @@ const ForumCategory = ({ category, onSelectTopic }) => {
                 setNewTopicTitle('');
                 setNewTopicContent('');
                 setShowCreateTopic(false);
-                fetchTopics();
+                if (connectionStatus !== 'Connected') {
+                    fetchTopics(); // Otherwise the new topic arrives over the list socket
+                }
             }
         } catch (error) {
             console.error('Error creating topic:', error);
@@ -451,19 +451,15 @@ useEffect(() => {
 
         try {
             // Play question audio if available
-            if (question.audio_data) {
-                const audioBlob = new Blob([
-                    Uint8Array.from(atob(question.audio_data), c => c.charCodeAt(0))
-                ], { type: 'audio/mpeg' });
-                const audioUrl = URL.createObjectURL(audioBlob);
-                const audio = new Audio(audioUrl);
+            if (question.audio_url) {
+                // Streamed from the backend audio cache (supports range requests)
+                const audio = new Audio(question.audio_url);
                 
                 setCurrentAudio(audio);
                 
                 audio.onended = () => {
                     setAiSpeaking(false);
                     setUserCanSpeak(true);
-                    URL.revokeObjectURL(audioUrl);
                     
                     // Add instruction message
                     setConversation(prev => [...prev, {
@@ -477,7 +473,6 @@ useEffect(() => {
                 audio.onerror = () => {
                     setAiSpeaking(false);
                     setUserCanSpeak(true);
-                    URL.revokeObjectURL(audioUrl);
                 };
                 
                 await audio.play();
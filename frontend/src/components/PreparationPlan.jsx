@@ -3,6 +3,7 @@ import { useLocation, useNavigate } from 'react-router-dom';
 import ReactMarkdown from 'react-markdown';
 import './PreparationPlan.css'; // Will create this CSS file
 import authService from '../services/authService';
+import { isEventStream, readEventStream } from '../services/eventStream';
 
 const PreparationPlan = () => {
     const location = useLocation();
@@ -282,11 +283,22 @@ const PreparationPlan = () => {
                     topic_name: topic.name,
                     topic_description: topic.description || '',
                     skill_context: skillContext,
-                    user_level: 'intermediate' // Could be made dynamic based on user preference
+                    user_level: 'intermediate', // Could be made dynamic based on user preference
+                    stream: true
                 })
             });
 
-            if (response.ok) {
+            if (response.ok && isEventStream(response)) {
+                // Render the explanation as it is generated
+                await readEventStream(response, (event, data) => {
+                    if (event === 'token') {
+                        setAiLoading(false);
+                        setAiExplanation(prev => prev + data.text);
+                    } else if (event === 'error') {
+                        setAiError(data.error);
+                    }
+                });
+            } else if (response.ok) {
                 const data = await response.json();
                 setAiExplanation(data.explanation);
             } else {